@@ -0,0 +1 @@
+"""Benchmarks for the Home Assistant release helper."""
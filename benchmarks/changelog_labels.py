@@ -0,0 +1,228 @@
+"""Benchmark the label classification of the release notes.
+
+Compares the previous label handling, scanning the label map for every label
+of every PR, with the compiled label rules on a synthetic release, and checks
+that both produce the same notes.
+
+Run with: python -m benchmarks.changelog_labels [--prs N] [--runs N]
+"""
+
+import argparse
+from collections import OrderedDict
+import random
+import statistics
+import time
+
+from packaging.version import Version
+
+from hassrelease import changelog
+from hassrelease.model import LogLine, Release
+
+LEGACY_IGNORE_LINE_LABELS = {"reverted"}
+LEGACY_LABEL_HEADERS = {
+    "new-integration": "New Integrations",
+    "new-platform": "New Platforms",
+    "breaking-change": "Breaking Changes",
+    "cherry-picked": "Beta Fixes",
+}
+LEGACY_LABEL_MAP = {
+    "discovery.": None,
+    "recorder.": None,
+    "automation.": changelog.automation_link,
+    "emulated_hue.": None,
+    "homeassistant.": None,
+    "cloud.": lambda pl, _wt: f"[{pl} docs]: https://www.nabucasa.com/config/",
+}
+OTHER_LABELS = ("cla-signed", "small-pr", "has-tests", "docs-missing", "reverted")
+
+
+class User:
+    def __init__(self, login):
+        self.login = login
+        self.html_url = "https://github.com/" + login
+
+
+class Label:
+    def __init__(self, name):
+        self.name = name
+
+
+class Issue:
+    def __init__(self, number, login, labels):
+        self.number = number
+        self.user = User(login)
+        self.html_url = "https://github.com/home-assistant/core/pull/{}".format(number)
+        self.milestone = None
+        self.original_labels = [Label(label) for label in labels]
+
+
+class PRs:
+    def __init__(self, issues):
+        self.issues = issues
+
+    def get(self, number):
+        return self.issues[number]
+
+
+def synthetic_release(num_prs, seed=0):
+    """Return a release of num_prs PRs and their issues."""
+    rand = random.Random(seed)
+    integrations = ["integration{}".format(idx) for idx in range(400)] + [
+        "{}.{}".format(prefix, name)
+        for prefix in ("automation", "cloud", "recorder", "discovery")
+        for name in ("mqtt", "state", "purge", "alexa")
+    ]
+    issues = {}
+    lines = []
+    for number in range(1, num_prs + 1):
+        labels = [
+            "integration: " + integration
+            for integration in rand.sample(integrations, rand.randint(0, 3))
+        ]
+        labels += rand.sample(OTHER_LABELS, rand.randint(0, 2))
+        labels += [label for label in LEGACY_LABEL_HEADERS if rand.random() < 0.05]
+        rand.shuffle(labels)
+        issues[number] = Issue(number, "user{}".format(rand.randint(0, 800)), labels)
+        lines.append(
+            LogLine("- Change {} (#{}) (dev@example.com)".format(number, number))
+        )
+
+    release = Release("0.100.0", branch="rc")
+    release._log_lines = lines
+    return release, PRs(issues)
+
+
+def legacy_process_doc_label(label, parts, links, website_tags):
+    """Process doc labels the way the release notes used to."""
+    item = None
+
+    if label.startswith("integration: "):
+        item = label[len("integration: ") :]
+
+    if not item:
+        return
+
+    part = changelog.DOC_TEMPLATE.format(item)
+    if website_tags:
+        link = changelog.LINK_DEF_DOC.format(item)
+    else:
+        link = changelog.GITHUB_LINK_DEF_DOC.format(item)
+
+    for match, action in LEGACY_LABEL_MAP.items():
+        if item.startswith(match):
+            if action is None:
+                return
+            else:
+                link = action(item, website_tags)
+            break
+
+    parts.append(part)
+    links.add(link)
+
+
+def legacy_generate(release, prs, *, website_tags):
+    """Generate the release notes the way it used to be done."""
+    label_groups = OrderedDict()
+    label_groups["new-integration"] = []
+    label_groups["new-platform"] = []
+    label_groups["breaking-change"] = []
+    if release.version.release[-1] == 0:
+        label_groups["cherry-picked"] = []
+
+    changes = []
+    links = set()
+    for line in release.log_lines():
+        parts = ["-", line.message]
+        if line.pr is None:
+            continue
+
+        pr = prs.get(line.pr)
+        if (
+            pr.milestone is not None
+            and Version(pr.milestone.title).release != release.version.release
+        ):
+            continue
+
+        labels = [label.name for label in pr.original_labels]
+        if any(label in LEGACY_IGNORE_LINE_LABELS for label in labels):
+            continue
+
+        user = pr.user
+        links.add(changelog.LINK_DEF_USER.format(user.login, user.html_url))
+        parts.append(changelog.INFO_TEMPLATE.format(user.login, pr.number))
+        links.add(changelog.LINK_DEF_PR.format(pr.number, pr.html_url))
+
+        for label in labels:
+            legacy_process_doc_label(label, parts, links, website_tags)
+
+        for label in labels:
+            if label in label_groups:
+                if label == "cherry-picked":
+                    parts.append("(beta fix)")
+                else:
+                    parts.append("({})".format(label))
+
+        msg = " ".join(parts)
+        changes.append(msg)
+
+        for label in labels:
+            if label not in label_groups:
+                continue
+            label_groups[label].append(msg)
+
+    outp = []
+    for label, group in label_groups.items():
+        if label == "breaking-change" and website_tags:
+            outp.append(changelog.WEBSITE_DIVIDER)
+        if not group:
+            continue
+        outp.append(f"## {LEGACY_LABEL_HEADERS[label]}")
+        outp.append("")
+        outp.extend(group)
+        outp.append("")
+    outp.append("## All changes")
+    outp.append("")
+
+    outp.extend(changes)
+    outp.append("")
+    outp.extend(sorted(links))
+    return "\n".join(outp)
+
+
+def run_time(generate, release, prs, runs):
+    """Return the median seconds to generate both notes, and the notes."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        notes = (
+            generate(release, prs, website_tags=True),
+            generate(release, prs, website_tags=False),
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), notes
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    release, prs = synthetic_release(args.prs)
+    print("{} PRs".format(args.prs))
+
+    results = {}
+    for label, generate in (
+        ("label map", legacy_generate),
+        ("label rules", changelog.generate),
+    ):
+        seconds, results[label] = run_time(generate, release, prs, args.runs)
+        print("{:<12} {:>8.1f} ms".format(label, seconds * 1000))
+
+    if results["label map"] != results["label rules"]:
+        raise SystemExit("The release notes differ")
+
+
+if __name__ == "__main__":
+    main()
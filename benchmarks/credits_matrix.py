@@ -0,0 +1,147 @@
+"""Benchmark the credits aggregation structures.
+
+Compares the previous dict of dicts keyed by login with the
+ContributionMatrix on a synthetic organization, measuring peak memory and the
+time needed to aggregate the contributions and build the template context.
+
+Run with: python -m benchmarks.credits_matrix [--users N] [--repos N]
+"""
+
+import argparse
+from collections import defaultdict
+import random
+import re
+import time
+import tracemalloc
+
+from hassrelease.contributions import ContributionMatrix
+from hassrelease.credits import build_users_context
+
+
+def synthetic_contributions(num_users, num_repos, seed=0):
+    """Generate (login, repo, count) entries with a long tail distribution."""
+    rand = random.Random(seed)
+    repos = ["repository-{}".format(idx) for idx in range(num_repos)]
+    entries = []
+    for idx in range(num_users):
+        login = "user{}".format(idx)
+        for repo in rand.sample(repos, min(num_repos, int(rand.paretovariate(1.5)))):
+            entries.append((login, repo, int(rand.paretovariate(1.2))))
+    return entries
+
+
+def dict_aggregate(entries):
+    """Aggregate the way the credits crawl used to."""
+    contributors = defaultdict(dict)
+    for login, repo, count in entries:
+        already = contributors[login].get(repo)
+        if already is not None:
+            contributors[login][repo] = count + already
+        else:
+            contributors[login][repo] = count
+    return contributors
+
+
+def dict_users_context(contributors, names):
+    """Build the template context the way the credits crawl used to."""
+    users_context = {}
+    for login, user_contribs_dict in contributors.items():
+        count_string = ""
+        user_total_contribs = 0
+        for repo_name, num_contribs in sorted(
+            user_contribs_dict.items(), key=lambda x: x[1], reverse=True
+        ):
+            count_string += "{} {} to {}\n".format(
+                num_contribs, "commits" if num_contribs > 1 else "commit", repo_name
+            )
+            user_total_contribs += num_contribs
+        count_string = "{} total commits to the Home Assistant org:\n{}".format(
+            user_total_contribs, count_string
+        )
+        name = names[login]
+        name = re.sub(r"^(@)", r"", name)
+        name = re.sub(r"([\\`*_{}[\]()#+-.!~|])", r"\\\1", name)
+        users_context[login] = {
+            "info": {"name": name, "login": login},
+            "countString": count_string,
+        }
+    return users_context
+
+
+def matrix_aggregate(entries):
+    """Aggregate into a ContributionMatrix."""
+    matrix = ContributionMatrix()
+    for login, repo, count in entries:
+        matrix.add(login, repo, count)
+    return matrix
+
+
+def fresh_entries(entries):
+    """Yield entries with freshly allocated strings, as decoded from JSON."""
+    for login, repo, count in entries:
+        yield "".join(login), "".join(repo), count
+
+
+def measure(aggregate, users_context, entries, names):
+    """Return (peak aggregate memory, aggregate time, context time, context)."""
+    tracemalloc.start()
+    aggregated = aggregate(fresh_entries(entries))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del aggregated
+
+    start = time.perf_counter()
+    aggregated = aggregate(fresh_entries(entries))
+    aggregate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    context = users_context(aggregated, names)
+    sorted(context.values(), key=lambda x: x["info"]["name"].casefold())
+    context_time = time.perf_counter() - start
+    return peak, aggregate_time, context_time, context
+
+
+def normalized(users_context):
+    """Return the context with repositories tied in the ranking sorted by name."""
+    return {
+        login: (user["info"], sorted(user["countString"].splitlines()))
+        for login, user in users_context.items()
+    }
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=30000)
+    parser.add_argument("--repos", type=int, default=400)
+    args = parser.parse_args()
+
+    entries = synthetic_contributions(args.users, args.repos)
+    names = {login: "@" + login.title() for login, _, _ in entries}
+    print(
+        "{} users, {} repositories, {} entries".format(
+            len(names), args.repos, len(entries)
+        )
+    )
+
+    results = {}
+    for label, aggregate, users_context in (
+        ("dict of dicts", dict_aggregate, dict_users_context),
+        ("matrix", matrix_aggregate, build_users_context),
+    ):
+        peak, aggregate_time, context_time, context = measure(
+            aggregate, users_context, entries, names
+        )
+        results[label] = context
+        print(
+            "{:<14} memory {:>8.1f} KiB  aggregate {:>7.3f}s  context {:>7.3f}s".format(
+                label, peak / 1024, aggregate_time, context_time
+            )
+        )
+
+    if normalized(results["dict of dicts"]) != normalized(results["matrix"]):
+        raise SystemExit("Results differ between the two structures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Benchmark the git layer on synthetic Home Assistant repositories.
+
+Generates a core-like repository with thousands of squash-merged commits
+carrying (#NNNN) subjects, an rc branch diverging from master with its own
+picks and version bump, a bare remote and a local clone. Times the log
+extraction of the release branch and of the whole history, the LogLine
+parsing, the PR index build, the version detection and the pick flow end
+to end, and saves the results so versions of hass-release can be
+compared.
+
+Run with: python -m benchmarks.git_harness [--commits N] [--picks N]
+    [--runs N] [--compare REVISION]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import pathlib
+import statistics
+import subprocess
+import tempfile
+import time
+
+from hassrelease import git
+from hassrelease.model import LogLine
+from hassrelease.picker import Picker, PickItem
+from hassrelease.pr_index import PRIndex
+
+RESULTS_DIR = pathlib.Path(__file__).parent.parent / "data" / "benchmarks"
+RESULTS_FILE = "git-harness-{}.json"
+# First PR number of the synthetic history.
+FIRST_PR = 40000
+AUTHORS = 300
+INTEGRATIONS = 500
+
+
+def _data(text):
+    """Return a fast-import data command."""
+    raw = text.encode()
+    return b"data %d\n%s\n" % (len(raw), raw)
+
+
+def _commit(ref, mark, parent, number, subject, path, content):
+    """Return the fast-import commands of a commit changing one file."""
+    author = "Author {0} <author{0}@example.com> {1} +0000".format(
+        number % AUTHORS, 1700000000 + mark * 60
+    )
+    commands = [
+        "commit {}\nmark :{}\nauthor {}\ncommitter {}\n".format(
+            ref, mark, author, author
+        ).encode(),
+        _data(subject),
+    ]
+    if parent is not None:
+        commands.append("from :{}\n".format(parent).encode())
+    commands.append("M 100644 inline {}\n".format(path).encode())
+    commands.append(_data(content))
+    return b"".join(commands)
+
+
+def _pyproject(version):
+    """Return a pyproject.toml of a version."""
+    return '[project]\nname = "homeassistant"\nversion = "{}"\n'.format(version)
+
+
+def create_repositories(path, num_commits, num_picks):
+    """Create a synthetic core repository, a bare remote and a local clone.
+
+    master has num_commits squash-merged PRs. rc forks from master before
+    the last num_picks * 2 PRs, carries a version bump and picks every other
+    of the later PRs. Returns the local clone and the PRs left to pick.
+    """
+    source = path / "source"
+    subprocess.run(["git", "init", "-q", "-b", "master", str(source)], check=True)
+
+    stream = [
+        _commit(
+            "refs/heads/master",
+            1,
+            None,
+            0,
+            "Initial commit",
+            "pyproject.toml",
+            _pyproject("2026.11.0.dev0"),
+        )
+    ]
+    fork = num_commits - num_picks * 2 - 1
+    fork_mark = None
+    later = []
+    for idx in range(num_commits):
+        number = FIRST_PR + idx
+        mark = idx + 2
+        path_name = "homeassistant/components/integration{}/change{}.py".format(
+            idx % INTEGRATIONS, idx
+        )
+        subject = "Fix integration{} (#{})".format(idx % INTEGRATIONS, number)
+        stream.append(
+            _commit(
+                "refs/heads/master",
+                mark,
+                None,
+                number,
+                subject,
+                path_name,
+                "VALUE = {}\n".format(idx),
+            )
+        )
+        if idx == fork:
+            fork_mark = mark
+        elif idx > fork:
+            later.append((number, subject, path_name, idx))
+
+    mark = num_commits + 2
+    stream.append(
+        _commit(
+            "refs/heads/rc",
+            mark,
+            fork_mark,
+            0,
+            "Bump version to 2026.10.0b0",
+            "pyproject.toml",
+            _pyproject("2026.10.0b0"),
+        )
+    )
+    to_pick = []
+    for position, (number, subject, path_name, idx) in enumerate(later):
+        if position % 2:
+            to_pick.append((number, subject))
+            continue
+        mark += 1
+        stream.append(
+            _commit(
+                "refs/heads/rc",
+                mark,
+                None,
+                number,
+                subject,
+                path_name,
+                "VALUE = {}\n".format(idx),
+            )
+        )
+
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        cwd=source,
+        input=b"".join(stream),
+        check=True,
+    )
+
+    remote = path / "remote.git"
+    local = path / "local"
+    subprocess.run(
+        ["git", "clone", "-q", "--bare", str(source), str(remote)], check=True
+    )
+    subprocess.run(
+        ["git", "clone", "-q", "-b", "rc", str(remote), str(local)], check=True
+    )
+    for key, value in (
+        ("user.name", "Benchmark"),
+        ("user.email", "benchmark@example.com"),
+    ):
+        subprocess.run(["git", "config", key, value], cwd=local, check=True)
+
+    master_log = (
+        git.get_repo(local).run("log", "--format=%H %s", "origin/master").splitlines()
+    )
+    sha_by_subject = {
+        line.split(" ", 1)[1]: line.split(" ", 1)[0] for line in master_log
+    }
+    items = [
+        PickItem(sha_by_subject[subject], number, subject, "author")
+        for number, subject in to_pick
+    ]
+    return local, items
+
+
+def median_time(func, runs):
+    """Return the median seconds a function takes, and its last result."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+class FakeIssue:
+    """A pull request issue that accepts labels."""
+
+    def add_labels(self, *labels):
+        """Accept the labels."""
+
+
+class FakeRepo:
+    """The GitHub repository of the picked pull requests."""
+
+    name = "core"
+
+    def issue(self, number):
+        """Return the issue of a pull request."""
+        return FakeIssue()
+
+
+def build_pr_index(local, path):
+    """Build the PR index of a repository from scratch."""
+    path.unlink(missing_ok=True)
+    return PRIndex(local, path).update()
+
+
+def run(local, items, runs, state_file, num_commits):
+    """Run the timings, returning seconds by measurement."""
+    results = {}
+
+    results["get_log"], lines = median_time(
+        lambda: list(git.get_log("rc", local)), runs
+    )
+    results["logline_parse"], log_lines = median_time(
+        lambda: [LogLine(line) for line in lines], runs
+    )
+    if sum(line.pr is not None for line in log_lines) < len(items):
+        raise SystemExit("The log of rc misses the synthetic PRs")
+
+    # get_log only covers the commits rc and master don't share, these grow
+    # with the whole history.
+    results["history_log"], lines = median_time(
+        lambda: git.get_repo(local)
+        .run("log", "--pretty=format:- %s (%ae)", "--reverse", "origin/master")
+        .split("\n"),
+        runs,
+    )
+    results["history_parse"], log_lines = median_time(
+        lambda: [LogLine(line) for line in lines], runs
+    )
+    if sum(line.pr is not None for line in log_lines) != num_commits:
+        raise SystemExit("The log of master misses the synthetic PRs")
+
+    index_file = state_file.parent / "pr-index.json"
+    results["pr_index"], read = median_time(
+        lambda: build_pr_index(local, index_file), runs
+    )
+    if read < num_commits:
+        raise SystemExit("The PR index misses the synthetic PRs")
+
+    elapsed, version = median_time(
+        lambda: [git.get_hass_version("rc", local) for _ in range(100)], runs
+    )
+    results["get_hass_version"] = elapsed / 100
+    if version[0] != "2026.10.0b0":
+        raise SystemExit("Unexpected version {}".format(version[0]))
+
+    picker = Picker(FakeRepo(), local, state_file=state_file)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        success = picker.pick(items)
+    results["pick"] = time.perf_counter() - start
+    if not success or len(picker.picked) != len(items):
+        raise SystemExit("Picking the synthetic PRs failed")
+    results["pick_per_commit"] = results["pick"] / len(items)
+    return results
+
+
+def revision():
+    """Return the revision of the hass-release checkout."""
+    return (
+        subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=pathlib.Path(__file__).parent,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        or "unknown"
+    )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=5000)
+    parser.add_argument("--picks", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--compare", metavar="REVISION", help="Compare with the results of a revision"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        local, items = create_repositories(
+            pathlib.Path(tmp_dir), args.commits, args.picks
+        )
+        print(
+            "Generated {} commits and {} PRs to pick in {:.1f}s".format(
+                args.commits, len(items), time.perf_counter() - start
+            )
+        )
+        results = run(
+            local, items, args.runs, pathlib.Path(tmp_dir) / "pick.json", args.commits
+        )
+        git.get_repo(local).close()
+
+    current = revision()
+    previous = None
+    if args.compare:
+        previous = json.loads(
+            (RESULTS_DIR / RESULTS_FILE.format(args.compare)).read_text()
+        )
+        if previous["commits"] != args.commits or previous["picks"] != args.picks:
+            print("Warning: the compared results used another repository size")
+
+    for name, seconds in results.items():
+        line = "{:<18} {:>10.3f} ms".format(name, seconds * 1000)
+        if previous is not None and name in previous["results"]:
+            line += "  {:>6.2f}x {}".format(
+                previous["results"][name] / seconds, args.compare
+            )
+        print(line)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    results_file = RESULTS_DIR / RESULTS_FILE.format(current)
+    results_file.write_text(
+        json.dumps(
+            {
+                "revision": current,
+                "commits": args.commits,
+                "picks": args.picks,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print("Saved", results_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark the git queries of the release commands.
+
+Compares starting a shell per query, as git.py used to, with the GitRepo
+client: file reads through one git cat-file --batch process and ref and
+working tree queries from one git status snapshot. A throwaway repository
+with a number of branches is created for the run.
+
+Run with: python -m benchmarks.git_session [--branches N] [--rounds N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import tempfile
+import time
+
+from hassrelease.git import GitRepo
+
+
+def create_repository(path, num_branches):
+    """Create a repository with a remote and a pyproject.toml per branch."""
+    remote = path / "remote.git"
+    local = path / "local"
+
+    def git(*args, cwd=local):
+        subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+    local.mkdir()
+    git("init", "-q", "-b", "dev")
+    git("config", "user.name", "Benchmark")
+    git("config", "user.email", "benchmark@example.com")
+    for idx in range(num_branches):
+        (local / "pyproject.toml").write_text(
+            '[project]\nversion = "2024.{}.0"\n'.format(idx)
+        )
+        git("add", "pyproject.toml")
+        git("commit", "-q", "-m", "Release {}".format(idx))
+        git("branch", "release-{}".format(idx))
+    git("clone", "-q", "--bare", str(local), str(remote), cwd=path)
+    git("remote", "add", "origin", str(remote))
+    git("fetch", "-q", "origin")
+    git("remote", "set-head", "origin", "dev")
+    return local
+
+
+def shell_queries(path, branches):
+    """Run the queries the way git.py used to."""
+    versions = [
+        subprocess.run(
+            "git show {branch}:pyproject.toml".format(branch=branch),
+            shell=True,
+            cwd=path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ).stdout.decode()
+        for branch in branches
+    ]
+    dirty = (
+        subprocess.run(
+            "git diff --stat", capture_output=True, shell=True, cwd=path
+        ).stdout
+        != b""
+    )
+    main = (
+        subprocess.run(
+            "git branch --show-current", capture_output=True, shell=True, cwd=path
+        ).stdout
+        == subprocess.run(
+            "git symbolic-ref refs/remotes/origin/HEAD | sed 's@^refs/remotes/origin/@@'",
+            capture_output=True,
+            shell=True,
+            cwd=path,
+        ).stdout
+    )
+    return versions, dirty, main
+
+
+def client_queries(git_repo, branches):
+    """Run the queries through the GitRepo client."""
+    versions = [git_repo.show(branch, "pyproject.toml") for branch in branches]
+    status = git_repo.status()
+    return versions, status.dirty, status.branch == git_repo.default_branch()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = create_repository(pathlib.Path(tmp_dir), args.branches)
+        branches = ["release-{}".format(idx) for idx in range(args.branches)]
+        print(
+            "{} rounds of {} file reads and a status query".format(
+                args.rounds, args.branches
+            )
+        )
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            expected = shell_queries(path, branches)
+        shell_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with GitRepo(path) as git_repo:
+            for _ in range(args.rounds):
+                result = client_queries(git_repo, branches)
+        client_time = time.perf_counter() - start
+
+    for label, elapsed in (("shell", shell_time), ("client", client_time)):
+        print(
+            "{:<7} {:>7.3f}s  {:>6.1f}ms per round".format(
+                label, elapsed, elapsed / args.rounds * 1000
+            )
+        )
+
+    if result != expected:
+        raise SystemExit("Results differ between the two approaches")
+
+
+if __name__ == "__main__":
+    main()
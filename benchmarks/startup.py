@@ -0,0 +1,75 @@
+"""Benchmark the cold start of the command line tool.
+
+Runs hassrelease in fresh interpreters and reports the median wall time per
+command line, and which of the heavy dependencies loading the commands
+imports.
+
+Run with: python -m benchmarks.startup [--runs N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMAND_LINES = (
+    ("--help",),
+    ("bump-frontend", "--help"),
+    ("pick", "--help"),
+    ("credits", "--help"),
+)
+HEAVY_MODULES = ("github3", "requests", "pystache", "toml", "packaging")
+
+
+def run_time(args, runs):
+    """Return the median seconds a python command line takes."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imported_modules():
+    """Return the heavy modules imported by loading the commands."""
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, hassrelease.commands; "
+            "print(' '.join(m for m in {!r} if m in sys.modules))".format(
+                HEAVY_MODULES
+            ),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = run_time(("-c", "pass"), args.runs)
+    print("{:<34} {:>7.1f}ms".format("python (baseline)", baseline * 1000))
+    for command_line in COMMAND_LINES:
+        print(
+            "{:<34} {:>7.1f}ms".format(
+                "hassrelease " + " ".join(command_line),
+                run_time(("-m", "hassrelease", *command_line), args.runs) * 1000,
+            )
+        )
+    print("Imported at startup:", " ".join(imported_modules()) or "none")
+
+
+if __name__ == "__main__":
+    main()
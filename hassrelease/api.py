@@ -0,0 +1,497 @@
+"""Python API to run several release operations in one process.
+
+The command line tool prints its progress and builds a new GitHub session
+for every command. A ReleaseContext keeps the session, the repositories, the
+PR caches and the PR indexes around, so a release bot can chain operations
+without paying the startup again. The operations return their results
+instead of printing them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import re
+import threading
+
+from . import (
+    changelog,
+    contributors,
+    docs_index,
+    git,
+    milestones,
+    model,
+    picker,
+    pr_index,
+)
+from .const import (
+    CORE_PATH,
+    DOCS_PATH,
+    DOCS_PR_PATTERN,
+    FRONTEND_PATH,
+    GITHUB_ORGANIZATION_NAME,
+    MILESTONE_SCAN_FILE,
+)
+
+# Local checkouts of the GitHub repositories, relative to the working
+# directory.
+DEFAULT_PATHS = {
+    "core": CORE_PATH,
+    # The former name of the core repository.
+    "home-assistant": CORE_PATH,
+    "frontend": FRONTEND_PATH,
+    "home-assistant.io": DOCS_PATH,
+}
+
+# Number of releases rendered simultaneously by generate_notes_batch.
+NOTES_WORKERS = 4
+
+
+class ReleaseNotes:
+    """The generated release notes of a release."""
+
+    def __init__(self, release, website, github, written=(), missing_docs=()):
+        """Initialize the release notes."""
+        self.release = release
+        # Notes with the tags of the home-assistant.io website.
+        self.website = website
+        # Notes for the GitHub release.
+        self.github = github
+        # Files whose content changed, if the notes were written.
+        self.written = list(written)
+        # Doc items without a page in the documentation checkout.
+        self.missing_docs = sorted(missing_docs)
+
+
+class MilestoneScan:
+    """The classified pull requests of a milestone."""
+
+    def __init__(self, milestone, branch, prs, fetch_time, indexed):
+        """Initialize the milestone scan."""
+        self.milestone = milestone
+        # The branch checked out in the local repository.
+        self.branch = branch
+        # MilestonePR per closed pull request, sorted by number.
+        self.prs = prs
+        # Seconds spent fetching the default branch.
+        self.fetch_time = fetch_time
+        # Seconds spent fetching the merge commits to pick, if fetched.
+        self.commits_fetch_time = None
+        # Commits read to update the PR index.
+        self.indexed = indexed
+
+    @property
+    def to_pick(self):
+        """Return the PickItem of every pull request still to pick."""
+        return [
+            picker.PickItem.from_issue(milestone_pr.issue, milestone_pr.sha)
+            for milestone_pr in self.prs
+            if milestone_pr.status == milestones.STATUS_TO_PICK
+        ]
+
+    def with_status(self, status):
+        """Return the pull requests with a status."""
+        return [
+            milestone_pr for milestone_pr in self.prs if milestone_pr.status == status
+        ]
+
+
+class PickResult:
+    """The outcome of picking the pull requests of a milestone."""
+
+    def __init__(self, scan, success, picked=(), failed=None, check=None, output=()):
+        """Initialize the pick result."""
+        # None when an interrupted pick was resumed.
+        self.scan = scan
+        self.success = success
+        self.picked = list(picked)
+        # The item that stopped the sequence, if any.
+        self.failed = failed
+        # CheckResult per item when only checking.
+        self.check = check
+        # Lines git printed while picking.
+        self.output = list(output)
+
+
+class PRStatus:
+    """Where a pull request of a milestone stands in the release."""
+
+    def __init__(
+        self, number, title, merged, cherry_picked, sha, on_branch, docs_pr, docs_state
+    ):
+        """Initialize the PR status."""
+        self.number = number
+        self.title = title
+        # None if unknown, PRs labelled as cherry picked are not looked up.
+        self.merged = merged
+        self.cherry_picked = cherry_picked
+        self.sha = sha
+        # If the PR landed on the local release branch.
+        self.on_branch = on_branch
+        # Number and state ("open" or "closed") of the linked docs PR.
+        self.docs_pr = docs_pr
+        self.docs_state = docs_state
+
+    def as_dict(self):
+        """Return the status as a dict that can be stored as JSON."""
+        return dict(vars(self))
+
+
+class CreditsResult:
+    """The outcome of a credits crawl."""
+
+    def __init__(self, contributions, names, page_written):
+        """Initialize the credits result."""
+        self.contributions = contributions
+        self.names = names
+        self.page_written = page_written
+
+
+class ReleaseContext:
+    """Shared state for release operations.
+
+    session is a github3 session, created from the stored token on first use
+    if not passed. paths overrides the local checkouts of DEFAULT_PATHS.
+    """
+
+    def __init__(self, session=None, paths=None):
+        """Initialize the context."""
+        self._session = session
+        self.paths = {**DEFAULT_PATHS, **(paths or {})}
+        self._lock = threading.Lock()
+        self._repositories = {}
+        self._prs = {}
+        self._indexes = {}
+        self._contributors = {}
+        self._docs = None
+
+    @property
+    def session(self):
+        """Return the GitHub session."""
+        with self._lock:
+            if self._session is None:
+                from . import github
+
+                self._session = github.get_session()
+            return self._session
+
+    def repository(self, name):
+        """Return a repository of the organization."""
+        session = self.session
+        with self._lock:
+            if name not in self._repositories:
+                self._repositories[name] = session.repository(
+                    GITHUB_ORGANIZATION_NAME, name
+                )
+            return self._repositories[name]
+
+    def prs(self, name="core"):
+        """Return the PR cache of a repository."""
+        repo = self.repository(name)
+        with self._lock:
+            if name not in self._prs:
+                self._prs[name] = model.PRCache(repo)
+            return self._prs[name]
+
+    def local_path(self, name):
+        """Return the local checkout of a repository."""
+        return self.paths.get(name, os.path.join("..", name))
+
+    def pr_index(self, name, branches=()):
+        """Return the updated PR index of a local checkout and the commits read.
+
+        Returns None as index if there is no local checkout.
+        """
+        path = self.local_path(name)
+        if not os.path.isdir(path):
+            return None, 0
+        with self._lock:
+            index, lock = self._indexes.get(path, (None, None))
+            if index is None or not set(branches) <= set(index.extra_branches):
+                index, lock = self._indexes[path] = (
+                    pr_index.PRIndex(path, branches=branches),
+                    threading.Lock(),
+                )
+        # Indexes of different checkouts are updated at the same time.
+        with lock:
+            return index, index.update()
+
+    def contributors(self, name="core"):
+        """Return the updated contributor index of a local checkout.
+
+        Returns None if there is no local checkout.
+        """
+        path = self.local_path(name)
+        if not os.path.isdir(path):
+            return None
+        with self._lock:
+            index = self._contributors.get(path)
+            if index is None:
+                index = self._contributors[path] = contributors.ContributorIndex(path)
+            index.update()
+            return index
+
+    def docs(self):
+        """Return the updated documentation index of the docs checkout.
+
+        Returns None if there is no local checkout.
+        """
+        path = self.local_path("home-assistant.io")
+        if not os.path.isdir(path):
+            return None
+        with self._lock:
+            if self._docs is None:
+                self._docs = docs_index.DocsIndex(path)
+            self._docs.update()
+            return self._docs
+
+    def milestone(self, name, title=None):
+        """Return a milestone by title, or the latest version milestone."""
+        from . import github
+
+        repo = self.repository(name)
+        if title is None:
+            return github.get_latest_version_milestone(repo)
+        return github.get_milestone_by_title(repo, title)
+
+    def generate_notes(self, branch="rc", release=None, write=False):
+        """Generate the release notes of a branch.
+
+        The version is read from the branch if not passed. If write is set,
+        the notes are also written to the data directory.
+        """
+        path = self.local_path("core")
+        if release is None:
+            release = git.get_hass_version(branch, path)
+        return self._render_notes(
+            model.Release(release, branch=branch, repo=path),
+            self.prs("core"),
+            self.contributors("core"),
+            self.docs(),
+            write,
+        )
+
+    def release_range(self, start, end):
+        """Return the released versions from start to end, included.
+
+        The versions are read from the tags of the local core checkout and
+        returned sorted, as (tag, version, base) triples. The base is the tag
+        of the last final release before the version, None if there is none,
+        so each release is compared against the one it follows rather than
+        against master.
+        """
+        from packaging.version import InvalidVersion, Version
+
+        start, end = Version(start), Version(end)
+        tags = []
+        for tag in git.get_tags(self.local_path("core")):
+            try:
+                tags.append((Version(tag), tag))
+            except InvalidVersion:
+                continue
+
+        releases = []
+        base = None
+        for version, tag in sorted(tags):
+            if start <= version <= end:
+                releases.append((tag, str(version), base))
+            if not version.is_prerelease:
+                base = tag
+        return releases
+
+    def generate_notes_batch(self, releases, write=True, workers=NOTES_WORKERS):
+        """Generate the release notes of several releases.
+
+        releases are (branch, version, base) triples, a base of None
+        compares the branch against master. The logs are read first so the
+        PRs of all releases are fetched once, then the releases are rendered
+        concurrently. Yields the ReleaseNotes of every release as soon as it
+        is ready, and written if write is set.
+        """
+        path = self.local_path("core")
+        rels = [
+            model.Release(version, branch=branch, repo=path, base=base)
+            for branch, version, base in releases
+        ]
+        if not rels:
+            return
+        prs = self.prs("core")
+        index = self.contributors("core")
+        docs = self.docs()
+
+        with ThreadPoolExecutor(min(workers, len(rels))) as executor:
+            prs.get_many(
+                {
+                    line.pr
+                    for log_lines in executor.map(model.Release.log_lines, rels)
+                    for line in log_lines
+                    if line.pr is not None
+                }
+            )
+
+            futures = [
+                executor.submit(self._render_notes, rel, prs, index, docs, write)
+                for rel in rels
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _render_notes(self, rel, prs, index, docs, write):
+        """Generate and optionally write the release notes of a release."""
+        missing_docs = set()
+        notes = ReleaseNotes(
+            rel,
+            changelog.generate(
+                rel,
+                prs,
+                website_tags=True,
+                contributors=index,
+                docs=docs,
+                missing_docs=missing_docs,
+            ),
+            changelog.generate(
+                rel, prs, website_tags=False, contributors=index, docs=docs
+            ),
+            missing_docs=missing_docs,
+        )
+        if write:
+            notes.written = changelog.write_text(rel, notes.website, notes.github)
+        return notes
+
+    def classify_milestone(self, name="core", milestone=None, fetch_commits=True):
+        """Classify the pull requests of a milestone against the local branch.
+
+        The default branch and, with fetch_commits, the merge commits to pick
+        are fetched into the local checkout.
+        """
+        repo = self.repository(name)
+        gh_milestone = self.milestone(name, milestone)
+        path = self.local_path(name)
+
+        fetch_time = git.fetch(path, [git.get_default_branch(path)])
+
+        branch = git.get_current_branch(path)
+        index, indexed = self.pr_index(name, [branch])
+        scan = MilestoneScan(
+            gh_milestone,
+            branch,
+            milestones.scan(
+                repo,
+                gh_milestone,
+                index=index,
+                branch=branch,
+                state_file=MILESTONE_SCAN_FILE.format(name, gh_milestone.number),
+            ),
+            fetch_time,
+            indexed,
+        )
+
+        if fetch_commits:
+            # Merge commits unknown to the index may not be in the local
+            # history.
+            scan.commits_fetch_time = git.fetch(
+                path, shas=[item.sha for item in scan.to_pick]
+            )
+        return scan
+
+    def milestone_status(self, name="core", milestone=None):
+        """Return the MilestoneScan and a PRStatus per pull request of a milestone.
+
+        The milestone listing provides the labels and the descriptions, the
+        local PR index the merge commits and the release branch contents,
+        and the open docs PRs are listed once.
+        """
+        scan = self.classify_milestone(name, milestone, fetch_commits=False)
+        index, _ = self.pr_index(name, [scan.branch])
+        docs_pattern = re.compile(DOCS_PR_PATTERN)
+
+        statuses = []
+        for milestone_pr in scan.prs:
+            issue = milestone_pr.issue
+            match = docs_pattern.search(getattr(issue, "body", None) or "")
+            if milestone_pr.status == milestones.STATUS_PICKED:
+                merged = True if milestone_pr.sha else None
+            else:
+                merged = milestone_pr.status != milestones.STATUS_NOT_MERGED
+            statuses.append(
+                PRStatus(
+                    issue.number,
+                    issue.title,
+                    merged,
+                    milestone_pr.status == milestones.STATUS_PICKED,
+                    milestone_pr.sha,
+                    index is not None and index.on_branch(issue.number, scan.branch),
+                    int(match.group(1)) if match else None,
+                    None,
+                )
+            )
+
+        if any(status.docs_pr is not None for status in statuses):
+            open_docs_prs = {
+                docs_pr.number
+                for docs_pr in self.repository("home-assistant.io").pull_requests(
+                    state="open"
+                )
+            }
+            for status in statuses:
+                if status.docs_pr is not None:
+                    status.docs_state = (
+                        "open" if status.docs_pr in open_docs_prs else "closed"
+                    )
+
+        return scan, statuses
+
+    def picker(self, name):
+        """Return a Picker for a repository."""
+        return picker.Picker(self.repository(name), self.local_path(name))
+
+    def pick(self, name="core", milestone=None, check=False, resume=False):
+        """Cherry pick the merged pull requests of a milestone.
+
+        With check, the picks are only simulated. With resume, a pick that
+        stopped on a conflict is continued.
+        """
+        pr_picker = self.picker(name)
+        if resume:
+            success = pr_picker.resume()
+            return PickResult(
+                None,
+                success,
+                pr_picker.picked,
+                pr_picker.failed,
+                output=pr_picker.output,
+            )
+
+        scan = self.classify_milestone(name, milestone)
+        items = scan.to_pick
+        if check:
+            return PickResult(
+                scan, True, check=picker.check(self.local_path(name), items)
+            )
+
+        success = pr_picker.pick(
+            items,
+            {
+                milestone_pr.number: milestone_pr.issue
+                for milestone_pr in scan.with_status(milestones.STATUS_TO_PICK)
+            },
+        )
+        return PickResult(
+            scan, success, pr_picker.picked, pr_picker.failed, output=pr_picker.output
+        )
+
+    def crawl_credits(self, num_simul_requests=63, num_processes=1, no_cache=False):
+        """Crawl the contributors of the organization and write the credits page.
+
+        Nothing is printed. The result holds copies of the crawled data, a
+        later crawl does not change it.
+        """
+        from . import credits as credits_module
+        from .contributions import ContributionMatrix
+
+        page_written = credits_module.generate_credits(
+            num_simul_requests, no_cache, True, num_processes=num_processes
+        )
+        contributions = ContributionMatrix()
+        contributions.merge(credits_module.org_contributors_dict)
+        return CreditsResult(
+            contributions, dict(credits_module.name_by_login), page_written
+        )
@@ -1,6 +1,11 @@
 from collections import OrderedDict
 from datetime import datetime
-from packaging.version import Version
+import functools
+import json
+import pathlib
+
+# Directory the release notes are written to.
+NOTES_DIR = pathlib.Path(__file__).parent.parent / "data"
 
 INFO_TEMPLATE = "([@{0}] - [#{1}])"
 PR_TEMPLATE = "([#{0}])"
@@ -9,14 +14,10 @@ LINK_DEF_USER = "[@{0}]: {1}"
 LINK_DEF_PR = "[#{0}]: {1}"
 GITHUB_LINK_DEF_DOC = "[{0} docs]: https://www.home-assistant.io/integrations/{0}/"
 LINK_DEF_DOC = "[{0} docs]: /integrations/{0}/"
-IGNORE_LINE_LABELS = set(["reverted"])
-LABEL_HEADERS = {
-    "new-integration": "New Integrations",
-    "new-platform": "New Platforms",
-    "breaking-change": "Breaking Changes",
-    "cherry-picked": "Beta Fixes",
-}
-# Handle special cases. None values will be ignored.
+DOCS_SITE = "https://www.home-assistant.io"
+NEW_CONTRIBUTOR_TEMPLATE = "- [@{0}] made their first contribution in [#{1}]"
+# Rules telling how the labels of a PR show up in the release notes.
+LABEL_RULES_FILE = pathlib.Path(__file__).parent / "changelog_labels.json"
 
 WEBSITE_DIVIDER = """## If you need help...
 
@@ -47,59 +48,179 @@ def automation_link(platform, website_tags):
     return format.format(platform, val)
 
 
-LABEL_MAP = {
-    "discovery.": None,
-    "recorder.": None,
-    "automation.": automation_link,
-    "emulated_hue.": None,
-    "homeassistant.": None,
-    "cloud.": lambda pl, _wt: f"[{pl} docs]: https://www.nabucasa.com/config/",
-}
+def integration_link(platform, website_tags):
+    """Return integration doc link."""
+    if website_tags:
+        return LINK_DEF_DOC.format(platform)
+    return GITHUB_LINK_DEF_DOC.format(platform)
 
 
-def _process_doc_label(label, parts, links, website_tags):
-    """Process doc labels."""
-    item = None
+def url_link(url, platform, website_tags):
+    """Return a doc link to a fixed page."""
+    return f"[{platform} docs]: {url}"
 
-    if label.startswith("integration: "):
-        item = label[len("integration: ") :]
 
-    if not item:
-        return
-
-    part = DOC_TEMPLATE.format(item)
+def page_link(page, platform, website_tags):
+    """Return a doc link to a page of the documentation website."""
     if website_tags:
-        link = LINK_DEF_DOC.format(item)
-    else:
-        link = GITHUB_LINK_DEF_DOC.format(item)
+        return f"[{platform} docs]: {page}"
+    return f"[{platform} docs]: {DOCS_SITE}{page}"
+
+
+class LabelClass:
+    """How a label shows up in the release notes."""
+
+    def __init__(
+        self, ignore=False, doc=None, links=None, section=None, missing_docs=None
+    ):
+        """Initialize the label class."""
+        # If the PRs with the label are left out.
+        self.ignore = ignore
+        # The doc reference added to the line and its link definitions, by
+        # website_tags.
+        self.doc = doc
+        self.links = links
+        # The label of the section listing the PRs with the label.
+        self.section = section
+        # The doc item the documentation index has no page for, if any.
+        self.missing_docs = missing_docs
+
+
+class LabelRules:
+    """Label rules compiled for lookups.
+
+    Exact labels are looked up in a dict. The doc rules are matched on the
+    prefix of the integration, by looking up the integration prefixes of
+    every rule length. The first matching rule wins. Labels are classified
+    once, the classes are kept until the documentation index moves.
+
+    With a DocsIndex, integration and automation links point to the pages
+    found in the index. Labels without a page keep their default link, the
+    page may only exist on the branch of the next release, and are marked
+    as missing_docs.
+    """
 
-    for match, action in LABEL_MAP.items():
-        if item.startswith(match):
-            if action is None:
-                # Ignore item completely
-                return
+    LINKS = {"integration": integration_link, "automation": automation_link}
+    # The DocsIndex method looking up the page of a link.
+    DOCS_PAGES = {"integration": "integration_page", "automation": "trigger_page"}
+
+    def __init__(self, rules, docs=None):
+        """Compile the rules."""
+        self.docs = docs
+        self._docs_head = None
+        self.ignore = frozenset(rules.get("ignore", ()))
+        self.sections = OrderedDict(
+            (section["label"], section) for section in rules.get("sections", ())
+        )
+        docs = rules.get("docs", {})
+        self.doc_prefix = docs.get("prefix")
+
+        self._doc_rules = {}
+        for position, rule in enumerate(docs.get("rules", ())):
+            self._doc_rules.setdefault(
+                rule["prefix"], (position, rule["link"], self._link_function(rule))
+            )
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._doc_rules})
+        self._classes = {}
+
+    def _link_function(self, rule):
+        """Return the function formatting the doc links of a rule."""
+        if rule["link"] is None:
+            return None
+        if rule["link"] == "url":
+            return functools.partial(url_link, rule["url"])
+        return self.LINKS[rule["link"]]
+
+    def _doc_rule(self, item):
+        """Return the link kind and function of the first doc rule matching an item."""
+        matches = []
+        for length in self._prefix_lengths:
+            if length > len(item):
+                break
+            match = self._doc_rules.get(item[:length])
+            if match is not None:
+                matches.append(match)
+        if not matches:
+            return "integration", integration_link
+        return min(matches, key=lambda match: match[0])[1:]
+
+    def classify(self, label):
+        """Return the LabelClass of a label."""
+        if self.docs is not None and self.docs.head != self._docs_head:
+            self._classes = {}
+            self._docs_head = self.docs.head
+        label_class = self._classes.get(label)
+        if label_class is None:
+            label_class = self._classes[label] = self._classify(label)
+        return label_class
+
+    def _classify(self, label):
+        """Classify a label."""
+        label_class = LabelClass(
+            ignore=label in self.ignore,
+            section=label if label in self.sections else None,
+        )
+        if self.doc_prefix is None or not label.startswith(self.doc_prefix):
+            return label_class
+
+        item = label[len(self.doc_prefix) :]
+        kind, link = self._doc_rule(item) if item else (None, None)
+        if link is not None and self.docs is not None and kind in self.DOCS_PAGES:
+            page = getattr(self.docs, self.DOCS_PAGES[kind])(item)
+            if page is None:
+                label_class.missing_docs = item
             else:
-                link = action(item, website_tags)
-            break
+                link = functools.partial(page_link, page)
+        if link is not None:
+            label_class.doc = DOC_TEMPLATE.format(item)
+            label_class.links = {
+                website_tags: link(item, website_tags) for website_tags in (False, True)
+            }
+        return label_class
+
+    def release_sections(self, release):
+        """Return the sections of a release, by label."""
+        return OrderedDict(
+            (label, section)
+            for label, section in self.sections.items()
+            if section.get("patch_releases", True) or not release.is_patch_release
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def load_label_rules(path=LABEL_RULES_FILE, docs=None):
+    """Return the compiled label rules of a file, checked against a DocsIndex."""
+    return LabelRules(json.loads(pathlib.Path(path).read_text()), docs)
+
+
+def _process_doc_label(label, parts, links, website_tags):
+    """Process doc labels."""
+    label_class = load_label_rules().classify(label)
+    if label_class.doc is None:
+        return
 
-    parts.append(part)
-    links.add(link)
+    parts.append(label_class.doc)
+    links.add(label_class.links[website_tags])
 
 
-def generate(release, prs, *, website_tags):
+def generate(
+    release, prs, *, website_tags, contributors=None, docs=None, missing_docs=None
+):
     """Generate a changelog.
 
     website_tags: boolean if we should include tags for home-assistant.io
+    contributors: ContributorIndex used to thank the new contributors
+    docs: DocsIndex the doc links are looked up in
+    missing_docs: set the doc items without a page in docs are added to
     """
-    label_groups = OrderedDict()
-    label_groups["new-integration"] = []
-    label_groups["new-platform"] = []
-    label_groups["breaking-change"] = []
-    if release.version.release[-1] == 0:
-        # Only add 'beta fix' for 0-release
-        label_groups["cherry-picked"] = []
+    from packaging.version import Version
+
+    rules = load_label_rules(docs=docs)
+    sections = rules.release_sections(release)
+    label_groups = OrderedDict((label, []) for label in sections)
 
     changes = []
+    new_contributors = OrderedDict()
     links = set()
     for line in release.log_lines():
         parts = ["-", line.message]
@@ -116,10 +237,24 @@ def generate(release, prs, *, website_tags):
         ):  # Ignore beta version tag
             continue
 
-        labels = [label.name for label in pr.labels()]
+        # Classify the labels in one pass, doc references come before the
+        # section suffixes.
+        ignore = False
+        docs = []
+        groups = []
+        # The labels come with the issue, labels() would request them again.
+        for label in pr.original_labels:
+            label_class = rules.classify(label.name)
+            if label_class.ignore:
+                ignore = True
+                break
+            if label_class.doc is not None:
+                docs.append(label_class)
+            if label_class.section in label_groups:
+                groups.append(label_class.section)
 
         # Filter out commits for which the PR has one of the ignored labels
-        if any(label in IGNORE_LINE_LABELS for label in labels):
+        if ignore:
             continue
 
         user = pr.user
@@ -127,22 +262,28 @@ def generate(release, prs, *, website_tags):
         parts.append(INFO_TEMPLATE.format(user.login, pr.number))
         links.add(LINK_DEF_PR.format(pr.number, pr.html_url))
 
-        for label in labels:
-            _process_doc_label(label, parts, links, website_tags)
+        for label_class in docs:
+            parts.append(label_class.doc)
+            links.add(label_class.links[website_tags])
+            if label_class.missing_docs and missing_docs is not None:
+                missing_docs.add(label_class.missing_docs)
 
-        for label in labels:
-            if label in label_groups:
-                if label == "cherry-picked":
-                    parts.append("(beta fix)")
-                else:
-                    parts.append("({})".format(label))
+        for label in groups:
+            parts.append("({})".format(sections[label].get("suffix", label)))
 
         msg = " ".join(parts)
         changes.append(msg)
 
-        for label in labels:
-            if label not in label_groups:
-                continue
+        if (
+            contributors is not None
+            and user.login not in new_contributors
+            and contributors.is_first_contribution(pr.number, user.login, line.email)
+        ):
+            new_contributors[user.login] = NEW_CONTRIBUTOR_TEMPLATE.format(
+                user.login, pr.number
+            )
+
+        for label in groups:
             label_groups[label].append(msg)
 
     outp = []
@@ -157,17 +298,23 @@ def generate(release, prs, *, website_tags):
 
     else:
         for label, prs in label_groups.items():
-            if label == "breaking-change" and website_tags:
+            if sections[label].get("website_divider") and website_tags:
                 outp.append(WEBSITE_DIVIDER)
 
             if not prs:
                 continue
 
-            outp.append(f"## {LABEL_HEADERS[label]}")
+            outp.append(f"## {sections[label]['header']}")
             outp.append("")
             outp.extend(prs)
             outp.append("")
 
+        if new_contributors:
+            outp.append("## New Contributors")
+            outp.append("")
+            outp.extend(new_contributors.values())
+            outp.append("")
+
         outp.append("## All changes")
         outp.append("")
 
@@ -175,3 +322,50 @@ def generate(release, prs, *, website_tags):
     outp.append("")
     outp.extend(sorted(links))
     return "\n".join(outp)
+
+
+def output_files(release, directory=NOTES_DIR):
+    """Return the website and GitHub release notes files of a release."""
+    directory = pathlib.Path(directory).absolute()
+    return (
+        directory / "{}.md".format(release.identifier),
+        directory / "{}-github.md".format(release.identifier),
+    )
+
+
+def write(
+    release, prs, directory=NOTES_DIR, contributors=None, docs=None, missing_docs=None
+):
+    """Write the website and GitHub release notes of a release.
+
+    Returns the files whose content changed.
+    """
+    return write_text(
+        release,
+        generate(
+            release,
+            prs,
+            website_tags=True,
+            contributors=contributors,
+            docs=docs,
+            missing_docs=missing_docs,
+        ),
+        generate(
+            release, prs, website_tags=False, contributors=contributors, docs=docs
+        ),
+        directory,
+    )
+
+
+def write_text(release, website, github, directory=NOTES_DIR):
+    """Write generated website and GitHub release notes of a release.
+
+    Returns the files whose content changed.
+    """
+    written = []
+    for file, text in zip(output_files(release, directory), (website, github)):
+        if file.is_file() and file.read_text() == text:
+            continue
+        file.write_text(text)
+        written.append(file)
+    return written
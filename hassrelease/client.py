@@ -0,0 +1,228 @@
+"""The GitHub client layer shared by all commands."""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+import requests
+from github3.session import GitHubSession
+
+from .const import RATE_LIMIT_FILE
+from .telemetry import CrawlTelemetry
+
+# Connections kept alive per host.
+POOL_SIZE = 10
+# Responses kept to revalidate with their ETag.
+CACHE_SIZE = 1024
+# Connection failures retried by the session, waiting twice as long every time.
+CONNECTION_RETRIES = 4
+CONNECTION_BACKOFF = 1
+RATELIMIT_REMAINING = "X-RateLimit-Remaining"
+RATELIMIT_RESET = "X-RateLimit-Reset"
+RETRY_AFTER = "Retry-After"
+
+
+class RateLimitState:
+    """The rate limit of a token, shared by the processes using it.
+
+    The state is stored as JSON and read and written under an exclusive lock
+    on a lock file next to it, so a process waits as soon as another one
+    exhausted the rate limit instead of burning requests to find out.
+    """
+
+    def __init__(self, path):
+        """Initialize the state."""
+        self.path = pathlib.Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock of the state, yield the stored state."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(self.path.read_text())
+                except (OSError, ValueError):
+                    state = {}
+                yield state
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def wait_time(self, now=None):
+        """Return the seconds to wait before the next request."""
+        now = time.time() if now is None else now
+        with self._locked() as state:
+            available = state.get("blocked_until") or 0
+            if state.get("remaining") == 0:
+                available = max(available, state.get("reset") or 0)
+        return max(available - now, 0)
+
+    def record(self, headers, blocked_until=None):
+        """Store the rate limit of a response.
+
+        blocked_until is the time until which the secondary rate limit
+        refuses requests.
+        """
+        remaining = headers.get(RATELIMIT_REMAINING)
+        reset = headers.get(RATELIMIT_RESET)
+        if remaining is None and blocked_until is None:
+            return
+        with self._locked() as state:
+            if reset is not None:
+                if state.get("reset") != int(reset):
+                    # A new window starts with the full rate limit.
+                    state.pop("remaining", None)
+                state["reset"] = int(reset)
+            if remaining is not None:
+                state["remaining"] = min(
+                    int(remaining), state.get("remaining", int(remaining))
+                )
+            if blocked_until is not None:
+                state["blocked_until"] = max(
+                    blocked_until, state.get("blocked_until") or 0
+                )
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(state))
+            os.replace(tmp_path, self.path)
+
+
+class ClientSession(GitHubSession):
+    """A github3 session pooling connections and sharing the rate limit.
+
+    Requests wait while the rate limit of the token is exhausted, in this or
+    any other process, and are sent again once it is reset. GET responses
+    with an ETag are kept and revalidated, a response that did not change
+    costs no rate limit, a cache_size of 0 keeps none. Every request is
+    recorded in the telemetry.
+    """
+
+    def __init__(
+        self,
+        token=None,
+        pool_size=POOL_SIZE,
+        telemetry=None,
+        quiet=False,
+        cache_size=CACHE_SIZE,
+    ):
+        """Initialize the session."""
+        super().__init__()
+        self.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+        token_id = (
+            hashlib.sha256(token.encode()).hexdigest()[:12] if token else "anonymous"
+        )
+        self.rate_limit = RateLimitState(RATE_LIMIT_FILE.format(token_id))
+        self.telemetry = telemetry or CrawlTelemetry()
+        self.quiet = quiet
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._logged_wait = None
+        if token:
+            self.token_auth(token)
+
+    def request(self, method, url, *args, **kwargs):
+        """Send a request, waiting for the rate limit and revalidating."""
+        headers = dict(kwargs.pop("headers", None) or {})
+        key = None
+        cached = None
+        # Requests with their own ETag handle the revalidation themselves.
+        if self.cache_size and method.upper() == "GET" and not kwargs.get("stream"):
+            if "If-None-Match" not in headers:
+                key = (
+                    url,
+                    json.dumps(kwargs.get("params"), sort_keys=True, default=str),
+                    tuple(sorted(headers.items())),
+                )
+                with self._cache_lock:
+                    cached = self._cache.get(key)
+                if cached is not None:
+                    headers["If-None-Match"] = cached.headers["ETag"]
+
+        response = self._send(method, url, *args, headers=headers, **kwargs)
+
+        if cached is not None:
+            self.telemetry.cache_lookup("responses", response.status_code == 304)
+            if response.status_code == 304:
+                return cached
+        if key is not None and response.status_code == 200:
+            if "ETag" in response.headers:
+                # Read the content before sharing the response.
+                response.content
+                with self._cache_lock:
+                    self._cache[key] = response
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return response
+
+    def _send(self, method, url, *args, **kwargs):
+        """Send a request until it is not refused by the rate limit."""
+        failures = 0
+        while True:
+            wait = self.rate_limit.wait_time()
+            if wait > 0:
+                self._log_wait(wait)
+                time.sleep(wait)
+
+            self.telemetry.request_started()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.exceptions.ConnectionError:
+                self.telemetry.request_failed()
+                if failures == CONNECTION_RETRIES:
+                    raise
+                time.sleep(CONNECTION_BACKOFF * 2**failures)
+                failures += 1
+                continue
+            except Exception:
+                self.telemetry.request_failed()
+                raise
+            self.telemetry.request_finished(
+                time.monotonic() - started, response.headers
+            )
+
+            refused = _refused(response)
+            retry_after = response.headers.get(RETRY_AFTER) if refused else None
+            self.rate_limit.record(
+                response.headers,
+                None if retry_after is None else int(time.time()) + int(retry_after),
+            )
+            if not refused:
+                return response
+
+    def _log_wait(self, wait):
+        """Report waiting for the rate limit, once per wait."""
+        available = int(time.time() + wait)
+        if self.quiet or self._logged_wait == available:
+            return
+        self._logged_wait = available
+        print(
+            "Rate limit exceeded. Retrying in {} (at {})".format(
+                time.strftime("%H:%M:%S", time.gmtime(wait)),
+                time.asctime(time.gmtime(available)),
+            )
+        )
+
+
+def _refused(response):
+    """Test if a response was refused by the rate limit.
+
+    The primary rate limit is exhausted when no requests remain, the
+    secondary rate limit tells when to retry.
+    """
+    return response.status_code in (403, 429) and (
+        RETRY_AFTER in response.headers
+        or (
+            response.headers.get(RATELIMIT_REMAINING) == "0"
+            and RATELIMIT_RESET in response.headers
+        )
+    )
@@ -1,16 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
 import re
-import pathlib
+import time
 
 import click
 
-from . import changelog
-from . import credits as credits_module
-from . import git, github, model, repo_core, repo_frontend
+from . import (
+    api,
+    changelog,
+    contributors,
+    docs_index,
+    git,
+    milestones,
+    model,
+    repo_core,
+    repo_frontend,
+    watcher,
+)
+from .const import CORE_PATH, CREDITS_PAGE, DOCS_PATH, DOCS_PR_PATTERN
 from .core import HassReleaseError
-from .const import LABEL_CHERRY_PICKED
 from .util import open_vscode
 
+# The GitHub clients pull in github3 and requests, which take longer to import
+# than everything else together. They are imported by the commands using them
+# so commands like bump-frontend and --help start quickly.
+
+
+def _docs_index():
+    """Return the updated documentation index, None without a docs checkout."""
+    if not os.path.isdir(DOCS_PATH):
+        print(f"No documentation found in {DOCS_PATH}, doc links are not checked")
+        return None
+    docs = docs_index.DocsIndex(DOCS_PATH)
+    read = docs.update()
+    print(f"Indexed {read} changed documentation pages")
+    return docs
+
+
+def _print_missing_docs(missing_docs):
+    """Print the doc items without a documentation page."""
+    if missing_docs:
+        print("No documentation found for:", ", ".join(sorted(missing_docs)))
+
 
 @click.group()
 def cli():
@@ -22,6 +54,8 @@ def cli():
 @click.option("--force-update/--no-force-update", default=False)
 @click.option("--release", default=None)
 def release_notes(branch, force_update, release):
+    from . import github
+
     if release is None:
         release = git.get_hass_version(branch)
         print("Auto detected version", release)
@@ -31,18 +65,28 @@ def release_notes(branch, force_update, release):
     )
 
     rel = model.Release(release, branch=branch)
-    repo_root = pathlib.Path(__file__).parent.parent
-    file_website = (repo_root / "data/{}.md".format(rel.identifier)).absolute()
-    file_github = (repo_root / "data/{}-github.md".format(rel.identifier)).absolute()
+    file_website, file_github = changelog.output_files(rel)
 
     if force_update or not file_website.is_file():
+        elapsed = git.fetch(CORE_PATH, ["master"])
+        print(f"Fetched master in {elapsed:.1f}s")
+
         gh_session = github.get_session()
         repo = gh_session.repository("home-assistant", "home-assistant")
         prs = model.PRCache(repo)
 
-        for file, website_tags in (file_website, True), (file_github, False):
-            print("Writing", file)
-            file.write_text(changelog.generate(rel, prs, website_tags=website_tags))
+        index = contributors.ContributorIndex(CORE_PATH)
+        read = index.update()
+        print(f"Indexed the contributors of {read} new commits")
+        docs = _docs_index()
+
+        missing_docs = set()
+        written = changelog.write(
+            rel, prs, contributors=index, docs=docs, missing_docs=missing_docs
+        )
+        for file in file_website, file_github:
+            print("Writing" if file in written else "Unchanged", file)
+        _print_missing_docs(missing_docs)
     else:
         print("Found existing files")
         print(file_website)
@@ -51,24 +95,69 @@ def release_notes(branch, force_update, release):
     open_vscode(file_website, file_github)
 
 
-@cli.command(help="Cherry pick all merged PRs into the current branch.")
-@click.argument(
-    "repo", default="hass", type=click.Choice(["hass", "docs", "frontend", "d", "f"])
+@cli.command(
+    help="Generate the release notes of several releases. RELEASES are version "
+    "tags like 2026.10.1, ranges of version tags like 2026.10.0..2026.10.5 or "
+    "branch:version pairs like rc:2026.11.0b0."
+)
+@click.argument("releases", nargs=-1, required=True)
+@click.option(
+    "--workers",
+    default=api.NOTES_WORKERS,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Releases rendered simultaneously",
 )
+def release_notes_batch(releases, workers):
+    context = api.ReleaseContext()
+    path = context.local_path("core")
+
+    elapsed = git.fetch(path, ["master"])
+    print(f"Fetched master in {elapsed:.1f}s")
+
+    targets = []
+    for spec in releases:
+        if ".." in spec:
+            start, _, end = spec.partition("..")
+            in_range = context.release_range(start, end)
+            if not in_range:
+                raise HassReleaseError(f"No release tags found from {start} to {end}")
+            targets.extend(in_range)
+        elif ":" in spec:
+            branch, _, version = spec.partition(":")
+            targets.append((branch, version, None))
+        else:
+            targets.extend(context.release_range(spec, spec) or [(spec, spec, None)])
+
+    start = time.monotonic()
+    for notes in context.generate_notes_batch(targets, workers=workers):
+        for file in changelog.output_files(notes.release):
+            print("Writing" if file in notes.written else "Unchanged", file)
+        _print_missing_docs(notes.missing_docs)
+    print(
+        f"Generated the notes of {len(targets)} releases "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+
+
+@cli.command(help="Regenerate the release notes whenever the release changes.")
+@click.option("--branch", default="rc")
 @click.option("--milestone", default=None)
-def pick(repo, milestone):
-    if repo == "hass":
-        remote_repository = "core"
-    elif repo in ("f", "frontend"):
-        remote_repository = "frontend"
-    elif repo in ("d", "docs"):
-        remote_repository = "home-assistant.io"
+@click.option("--release", default=None)
+@click.option(
+    "--interval",
+    default=watcher.POLL_INTERVAL,
+    type=click.FloatRange(min=1),
+    show_default=True,
+    help="Seconds between two checks for changes",
+)
+def watch(branch, milestone, release, interval):
+    from github3.exceptions import GitHubException
 
-    print("Repository", remote_repository)
+    from . import github
 
-    local_repository = f"../{remote_repository}"
     gh_session = github.get_session()
-    repo = gh_session.repository("home-assistant", remote_repository)
+    repo = gh_session.repository("home-assistant", "home-assistant")
 
     if milestone is None:
         gh_milestone = github.get_latest_version_milestone(repo)
@@ -76,71 +165,275 @@ def pick(repo, milestone):
     else:
         gh_milestone = github.get_milestone_by_title(repo, milestone)
 
-    git.fetch(local_repository)
+    release_watcher = watcher.ReleaseWatcher(
+        repo,
+        gh_milestone,
+        branch,
+        release,
+        contributors=contributors.ContributorIndex(CORE_PATH),
+        docs=_docs_index(),
+    )
+    print(f"Watching {branch} and milestone {gh_milestone.title}, Ctrl+C to stop")
 
-    existing = []
-    to_pick = []
+    while True:
+        start = time.monotonic()
+        try:
+            written = release_watcher.poll()
+        except GitHubException as err:
+            print("Checking GitHub failed, retrying:", err)
+            written = None
+
+        if written is not None:
+            print(
+                f"{time.strftime('%H:%M:%S')} Regenerated the release notes "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+            for file in written:
+                print("Updated", file)
+            _print_missing_docs(release_watcher.missing_docs)
+
+        time.sleep(interval)
 
-    for issue in sorted(
-        repo.issues(milestone=gh_milestone.number, state="closed"),
-        key=lambda issue: issue.number,
-    ):
-        if not issue.pull_request_urls:
-            continue
 
-        existing.append(issue)
+# GitHub repository picked from, by the name used on the command line.
+PICK_REPOSITORIES = {
+    "hass": "core",
+    "frontend": "frontend",
+    "f": "frontend",
+    "docs": "home-assistant.io",
+    "d": "home-assistant.io",
+}
+
+
+@cli.command(help="Cherry pick all merged PRs into the current branch.")
+@click.argument("repos", nargs=-1, type=click.Choice(list(PICK_REPOSITORIES)))
+@click.option(
+    "--all", "all_repos", is_flag=True, help="Pick in core, frontend and docs"
+)
+@click.option("--milestone", default=None)
+@click.option(
+    "--continue",
+    "resume",
+    is_flag=True,
+    help="Continue an interrupted pick after resolving the conflict",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Only report which PRs would conflict, without picking anything",
+)
+def pick(repos, all_repos, milestone, resume, check):
+    if all_repos:
+        repos = ("hass", "frontend", "docs")
+    elif not repos:
+        repos = ("hass",)
+    # Repository names by command line name, without duplicates.
+    remote_repositories = {}
+    for repo in repos:
+        remote_repositories.setdefault(PICK_REPOSITORIES[repo], repo)
+
+    context = api.ReleaseContext()
+
+    if not resume:
+        for remote_repository in remote_repositories:
+            state_file = context.picker(remote_repository).state_file
+            if state_file.is_file():
+                print("Discarding the interrupted pick in", state_file)
+
+    # The repositories are independent, each is scanned, fetched and picked
+    # in its own thread. Picks within a repository keep their order.
+    start = time.monotonic()
+    with ThreadPoolExecutor(len(remote_repositories)) as executor:
+        futures = {
+            remote_repository: executor.submit(
+                context.pick, remote_repository, milestone, check, resume
+            )
+            for remote_repository in remote_repositories
+        }
+    elapsed = time.monotonic() - start
 
-        if any(label.name == LABEL_CHERRY_PICKED for label in issue.labels()):
-            print(f"Already cherry picked: {issue.title} (#{issue.number})")
+    errors = []
+    for remote_repository, future in futures.items():
+        print()
+        print(f"== Repository {remote_repository} ==")
+        print()
+        try:
+            result = future.result()
+        # Report the other repositories whatever failed in this one.
+        except Exception as err:
+            print("Failed:", err)
+            errors.append(f"{remote_repository}: {err}")
             continue
 
-        pull = repo.pull_request(issue.number)
+        _print_pick_result(context, remote_repository, milestone, result)
 
-        if not pull.is_merged():
-            print("Not merged yet:", pull.title)
+        if result.success:
             continue
+        local_repository = context.local_path(remote_repository)
+        if result.failed is None:
+            errors.append(f"{remote_repository}: Cherry picking failed")
+        else:
+            errors.append(
+                f"{remote_repository}: Cherry picking {result.failed.title} "
+                f"(#{result.failed.number}) failed. Resolve the conflict in "
+                f"{local_repository} and run `hassrelease pick "
+                f"{remote_repositories[remote_repository]} --continue`"
+            )
+
+    print()
+    print(f"Finished {len(remote_repositories)} repositories in {elapsed:.1f}s")
+
+    if errors:
+        print()
+        raise HassReleaseError("\n".join(errors))
+
+
+def _print_pick_result(context, remote_repository, milestone, result):
+    """Print the report of the pick of one repository."""
+    scan = result.scan
+
+    if scan is not None:
+        local_repository = context.local_path(remote_repository)
+        if milestone is None:
+            print("No milestone passed in. Found", scan.milestone.title)
+        print(f"Fetched the default branch in {scan.fetch_time:.1f}s")
+        if scan.commits_fetch_time is not None:
+            print(f"Fetched the merge commits in {scan.commits_fetch_time:.1f}s")
+        if scan.indexed:
+            print(f"Indexed {scan.indexed} commits of {local_repository}")
+
+        existing = []
+
+        for milestone_pr in scan.prs:
+            issue = milestone_pr.issue
+
+            if milestone_pr.status == milestones.STATUS_PICKED:
+                print(f"Already cherry picked: {issue.title} (#{issue.number})")
+                existing.append(issue)
+            elif milestone_pr.status == milestones.STATUS_ON_BRANCH:
+                print(f"Already on {scan.branch}: {issue.title} (#{issue.number})")
+                existing.append(issue)
+            elif milestone_pr.status == milestones.STATUS_NOT_MERGED:
+                print("Not merged yet:", issue.title)
+                existing.append(issue)
 
-        existing.remove(issue)
-        to_pick.append((pull, issue))
+        print()
+
+        if result.check is not None:
+            _print_pick_check(result.check)
+            return
+
+    attempted = list(result.picked)
+    if result.failed is not None:
+        attempted.append(result.failed)
+    for item in attempted:
+        print(
+            f"Cherry picking {item.title} (https://www.github.com/home-assistant/"
+            f"{remote_repository}/pull/{item.number})"
+        )
+    if attempted:
+        print()
+    if result.output:
+        print("".join(result.output))
+
+    if scan is not None:
+        print("Previously Picked")
+        print()
+        for issue in existing:
+            print(f"- {issue.title} (@{issue.user.login} - #{issue.number})")
+        print()
 
+    print("Just Picked")
     print()
+    for item in result.picked:
+        print(f"- {item.title} (@{item.login} - #{item.number})")
 
-    failed_pick = None
-    caught_err = None
 
-    try:
-        for pull, issue in to_pick:
-            print(
-                f"Cherry picking {pull.title} (https://www.github.com/home-assistant/{remote_repository}/pull/{pull.number})"
+def _print_pick_check(results):
+    """Print the outcome of a pre-flight pick check."""
+    conflicting = [result for result in results if result.conflicts]
+
+    for result in conflicting:
+        item = result.item
+        if result.conflicting_picks:
+            with_text = ", ".join(
+                f"#{earlier.number}" for earlier in result.conflicting_picks
+            )
+        else:
+            with_text = "the current branch"
+        print(
+            f"- {item.title} (#{item.number}) conflicts with {with_text} "
+            f"in {', '.join(result.conflicts)}"
+        )
+
+    if conflicting:
+        print()
+        print(f"{len(conflicting)} of {len(results)} PRs will conflict")
+    else:
+        print(f"All {len(results)} PRs apply cleanly")
+
+
+@cli.command(help="Show where every PR of a milestone stands.")
+@click.argument("repo", default="hass", type=click.Choice(list(PICK_REPOSITORIES)))
+@click.option("--milestone", default=None)
+@click.option("--json", "as_json", is_flag=True, help="Print the status as JSON")
+def status(repo, milestone, as_json):
+    remote_repository = PICK_REPOSITORIES[repo]
+    context = api.ReleaseContext()
+    telemetry = context.session.session.telemetry
+    requests_before = telemetry.snapshot()["requests"]
+
+    start = time.monotonic()
+    scan, statuses = context.milestone_status(remote_repository, milestone)
+    elapsed = time.monotonic() - start
+    requests_made = telemetry.snapshot()["requests"] - requests_before
+
+    if as_json:
+        print(
+            json.dumps(
+                {
+                    "milestone": scan.milestone.title,
+                    "branch": scan.branch,
+                    "prs": [pr_status.as_dict() for pr_status in statuses],
+                },
+                indent=2,
             )
-            git.cherry_pick(pull.merge_commit_sha, local_repository)
-            print()
-            issue.add_labels(LABEL_CHERRY_PICKED)
-    except HassReleaseError as err:
-        failed_pick = pull
-        caught_err = err
+        )
+        return
 
+    print(f"Milestone {scan.milestone.title}, local branch {scan.branch}")
     print()
-    print("Previously Picked")
-    print()
-    for issue in existing:
-        print(f"- {issue.title} (@{issue.user.login} - #{issue.number})")
-    print()
-    print("Just Picked")
+    print(
+        f"{'PR':>7}  {'Merged':<7} {'Picked':<7} {'SHA':<10} {'On branch':<10} "
+        f"{'Docs':<14} Title"
+    )
+    for pr_status in statuses:
+        docs = (
+            f"#{pr_status.docs_pr} {pr_status.docs_state}"
+            if pr_status.docs_pr is not None
+            else "-"
+        )
+        print(
+            f"#{pr_status.number:>6}  {_yes_no(pr_status.merged):<7} "
+            f"{_yes_no(pr_status.cherry_picked):<7} {(pr_status.sha or '-')[:10]:<10} "
+            f"{_yes_no(pr_status.on_branch):<10} {docs:<14} {pr_status.title}"
+        )
     print()
-    for pull, _ in to_pick:
-        if failed_pick is not None and failed_pick == pull:
-            break
-        print(f"- {pull.title} (@{pull.user.login} - #{pull.number})")
+    print(f"{len(statuses)} PRs in {elapsed:.1f}s with {requests_made} GitHub requests")
 
-    if caught_err:
-        print()
-        raise caught_err
+
+def _yes_no(value):
+    """Format an optional boolean for a table."""
+    if value is None:
+        return "?"
+    return "yes" if value else "no"
 
 
 @cli.command(help="Mark merged PRs as cherry picked and closes milestone.")
 @click.option("--milestone", default=None)
 def milestone_close(milestone):
+    from . import github
+
     gh_session = github.get_session()
     repo = gh_session.repository("home-assistant", "home-assistant")
 
@@ -157,16 +450,24 @@ def milestone_close(milestone):
 @click.option("--repository", default="home-assistant")
 @click.argument("title")
 def milestone_list_commits(repository, title):
-    gh_session = github.get_session()
-    repo = gh_session.repository("home-assistant", repository)
-    milestone = github.get_milestone_by_title(repo, title)
+    context = api.ReleaseContext()
+    repo = context.repository(repository)
+    milestone = context.milestone(repository, title)
 
+    index, indexed = context.pr_index(repository)
+    if indexed:
+        print(f"Indexed {indexed} commits of {context.local_path(repository)}")
     commits = []
 
     for issue in sorted(
         repo.issues(milestone=milestone.number, state="closed"),
         key=lambda issue: issue.number,
     ):
+        sha = index.merge_commit(issue.number) if index is not None else None
+        if sha is not None:
+            commits.append(sha)
+            continue
+
         pull = repo.pull_request(issue.number)
 
         if pull.is_merged():
@@ -179,26 +480,34 @@ def milestone_list_commits(repository, title):
 @click.option("--branch", default="rc")
 @click.argument("release")
 def unmerged_docs(branch, release):
-    docs_pr_ptrn = re.compile(r"home-assistant/home-assistant.github.io#(\d+)")
+    from . import github
+
+    docs_pr_ptrn = re.compile(DOCS_PR_PATTERN)
     gh_session = github.get_session()
     repo = gh_session.repository("home-assistant", "home-assistant")
     docs_repo = gh_session.repository("home-assistant", "home-assistant.github.io")
     release = model.Release(release, branch=branch)
     prs = model.PRCache(repo)
-    doc_prs = model.PRCache(docs_repo)
 
-    for line in release.log_lines():
-        if line.pr is None:
-            continue
-
-        pr = prs.get(line.pr)
+    linked = []
+    for pr in prs.get_many(
+        [line.pr for line in release.log_lines() if line.pr is not None]
+    ):
         match = docs_pr_ptrn.search(pr.body_text)
-        if not match:
-            continue
+        if match:
+            linked.append((pr, int(match.groups()[0])))
+
+    # One listing of the open docs PRs instead of a request per linked PR.
+    open_docs_prs = (
+        {docs_pr.number: docs_pr for docs_pr in docs_repo.pull_requests(state="open")}
+        if linked
+        else {}
+    )
 
-        docs_pr = doc_prs.get(match.groups()[0])
+    for pr, docs_number in linked:
+        docs_pr = open_docs_prs.get(docs_number)
 
-        if docs_pr.state == "closed":
+        if docs_pr is None:
             continue
 
         print(pr.title)
@@ -206,17 +515,23 @@ def unmerged_docs(branch, release):
         print()
 
 
-@cli.command(
-    help="Generate credits page"
-    " (../home-assistant.io/source/developers/credits.markdown)"
-)
+@cli.command(help=f"Generate credits page ({CREDITS_PAGE})")
 @click.option(
     "-r",
     "--simul-requests",
     default=63,
     type=click.IntRange(min=1),
     show_default=True,
-    help="Defines how many API requests can be " "performed simultaneously",
+    help="Defines how many API requests can be "
+    "performed simultaneously (per process)",
+)
+@click.option(
+    "-p",
+    "--processes",
+    default=1,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Split the repositories over this many worker processes",
 )
 @click.option(
     "-c",
@@ -225,8 +540,29 @@ def unmerged_docs(branch, release):
     help="Do not use the locally cached name-by-login and " "login-by-email files",
 )
 @click.option("-q", "--quiet", is_flag=True, help="Suppress console logging")
-def credits(simul_requests, no_cache, quiet):
-    credits_module.generate_credits(simul_requests, no_cache, quiet)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Periodically write the crawl metrics to this file in the OpenMetrics "
+    "text format",
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(min=0, max=65535),
+    help="Serve the crawl metrics on http://127.0.0.1:<port>/metrics",
+)
+def credits(simul_requests, processes, no_cache, quiet, metrics_file, metrics_port):
+    from . import credits as credits_module
+
+    credits_module.generate_credits(
+        simul_requests,
+        no_cache,
+        quiet,
+        metrics_file,
+        metrics_port,
+        processes,
+        output=print,
+    )
 
 
 @cli.command(help="Bump frontend in hass.")
@@ -260,8 +596,12 @@ def bump_frontend(feature_branch, create_branch):
     if create_branch:
         git.create_branch(repo_core.PATH, branch_name)
 
-    repo_core.update_frontend_version(frontend)
-    repo_core.gen_requirements_all()
+    changed = repo_core.bump_frontend_version(frontend)
+    if changed is None:
+        print("Regenerated the requirements")
+    else:
+        for file in changed:
+            print("Updated", file)
     repo_core.commit_all(f"Update frontend to {frontend}")
 
     if git.is_dirty(repo_core.PATH):
@@ -1,11 +1,35 @@
 """Constants for the Home Assistant release helper tool."""
 
+import os
+
+# Environment variables overriding the local checkouts of the repositories.
+CORE_PATH_ENV = "HASSRELEASE_CORE"
+FRONTEND_PATH_ENV = "HASSRELEASE_FRONTEND"
+DOCS_PATH_ENV = "HASSRELEASE_DOCS"
+CORE_PATH = os.environ.get(CORE_PATH_ENV, "../core")
+FRONTEND_PATH = os.environ.get(FRONTEND_PATH_ENV, "../frontend")
+DOCS_PATH = os.environ.get(DOCS_PATH_ENV, "../home-assistant.io")
+
 TOKEN_FILE = ".token"
 # TODO replace with a single file with 3 columns?
 LOGIN_BY_EMAIL_FILE = "data/login_by_email.csv"
 NAME_BY_LOGIN_FILE = "data/name_by_login.csv"
 NOTES_FILE = "notes.txt"
 LABEL_CHERRY_PICKED = "cherry-picked"
+# Picks left by an interrupted cherry-pick sequence, per repository.
+PICK_STATE_FILE = "data/pick-{}.json"
+# Classification of the PRs of a milestone, per repository and milestone.
+MILESTONE_SCAN_FILE = "data/milestone-{}-{}.json"
+# Index of the PRs merged into a local repository, per repository.
+PR_INDEX_FILE = "data/pr-index-{}.json"
+# First contribution of every author of a local repository, per repository.
+CONTRIBUTOR_INDEX_FILE = "data/contributors-{}.json"
+# Pages of the local documentation checkout.
+DOCS_INDEX_FILE = "data/docs-index.json"
 GITHUB_ORGANIZATION_NAME = "home-assistant"
+# Rate limit of a GitHub token shared by the running processes, per token.
+RATE_LIMIT_FILE = "data/rate-limit-{}.json"
+# Reference to a documentation PR in the description of a PR.
+DOCS_PR_PATTERN = r"home-assistant/home-assistant\.(?:github\.)?io(?:#|/pull/)(\d+)"
 CREDITS_TEMPLATE_FILE = "hassrelease/credits.mustache"
-CREDITS_PAGE = "../home-assistant.io/source/developers/credits.markdown"
+CREDITS_PAGE = os.path.join(DOCS_PATH, "source/developers/credits.markdown")
@@ -0,0 +1,106 @@
+"""Compact storage of the contributions made to the organization."""
+
+from array import array
+import threading
+
+
+class ContributionMatrix:
+    """Sparse user x repository matrix of contribution counts.
+
+    Logins and repository names are interned once and referred to by integer
+    ids. Contributions are appended as (user, repo, count) triples to three
+    parallel arrays; triples for the same cell are summed in bulk when the
+    matrix is ranked.
+    """
+
+    def __init__(self):
+        """Initialize an empty matrix."""
+        self.logins = []
+        self.repos = []
+        self._login_ids = {}
+        self._repo_ids = {}
+        self._rows = array("I")
+        self._cols = array("I")
+        self._counts = array("I")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of users with contributions."""
+        return len(self.logins)
+
+    def __contains__(self, login):
+        """Test if a user has contributions."""
+        return login in self._login_ids
+
+    def _intern_login(self, login):
+        """Return the id of a login, assigning a new one if needed."""
+        row = self._login_ids.get(login)
+        if row is None:
+            row = self._login_ids[login] = len(self.logins)
+            self.logins.append(login)
+        return row
+
+    def _intern_repo(self, repo):
+        """Return the id of a repository, assigning a new one if needed."""
+        col = self._repo_ids.get(repo)
+        if col is None:
+            col = self._repo_ids[repo] = len(self.repos)
+            self.repos.append(repo)
+        return col
+
+    def add(self, login, repo, count):
+        """Add contributions of a user to a repository."""
+        with self._lock:
+            self._rows.append(self._intern_login(login))
+            self._cols.append(self._intern_repo(repo))
+            self._counts.append(count)
+
+    def merge(self, other):
+        """Add all contributions of another matrix."""
+        with self._lock:
+            logins = [self._intern_login(login) for login in other.logins]
+            repos = [self._intern_repo(repo) for repo in other.repos]
+            self._rows.extend(logins[row] for row in other._rows)
+            self._cols.extend(repos[col] for col in other._cols)
+            self._counts.extend(other._counts)
+
+    def __getstate__(self):
+        """Return the state to pickle, without the lock."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled matrix."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """Yield (login, total, [(repo, count), ...]) for every user.
+
+        Users are yielded in the order they first contributed. Repositories
+        are ranked by descending count, then by name, so the ranking doesn't
+        depend on the order in which the contributions were crawled.
+        """
+        # Bucket the writes per user in one pass, summing writes to the
+        # same cell. Buckets only live while the ranking is consumed.
+        cells_by_row = [None] * len(self.logins)
+        for row, col, count in zip(self._rows, self._cols, self._counts):
+            cells = cells_by_row[row]
+            if cells is None:
+                cells_by_row[row] = {col: count}
+            else:
+                cells[col] = cells.get(col, 0) + count
+
+        logins = self.logins
+        repos = self.repos
+        for row, cells in enumerate(cells_by_row):
+            cells_by_row[row] = None
+            if len(cells) == 1:
+                ((col, count),) = cells.items()
+                yield logins[row], count, [(repos[col], count)]
+                continue
+            yield logins[row], sum(cells.values()), sorted(
+                [(repos[col], count) for col, count in cells.items()],
+                key=lambda repo_count: (-repo_count[1], repo_count[0]),
+            )
@@ -0,0 +1,123 @@
+"""Local index of the first contribution of every author of a repository."""
+
+import json
+import os
+import pathlib
+
+from . import git
+from .const import CONTRIBUTOR_INDEX_FILE, LOGIN_BY_EMAIL_FILE
+from .pr_index import FIELD_SEPARATOR, subject_pr
+from .util import read_csv_to_dict
+
+
+class ContributorIndex:
+    """Map author emails to their first PR merged into the default branch.
+
+    The index is stored as JSON and updated incrementally from the tip of
+    the default branch seen on the previous update. Logins are resolved
+    through the login_by_email data of the credits, so authors committing
+    with several emails are known by their first PR under any of them.
+    """
+
+    def __init__(self, local_repository, path=None, login_by_email=None):
+        """Initialize the index, loading it from disk if it exists.
+
+        login_by_email is read from the credits data if not passed.
+        """
+        self.local_repository = local_repository
+        self.path = pathlib.Path(
+            path
+            or CONTRIBUTOR_INDEX_FILE.format(
+                os.path.basename(os.path.normpath(local_repository))
+            )
+        )
+        if login_by_email is None:
+            try:
+                login_by_email = read_csv_to_dict(LOGIN_BY_EMAIL_FILE)
+            except OSError:
+                login_by_email = {}
+        self.login_by_email = login_by_email
+        self.main_branch = None
+        self.tip = None
+        self.first = {}
+        self._by_login = None
+
+        if self.path.is_file():
+            data = json.loads(self.path.read_text())
+            self.main_branch = data["main_branch"]
+            self.tip = data["tip"]
+            self.first = data["first"]
+
+    def update(self):
+        """Index the commits added to the default branch since the last update.
+
+        Returns the number of commits read.
+        """
+        repo = git.get_repo(self.local_repository)
+        main_branch, tip = git.get_main_branch(self.local_repository)
+        if tip == self.tip and main_branch == self.main_branch:
+            return 0
+
+        revision_range = tip
+        if main_branch == self.main_branch and repo.is_ancestor(self.tip, tip):
+            revision_range = "{}..{}".format(self.tip, tip)
+        else:
+            # First update or rewritten branch, index it again.
+            self.first = {}
+
+        output = repo.run(
+            "log",
+            "--reverse",
+            "--no-merges",
+            "--format=%H{0}%ae{0}%at{0}%s".format(FIELD_SEPARATOR),
+            revision_range,
+            error="Failed indexing the contributors of {}".format(
+                self.local_repository
+            ),
+        )
+
+        lines = output.splitlines()
+        for line in lines:
+            sha, email, timestamp, subject = line.split(FIELD_SEPARATOR, 3)
+            number = subject_pr(subject)
+            if number is not None and email not in self.first:
+                self.first[email] = {
+                    "pr": number,
+                    "sha": sha,
+                    "time": int(timestamp),
+                }
+
+        self.main_branch = main_branch
+        self.tip = tip
+        self._by_login = None
+        self.save()
+        return len(lines)
+
+    def save(self):
+        """Store the index."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {"main_branch": self.main_branch, "tip": self.tip, "first": self.first}
+            )
+        )
+
+    def first_pr(self, login=None, email=None):
+        """Return the number of the first PR of an author, None if unknown."""
+        if self._by_login is None:
+            by_login = {}
+            for author_email, first in self.first.items():
+                author_login = self.login_by_email.get(author_email)
+                if author_login and (
+                    author_login not in by_login
+                    or first["time"] < by_login[author_login]["time"]
+                ):
+                    by_login[author_login] = first
+            self._by_login = by_login
+
+        first = self._by_login.get(login) or self.first.get(email)
+        return first["pr"] if first else None
+
+    def is_first_contribution(self, number, login=None, email=None):
+        """Test if a PR is the first contribution of its author."""
+        return self.first_pr(login, email) == number
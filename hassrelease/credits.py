@@ -1,43 +1,50 @@
 """Create the credits page for home-assistant.io."""
 
-import re
-import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import threading
 import time
-from collections import defaultdict
 from queue import Queue
 
-import pystache
-
+from . import credits_page
+from .emails import EmailResolver
+from .contributions import ContributionMatrix
 from .const import (
     CREDITS_PAGE,
-    CREDITS_TEMPLATE_FILE,
     GITHUB_ORGANIZATION_NAME,
     LOGIN_BY_EMAIL_FILE,
     NAME_BY_LOGIN_FILE,
     TOKEN_FILE,
 )
 from .github import MyGitHub
+from .telemetry import CrawlTelemetry, ShardedTelemetry, serve_openmetrics
+from .util import read_csv_to_dict
 
 # TODO rewrite globals using partial?
-# Dict structure:
-# {
-#     <user_login>: {
-#         <repo_name>: <num_contributions_to_this_repo>,
-#         <other_repo_name>: <num_contributions_to_other_repo>
-#         ...
-#     },
-#     <other_user_login>: {
-#         ...
-#     }
-#     ...
-# }
-org_contributors_dict = defaultdict(dict)
+# Number of contributions per user login and repository name.
+org_contributors_dict = ContributionMatrix()
 name_by_login = {}
 login_by_email = {}
+# Resolves anonymous contributor emails before asking the API.
+email_resolver = EmailResolver(login_by_email)
 requests_tasks = Queue()  # Elements' type - RequestTask.
 gh = None
+telemetry = CrawlTelemetry()
+# Called with the lines generate_credits reports, set by generate_credits.
+log = print
 default_per_page = 100
+# Characters escaped with a backslash in names on the credits page.
+MARKDOWN_ESCAPES = str.maketrans({char: "\\" + char for char in "\\`*_{}[]()#+,-.!~|"})
+
+
+def _discard(*args):
+    """Drop the lines reported without an output."""
+
+
+def enqueue(task):
+    """Put a task in the requests queue."""
+    telemetry.task_queued(type(task).__name__)
+    requests_tasks.put(task)
 
 
 # TODO make RequestTasks construct URL by themselves
@@ -89,15 +96,9 @@ class ReposPageTask(RequestTask):
         if next_page_url_dict is not None:
             next_page_url = next_page_url_dict["url"]
             new_task = ReposPageTask(next_page_url)
-            requests_tasks.put(new_task)
+            enqueue(new_task)
         for repo in self.response.json():
-            new_task = ContributorsPageTask(
-                repo["contributors_url"],
-                repo,
-                anon="true",
-                per_page=str(default_per_page),
-            )
-            requests_tasks.put(new_task)
+            enqueue(ContributorsPageTask.for_repo(repo))
 
 
 class ContributorsPageTask(RequestTask):
@@ -108,6 +109,16 @@ class ContributorsPageTask(RequestTask):
         super().__init__(contributors_page_url, **params)
         self.repo = repo
 
+    @classmethod
+    def for_repo(cls, repo: dict):
+        """Create the task for the first contributors page of a repo."""
+        return cls(
+            repo["contributors_url"],
+            repo,
+            anon="true",
+            per_page=str(default_per_page),
+        )
+
     def handle(self):
         """Process contributors, list them in the org_contributors_dict.
 
@@ -136,59 +147,75 @@ class ContributorsPageTask(RequestTask):
         if next_page_url_dict is not None:
             next_page_url = next_page_url_dict["url"]
             new_task = ContributorsPageTask(next_page_url, self.repo)
-            requests_tasks.put(new_task)
+            enqueue(new_task)
         for contr in self.response.json():
             if contr["type"] == "User":
-                if contr["login"] not in name_by_login:
+                known_name = contr["login"] in name_by_login
+                telemetry.cache_lookup("name_by_login", known_name)
+                if not known_name:
                     # Requesting contributor's profile page to know his name.
-                    new_task = ResolveNameByProfile(contr["url"])
-                    requests_tasks.put(new_task)
-                org_contributors_dict[contr["login"]][self.repo["name"]] = contr[
-                    "contributions"
-                ]
+                    new_task = ResolveNameByProfile(contr["url"], contr["login"])
+                    enqueue(new_task)
+                org_contributors_dict.add(
+                    contr["login"], self.repo["name"], contr["contributions"]
+                )
             # contr['type'] == 'Anonymous'
             # Anonymous contributions might not have an email
             elif "email" in contr:
                 login = login_by_email.get(contr["email"])
+                telemetry.cache_lookup("login_by_email", login is not None)
+                if login is None:
+                    # Noreply emails carry the login or the account ID, and
+                    # the local history may know the author name of the email.
+                    login, name = email_resolver.resolve(contr["email"])
+                    telemetry.cache_lookup("email_resolver", login is not None)
+                    if login is not None:
+                        login_by_email[contr["email"]] = login
+                        if name is not None:
+                            name_by_login.setdefault(login, name)
+                        if login in name_by_login:
+                            email_resolver.avoided()
+                        else:
+                            # The commit would have told the name as well.
+                            enqueue(
+                                ResolveNameByProfile(
+                                    "{}/users/{}".format(MyGitHub.ENDPOINT, login),
+                                    login,
+                                )
+                            )
                 if login is None:
-                    # We could just get the login right from the email
-                    # address, if it is '@users.noreply.github.com'-like,
-                    # but we'll need to request the user name after that
-                    # anyway.
                     # Retrieving contributor's login and name by a commit.
                     # repo['commits_url'] ends with '/commits{/sha}'.
                     # Removing the last 6.
                     commits_url = self.repo["commits_url"][:-6]
                     # Get contributor's login and name by a commit he made.
                     new_task = HandleAnonTask(commits_url, contr, self.repo)
-                    requests_tasks.put(new_task)
+                    enqueue(new_task)
                 else:
-                    contributions_already = org_contributors_dict[login].get(
-                        self.repo["name"]
+                    org_contributors_dict.add(
+                        login, self.repo["name"], contr["contributions"]
                     )
-                    if contributions_already is not None:
-                        org_contributors_dict[login][self.repo["name"]] = (
-                            contr["contributions"] + contributions_already
-                        )
-                    else:
-                        org_contributors_dict[login][self.repo["name"]] = contr[
-                            "contributions"
-                        ]
 
 
 class ResolveNameByProfile(RequestTask):
     """A task to get user's name by accessing his GitHub profile."""
 
-    def __init__(self, profile_url):
+    def __init__(self, profile_url, login):
         """Initialize the resolver."""
         super(ResolveNameByProfile, self).__init__(profile_url)
+        self.login = login
 
     def handle(self):
         """
         Add user's name to the name_by_login dict. If the user has not
-        specified his name, use the login as the name.
+        specified his name, or the profile can't be read, use the login as
+        the name.
         """
         super(ResolveNameByProfile, self).handle()
+        if self.response.status_code != 200:
+            # A renamed or deleted account.
+            name_by_login.setdefault(self.login, self.login)
+            return
         user = self.response.json()
         # If the user has not specified the name, use his login
         name_by_login[user["login"]] = user["name"] or user["login"]
@@ -212,15 +239,9 @@ class HandleAnonTask(RequestTask):
         # Check whether the email is linked to a GitHub profile.
         if commit["author"] is not None:
             login = commit["author"]["login"]
-            contributions_already = org_contributors_dict[login].get(self.repo["name"])
-            if contributions_already is not None:
-                org_contributors_dict[login][self.repo["name"]] = (
-                    self.contributor["contributions"] + contributions_already
-                )
-            else:
-                org_contributors_dict[login][self.repo["name"]] = self.contributor[
-                    "contributions"
-                ]
+            org_contributors_dict.add(
+                login, self.repo["name"], self.contributor["contributions"]
+            )
             login_by_email[self.contributor["email"]] = login
             # We can also get the user's name right from the commit.
             user_name = commit["commit"]["author"]["name"]
@@ -237,66 +258,294 @@ class RequestsWorker(threading.Thread):
             task = requests_tasks.get()
             # A None element will be put to the queue when the worker needs
             # to be terminated.
-            if task is not None:
-                task.handle()
-            else:
-                time_to_retire = True
-            requests_tasks.task_done()
+            try:
+                if task is not None:
+                    telemetry.task_started(type(task).__name__)
+                    task.handle()
+                    telemetry.task_done()
+                else:
+                    time_to_retire = True
+            except Exception as err:
+                # A failed task must not stop the crawl waiting for it.
+                log("Failed {!r}: {}".format(task, err))
+            finally:
+                requests_tasks.task_done()
 
 
 class ProgressReporter(threading.Thread):
     """A thread subclass used to monitor the execution progress."""
 
-    def __init__(self, stop_monitoring: threading.Event, report_period: float = 5):
-        """Initialize the reporter"""
+    def __init__(
+        self,
+        stop_monitoring: threading.Event,
+        report_period: float = 5,
+        quiet: bool = False,
+        metrics_file: str = None,
+        prefix: str = "",
+        send=None,
+    ):
+        """Initialize the reporter.
+
+        send is called with every telemetry snapshot, to forward the
+        telemetry of a worker process.
+        """
         super(ProgressReporter, self).__init__()
         self.stop_monitoring = stop_monitoring
         self.report_period = report_period
+        self.quiet = quiet
+        self.metrics_file = metrics_file
+        self.prefix = prefix
+        self.send = send
+
+    def report(self):
+        """Print the status line and update the metrics file."""
+        if not self.quiet:
+            print(
+                "{}{} | {} users, {} names".format(
+                    self.prefix,
+                    telemetry.status_line(),
+                    len(org_contributors_dict),
+                    len(name_by_login),
+                )
+            )
+        self.publish()
+
+    def publish(self):
+        """Update the metrics file and forward the snapshot."""
+        if self.metrics_file is not None:
+            telemetry.write_openmetrics(self.metrics_file)
+        if self.send is not None:
+            self.send(telemetry.snapshot())
 
     def run(self):
         """Run the progress reporter."""
         # Report every self.report_period seconds until the event is triggered.
         while not self.stop_monitoring.wait(self.report_period):
-            print(
-                "name_by_login len: {}. org_contributors_dict len: {}".format(
-                    len(name_by_login), len(org_contributors_dict)
-                )
+            self.report()
+        # Leave the final values behind for the scrapers.
+        self.publish()
+
+
+def _escape_name(name):
+    """Escape a user name for use in the Markdown credits page."""
+    if name.startswith("@"):
+        name = name[1:]
+    # TODO Mustache will escape these. Or will it?
+    # name = name.replace('<', '&lt;')
+    # name = name.replace('>', '&gt;')
+    return name.translate(MARKDOWN_ESCAPES)
+
+
+def build_users_context(contributions, names):
+    """Build the template context of every contributor, keyed by login."""
+    users_context = {}
+    for login, user_total_contribs, user_repos in contributions.ranked():
+        count_lines = [
+            "{} total commits to the Home Assistant org:\n".format(user_total_contribs)
+        ]
+        count_lines.extend(
+            "{} {} to {}\n".format(
+                num_contribs, "commits" if num_contribs > 1 else "commit", repo_name
             )
+            for repo_name, num_contribs in user_repos
+        )
+        # TODO if the login_by_email file contains some users that
+        # name_by_login file does not contain, (for example if it was modified
+        # by 'hassrelease release-notes' run), a KeyError will occur here.
+        users_context[login] = {
+            "info": {"name": _escape_name(names[login]), "login": login},
+            "countString": "".join(count_lines),
+        }
+    return users_context
 
 
-def generate_credits(num_simul_requests, no_cache, quiet):
-    """Authenticate to GitHub and collects the credits data."""
-    global gh
+def read_token():
+    """Read the GitHub token, None to access the API anonymously."""
     try:
         with open(TOKEN_FILE) as token_file:
-            token = token_file.readline().strip()
-        gh = MyGitHub(token)
+            return token_file.readline().strip()
     except OSError:
-        sys.stderr.write("Could not open the .token file")
-        print("Retrieving the data anonymously")
-        gh = MyGitHub(token=None)
-    gh.quiet = quiet
-    global login_by_email
+        log("Could not open the .token file. Retrieving the data anonymously")
+        return None
+
+
+def crawl(num_simul_requests, tasks):
+    """Handle the tasks, and the tasks they enqueue, until the queue is empty."""
+    request_workers = []
+
+    for _ in range(0, num_simul_requests):
+        new_thread = RequestsWorker()
+        new_thread.start()
+        request_workers.append(new_thread)
+    for task in tasks:
+        enqueue(task)
+    # RequestWorkers start working.
+    requests_tasks.join()
+    # Poisoning workers
+    for _ in request_workers:
+        requests_tasks.put(None)
+    for worker in request_workers:
+        worker.join()
+
+
+def list_org_repos():
+    """Return the public repositories of the organization."""
+    repos = []
+    url = "{}/orgs/{}/repos".format(MyGitHub.ENDPOINT, GITHUB_ORGANIZATION_NAME)
+    params = {"type": "public", "per_page": str(default_per_page)}
+    while url is not None:
+        resp = gh.request_with_retry(url, params)
+        repos.extend(resp.json())
+        # The next page URL already contains the query string.
+        url = resp.links.get("next", {}).get("url")
+        params = None
+    return repos
+
+
+def crawl_shard(
+    shard, token, repos, num_simul_requests, names, logins, history, snapshots, quiet
+):
+    """Crawl the contributors of some repositories in a worker process.
+
+    history is the git history indexed by the email resolver of the
+    coordinator. The telemetry snapshots are put in the snapshots queue with
+    the shard number. Returns the contributions, the names and logins that
+    were learned, and the counts of the email resolver.
+    """
+    global gh
+    global telemetry
     global name_by_login
+    global login_by_email
+    global email_resolver
+    telemetry = CrawlTelemetry()
+    gh = MyGitHub(token, quiet, pool_size=num_simul_requests)
+    gh.telemetry = telemetry
+    name_by_login = dict(names)
+    login_by_email = dict(logins)
+    email_resolver = EmailResolver(login_by_email, history=history)
+
+    all_done = threading.Event()
+    reporter = ProgressReporter(
+        all_done,
+        quiet=quiet,
+        prefix=f"[shard {shard}] ",
+        send=lambda snapshot: snapshots.put((shard, snapshot)),
+    )
+    reporter.start()
+    crawl(num_simul_requests, [ContributorsPageTask.for_repo(repo) for repo in repos])
+    all_done.set()
+    reporter.join()
+
+    return (
+        org_contributors_dict,
+        {
+            login: name
+            for login, name in name_by_login.items()
+            if names.get(login) != name
+        },
+        {
+            email: login
+            for email, login in login_by_email.items()
+            if logins.get(email) != login
+        },
+        (email_resolver.resolved, email_resolver.requests_avoided),
+    )
+
 
-    def read_csv_to_dict(filename: str, encoding: str = None):
-        """Read the CSV data into a dict."""
-        data = {}
-        with open(filename, encoding=encoding) as inp:
-            for lin in inp:
-                if "," not in lin:
-                    lin = lin.strip() + ","
-                if lin.count(",") > 1:
-                    lin = "".join(lin.rsplit(",", 1))
-                key, value = [val.strip() for val in lin.split(",")]
-                data[key] = value
-        return data
+def crawl_sharded(num_processes, token, num_simul_requests, quiet):
+    """Split the repositories over worker processes and merge their results.
+
+    The telemetry of the workers is forwarded to the ShardedTelemetry of the
+    crawl.
+    """
+    repos = sorted(list_org_repos(), key=lambda repo: repo["size"], reverse=True)
+    log("Crawling {} repositories in {} processes".format(len(repos), num_processes))
+    # Deal the repositories out by size, so the shards are about as big.
+    shards = [repos[shard::num_processes] for shard in range(num_processes)]
+    # The workers reuse the history instead of reading it again.
+    history = email_resolver.history()
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    snapshots = manager.Queue()
+
+    def forward():
+        """Merge the telemetry snapshots of the workers until None."""
+        for shard, snapshot in iter(snapshots.get, None):
+            telemetry.update(shard, snapshot)
+
+    forwarder = threading.Thread(target=forward)
+    forwarder.start()
+    try:
+        with ProcessPoolExecutor(num_processes, mp_context=context) as executor:
+            futures = {
+                executor.submit(
+                    crawl_shard,
+                    shard,
+                    token,
+                    shard_repos,
+                    num_simul_requests,
+                    name_by_login,
+                    login_by_email,
+                    history,
+                    snapshots,
+                    quiet,
+                ): shard
+                for shard, shard_repos in enumerate(shards)
+            }
+            for future in as_completed(futures):
+                contributions, names, logins, resolver_counts = future.result()
+                org_contributors_dict.merge(contributions)
+                name_by_login.update(names)
+                login_by_email.update(logins)
+                email_resolver.add_counts(*resolver_counts)
+                log(
+                    "Shard {} done: {} repositories, {} users".format(
+                        futures[future],
+                        len(shards[futures[future]]),
+                        len(contributions),
+                    )
+                )
+    finally:
+        snapshots.put(None)
+        forwarder.join()
+        manager.shutdown()
+
+
+def generate_credits(
+    num_simul_requests,
+    no_cache,
+    quiet,
+    metrics_file=None,
+    metrics_port=None,
+    num_processes=1,
+    output=None,
+):
+    """Authenticate to GitHub and collects the credits data.
+
+    output is called with the lines to report, like print. Nothing is
+    reported without it, except the progress lines unless quiet is set.
+    Returns whether the credits page was written.
+    """
+    global gh
+    global telemetry
+    global org_contributors_dict
+    global log
+    log = output or _discard
+    # The workers of a sharded crawl forward their telemetry.
+    telemetry = ShardedTelemetry() if num_processes > 1 else CrawlTelemetry()
+    org_contributors_dict = ContributionMatrix()
+    token = read_token()
+    gh = MyGitHub(token, quiet, pool_size=num_simul_requests)
+    gh.telemetry = telemetry
+    global login_by_email
+    global name_by_login
+    global email_resolver
 
     if not no_cache:
         try:
             login_by_email = read_csv_to_dict(LOGIN_BY_EMAIL_FILE)
         except OSError:
-            print(
+            log(
                 "Could not read the login-by-email file. Proceeding without "
                 "the cache"
             )
@@ -304,46 +553,47 @@ def generate_credits(num_simul_requests, no_cache, quiet):
         try:
             name_by_login = read_csv_to_dict(NAME_BY_LOGIN_FILE, encoding="utf-8")
         except OSError:
-            print(
-                "Could not read the name-by-login file. Proceeding without " "the cache"
-            )
+            log("Could not read the name-by-login file. Proceeding without the cache")
             name_by_login = {}
     else:
         login_by_email = {}
         name_by_login = {}
+    email_resolver = EmailResolver(login_by_email)
     # Test the API
     resp = gh.request_with_retry(MyGitHub.ENDPOINT)
-    print(
+    log(
         "Status: {}. Message: {}. Rate-Limit remaining: {}".format(
             resp.reason,
             resp.json().get("message"),
             resp.headers.get(MyGitHub.RATELIMIT_REMAINING_STR),
         )
     )
-    request_workers = []
-
-    for _ in range(0, num_simul_requests):
-        new_thread = RequestsWorker()
-        new_thread.start()
-        request_workers.append(new_thread)
-    org_repos_url = "{}/orgs/{}/repos".format(
-        MyGitHub.ENDPOINT, GITHUB_ORGANIZATION_NAME
-    )
-    new_task = ReposPageTask(
-        org_repos_url, params={"type": "public", "per_page": str(default_per_page)}
-    )
-    requests_tasks.put(new_task)
-    # RequestWorkers start working.
-    if not quiet:
-        all_done = threading.Event()
-        reporter = ProgressReporter(all_done)
-        reporter.start()
-    requests_tasks.join()
-    # Poisoning workers
-    for _ in request_workers:
-        requests_tasks.put(None)
-    for worker in request_workers:
-        worker.join()
+    if metrics_port is not None:
+        metrics_server = serve_openmetrics(telemetry, metrics_port)
+        log(
+            "Serving metrics on http://127.0.0.1:{}/metrics".format(
+                metrics_server.server_port
+            )
+        )
+    all_done = threading.Event()
+    reporter = ProgressReporter(all_done, quiet=quiet, metrics_file=metrics_file)
+    reporter.start()
+    if num_processes > 1:
+        crawl_sharded(num_processes, token, num_simul_requests, quiet)
+    else:
+        org_repos_url = "{}/orgs/{}/repos".format(
+            MyGitHub.ENDPOINT, GITHUB_ORGANIZATION_NAME
+        )
+        crawl(
+            num_simul_requests,
+            [
+                ReposPageTask(
+                    org_repos_url,
+                    params={"type": "public", "per_page": str(default_per_page)},
+                )
+            ],
+        )
+    log(email_resolver.summary())
     with open(NAME_BY_LOGIN_FILE, "w", encoding="utf-8") as f:
         for login, name in name_by_login.items():
             f.write("{},{}\n".format(login, name))
@@ -352,47 +602,24 @@ def generate_credits(num_simul_requests, no_cache, quiet):
         for email, login in login_by_email.items():
             f.write("{},{}\n".format(email, login))
     # Writing the credits page.
-    users_context = {}
-    for login, user_contribs_dict in org_contributors_dict.items():
-        count_string = ""
-        user_total_contribs = 0
-        for repo_name, num_contribs in sorted(
-            user_contribs_dict.items(), key=lambda x: x[1], reverse=True
-        ):
-            count_string += "{} {} to {}\n".format(
-                num_contribs, "commits" if num_contribs > 1 else "commit", repo_name
-            )
-            user_total_contribs += num_contribs
-        count_string = "{} total commits to the Home Assistant org:\n{}".format(
-            user_total_contribs, count_string
-        )
-        # TODO if the login_by_email file contains some users that
-        # name_by_login file does not contain, (for example if it was modified
-        # by 'hassrelease release-notes' run), a KeyError will occur here.
-        name = name_by_login[login]
-        name = re.sub(r"^(@)", r"", name)
-        # TODO Mustache will escape these. Or will it?
-        # name = name.replace('<', '&lt;')
-        # name = name.replace('>', '&gt;')
-        name = re.sub(r"([\\`*_{}[\]()#+-.!~|])", r"\\\1", name)
-        users_context[login] = {
-            "info": {"name": name, "login": login},
-            "countString": count_string,
-        }
+    users_context = build_users_context(org_contributors_dict, name_by_login)
     fearless_leader = users_context.pop("balloob")
     context = {
-        "allUsers": sorted(
-            users_context.values(), key=lambda x: x["info"]["name"].casefold()
-        ),
         "fearlessLeader": fearless_leader,
         "headerDate": time.strftime("%Y-%m-%d, %X +0000", time.gmtime()),
         "footerDate": time.strftime("%A, %B %d %Y, %X UTC", time.gmtime()),
     }
-    template_file = open(CREDITS_TEMPLATE_FILE, "r")
-    credits_page_file = open(CREDITS_PAGE, "w", encoding="utf-8")
-    credits_page_file.write(pystache.render(template_file.read(), context))
-    template_file.close()
-    credits_page_file.close()
-    if not quiet:
-        all_done.set()
-        reporter.join()
+    all_users = sorted(
+        users_context.values(),
+        key=lambda x: (x["info"]["name"].casefold(), x["info"]["login"]),
+    )
+    page_written = credits_page.load_template().write(CREDITS_PAGE, context, all_users)
+    if page_written:
+        log("Credits page written to", CREDITS_PAGE)
+    else:
+        log("Credits unchanged, left", CREDITS_PAGE, "untouched")
+    all_done.set()
+    reporter.join()
+    if metrics_port is not None:
+        metrics_server.shutdown()
+    return page_written
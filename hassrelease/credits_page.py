@@ -0,0 +1,113 @@
+"""Render the credits page for home-assistant.io."""
+
+import functools
+import os
+import re
+import shutil
+import tempfile
+
+import pystache
+
+from .const import CREDITS_TEMPLATE_FILE
+from .core import HassReleaseError
+
+# The section rendered once per contributor. The closing tag has to be on a
+# line of its own, which Mustache removes from the output.
+USERS_SECTION = re.compile(r"\{\{#allUsers\}\}(.*?)\{\{/allUsers\}\}\n?", re.S)
+# Context keys that change on every run and are ignored when comparing pages.
+VOLATILE_KEYS = ("headerDate", "footerDate")
+# Number of rendered contributors written to the page at once.
+CHUNK_SIZE = 500
+_SENTINEL = "\x00"
+
+
+class CreditsTemplate:
+    """The credits page template, parsed once into header, user and footer."""
+
+    def __init__(self, text):
+        """Parse the template."""
+        match = USERS_SECTION.search(text)
+        if match is None:
+            raise HassReleaseError("The credits template has no allUsers section")
+        self.header = pystache.parse(text[: match.start()])
+        self.user = pystache.parse(match.group(1))
+        self.footer = pystache.parse(text[match.end() :])
+        self.renderer = pystache.Renderer()
+
+    def render(self, context, users):
+        """Yield the rendered page in chunks."""
+        yield self.renderer.render(self.header, context)
+        chunk = []
+        for user in users:
+            chunk.append(self.renderer.render(self.user, context, user))
+            if len(chunk) == CHUNK_SIZE:
+                yield "".join(chunk)
+                chunk = []
+        yield "".join(chunk)
+        yield self.renderer.render(self.footer, context)
+
+    def write(self, path, context, users):
+        """Write the page to path.
+
+        The page is written to a temporary file first and moved into place
+        atomically. An existing page is left untouched if only the volatile
+        values changed. Returns whether the page was written.
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+        )
+        try:
+            with open(fd, "w", encoding="utf-8") as page:
+                for chunk in self.render(context, users):
+                    page.write(chunk)
+
+            if self._same_content(tmp_path, path, context):
+                os.remove(tmp_path)
+                return False
+
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+            return True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _volatile_pattern(self, parsed, context, suffix=""):
+        """Return a regex matching a part rendered with any volatile values."""
+        probe = dict(context, **{key: _SENTINEL for key in VOLATILE_KEYS})
+        text = re.escape(self.renderer.render(parsed, probe))
+        return re.compile(text.replace(re.escape(_SENTINEL), ".*?") + suffix)
+
+    def _body(self, text, context):
+        """Return the contributors part of a page, None if it doesn't match."""
+        header = self._volatile_pattern(self.header, context).match(text)
+        if header is None:
+            return None
+        footer = self._volatile_pattern(self.footer, context, r"\Z").search(
+            text, header.end()
+        )
+        if footer is None:
+            return None
+        return text[header.end() : footer.start()]
+
+    def _same_content(self, new_path, old_path, context):
+        """Test if two pages only differ in their volatile values."""
+        try:
+            with open(old_path, encoding="utf-8") as old_page:
+                old_body = self._body(old_page.read(), context)
+        except FileNotFoundError:
+            return False
+        with open(new_path, encoding="utf-8") as new_page:
+            new_body = self._body(new_page.read(), context)
+        return old_body is not None and old_body == new_body
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(path=CREDITS_TEMPLATE_FILE):
+    """Load and parse the credits template."""
+    with open(path) as template_file:
+        return CreditsTemplate(template_file.read())
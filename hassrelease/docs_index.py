@@ -0,0 +1,168 @@
+"""Local index of the pages of the Home Assistant documentation."""
+
+import json
+import pathlib
+import re
+
+from . import git
+from .const import DOCS_INDEX_FILE, DOCS_PATH
+from .core import HassReleaseError
+
+INTEGRATIONS_DIR = "source/_integrations"
+TRIGGER_PAGE = "source/_docs/automation/trigger.markdown"
+INTEGRATION_URL = "/integrations/{}/"
+TRIGGER_URL = "/docs/automation/trigger/#{}"
+TRIGGER_SUFFIX = "-trigger"
+# The domain of an integration page, if it differs from the page name.
+DOMAIN_PATTERN = re.compile(r"^ha_domain:\s*['\"]?(\w+)", re.MULTILINE)
+# A markdown heading and its explicit kramdown anchor, if any.
+HEADING_PATTERN = re.compile(
+    r"^#{1,6}\s+(.+?)\s*(?:\{:?\s*#([\w-]+)\s*\})?\s*$", re.MULTILINE
+)
+
+
+def heading_anchor(heading):
+    """Return the anchor kramdown generates for a heading."""
+    anchor = re.sub(r"[^a-z0-9 _-]", "", heading.lower()).replace(" ", "-")
+    return re.sub(r"^[^a-z]+", "", anchor)
+
+
+def trigger_key(name):
+    """Return the key of a trigger, the same for its platform and its anchor."""
+    return name.replace("-", "").replace("_", "")
+
+
+class DocsIndex:
+    """Map integration domains and automation triggers to documentation pages.
+
+    The pages are read from the commit checked out in a local
+    home-assistant.io repository. The index is stored as JSON with that
+    commit, when it moves only the pages changed since are read again.
+    """
+
+    def __init__(self, docs_repository=DOCS_PATH, path=None):
+        """Initialize the index, loading it from disk if it exists."""
+        self.docs_repository = docs_repository
+        self.path = pathlib.Path(path or DOCS_INDEX_FILE)
+        self.head = None
+        # Domains documented by every integration page, by page name.
+        self.pages = {}
+        # Anchors of the triggers on the trigger page, by trigger_key.
+        self.triggers = {}
+        self._page_by_domain = None
+
+        if self.path.is_file():
+            data = json.loads(self.path.read_text())
+            self.head = data["head"]
+            self.pages = data["pages"]
+            self.triggers = data["triggers"]
+
+    def update(self):
+        """Read the pages changed since the last update.
+
+        Returns the number of pages read.
+        """
+        repo = git.get_repo(self.docs_repository)
+        head = repo.run(
+            "rev-parse",
+            "HEAD",
+            error="Failed reading the documentation in {}".format(self.docs_repository),
+        ).strip()
+        if head == self.head:
+            return 0
+
+        changes = None
+        if self.head is not None:
+            try:
+                changes = [
+                    line.split("\t", 1)
+                    for line in repo.run(
+                        "diff",
+                        "--name-status",
+                        "--no-renames",
+                        self.head,
+                        head,
+                        "--",
+                        INTEGRATIONS_DIR,
+                        TRIGGER_PAGE,
+                    ).splitlines()
+                ]
+            except HassReleaseError:
+                # The indexed commit is gone, index everything again.
+                pass
+        if changes is None:
+            self.pages = {}
+            self.triggers = {}
+            changes = [
+                ("A", path)
+                for path in repo.run(
+                    "ls-tree",
+                    "--name-only",
+                    head,
+                    INTEGRATIONS_DIR + "/",
+                    TRIGGER_PAGE,
+                    error="Failed listing the documentation in {}".format(
+                        self.docs_repository
+                    ),
+                ).splitlines()
+            ]
+
+        read = 0
+        for status, path in changes:
+            if path == TRIGGER_PAGE:
+                self.triggers = {}
+                if status != "D":
+                    read += 1
+                    self._index_triggers(repo.show(head, path))
+                continue
+
+            directory, _, file_name = path.rpartition("/")
+            name, extension = file_name.rsplit(".", 1) if "." in file_name else ("", "")
+            if directory != INTEGRATIONS_DIR or extension != "markdown":
+                continue
+            self.pages.pop(name, None)
+            if status != "D":
+                read += 1
+                match = DOMAIN_PATTERN.search(repo.show(head, path))
+                self.pages[name] = sorted({name, match.group(1)} if match else {name})
+
+        self.head = head
+        self._page_by_domain = None
+        self.save()
+        return read
+
+    def _index_triggers(self, text):
+        """Index the trigger anchors of the trigger page."""
+        for heading, anchor in HEADING_PATTERN.findall(text):
+            anchor = anchor or heading_anchor(heading)
+            if anchor.endswith(TRIGGER_SUFFIX):
+                self.triggers[trigger_key(anchor[: -len(TRIGGER_SUFFIX)])] = anchor
+
+    def save(self):
+        """Store the index."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {"head": self.head, "pages": self.pages, "triggers": self.triggers}
+            )
+        )
+
+    def integration_page(self, domain):
+        """Return the page of an integration, None if it has none."""
+        if self._page_by_domain is None:
+            page_by_domain = {}
+            for name, domains in self.pages.items():
+                for page_domain in domains:
+                    # A page named after its domain wins over the others.
+                    if page_domain == name or page_domain not in page_by_domain:
+                        page_by_domain[page_domain] = name
+            self._page_by_domain = page_by_domain
+
+        name = self._page_by_domain.get(domain)
+        return None if name is None else INTEGRATION_URL.format(name)
+
+    def trigger_page(self, platform):
+        """Return the page of an automation platform like automation.mqtt."""
+        name = platform.partition(".")[2]
+        anchor = self.triggers.get(trigger_key(name))
+        return None if anchor is None else TRIGGER_URL.format(anchor)
@@ -0,0 +1,163 @@
+"""Resolve contributor emails to GitHub logins without the API."""
+
+import os
+import re
+import subprocess
+import threading
+
+from .const import CORE_PATH, DOCS_PATH, FRONTEND_PATH
+
+# Local checkouts whose .mailmap tells which emails an author commits with.
+LOCAL_REPOSITORIES = (CORE_PATH, FRONTEND_PATH, DOCS_PATH)
+# 12345+login@users.noreply.github.com, or login@users.noreply.github.com for
+# accounts older than July 2017.
+NOREPLY_PATTERN = re.compile(
+    r"^(?:(\d+)\+)?([a-z\d](?:[a-z\d-]*[a-z\d])?)@users\.noreply\.github\.com$",
+    re.IGNORECASE,
+)
+FIELD_SEPARATOR = "\x1f"
+
+
+def noreply_login(email):
+    """Return the login of a GitHub noreply email, None for other emails."""
+    match = NOREPLY_PATTERN.match(email)
+    return match.group(2) if match else None
+
+
+def noreply_id(email):
+    """Return the account ID of a GitHub noreply email, None if it has none."""
+    match = NOREPLY_PATTERN.match(email)
+    return int(match.group(1)) if match and match.group(1) else None
+
+
+class EmailResolver:
+    """Resolve emails with their noreply format and the local git history.
+
+    The login of a noreply email with an account ID may be outdated, the
+    account may have been renamed. Those are resolved by their ID, through
+    the noreply emails of login_by_email. Other emails are resolved if the
+    .mailmap of a local repository maps them to an email of a known login.
+    The history is read on first use, unless the history of another
+    resolver is passed.
+    """
+
+    def __init__(self, login_by_email, repositories=LOCAL_REPOSITORIES, history=None):
+        """Initialize the resolver."""
+        self.login_by_email = login_by_email
+        self.repositories = repositories
+        self._history = history
+        # Number of emails resolved, by the way they were resolved.
+        self.resolved = {"noreply": 0, "history": 0}
+        # Number of API requests the resolved emails did not need.
+        self.requests_avoided = 0
+        self._lock = threading.Lock()
+        self._name_by_email = None
+        self._mapped_email = None
+        self._login_by_id = None
+
+    def _read_history(self):
+        """Index the author names and mailmap entries of the local repositories."""
+        if self._history is not None:
+            self._index(*self._history)
+            return
+        name_by_email = {}
+        mapped_email = {}
+        for repository in self.repositories:
+            if not os.path.isdir(repository):
+                continue
+            process = subprocess.run(
+                [
+                    "git",
+                    "log",
+                    "--format=%ae{0}%aE{0}%aN".format(FIELD_SEPARATOR),
+                    "HEAD",
+                ],
+                cwd=repository,
+                capture_output=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+            if process.returncode != 0:
+                continue
+            for line in set(process.stdout.splitlines()):
+                email, mailmap_email, name = line.split(FIELD_SEPARATOR, 2)
+                name_by_email.setdefault(email.lower(), name)
+                if mailmap_email.lower() != email.lower():
+                    mapped_email.setdefault(email.lower(), mailmap_email)
+        self._history = name_by_email, mapped_email
+        self._index(name_by_email, mapped_email)
+
+    def _index(self, name_by_email, mapped_email):
+        """Use an indexed history, with the account IDs of login_by_email."""
+        login_by_id = {}
+        for email, login in list(self.login_by_email.items()):
+            user_id = noreply_id(email)
+            if user_id is not None:
+                login_by_id.setdefault(user_id, login)
+
+        self._name_by_email = name_by_email
+        self._mapped_email = mapped_email
+        self._login_by_id = login_by_id
+
+    def history(self):
+        """Return the indexed history, to pass to the resolver of a worker."""
+        with self._lock:
+            if self._name_by_email is None:
+                self._read_history()
+            return self._history
+
+    def _known_login(self, email):
+        """Return the login of an email without the history, None if unknown."""
+        login = self.login_by_email.get(email)
+        if login is not None:
+            return login
+        user_id = noreply_id(email)
+        if user_id is not None:
+            return self._login_by_id.get(user_id)
+        return noreply_login(email)
+
+    def resolve(self, email):
+        """Return the login and the author name of an email.
+
+        The login is None if the email could not be resolved, the name if
+        the email is not in the local history.
+        """
+        with self._lock:
+            if self._name_by_email is None:
+                self._read_history()
+            name = self._name_by_email.get(email.lower())
+
+            if noreply_login(email) is not None:
+                login = self._known_login(email)
+                if login is not None:
+                    self.resolved["noreply"] += 1
+                return login, name
+
+            mapped_email = self._mapped_email.get(email.lower())
+            if mapped_email is not None:
+                login = self._known_login(mapped_email)
+                if login is not None:
+                    self.resolved["history"] += 1
+                    return login, name
+            return None, name
+
+    def avoided(self, requests=1):
+        """Record API requests that were not needed."""
+        with self._lock:
+            self.requests_avoided += requests
+
+    def add_counts(self, resolved, requests_avoided):
+        """Add the counts of another resolver, like one of a worker process."""
+        with self._lock:
+            for method, count in resolved.items():
+                self.resolved[method] += count
+            self.requests_avoided += requests_avoided
+
+    def summary(self):
+        """Return a one line summary of the resolved emails."""
+        return "Resolved {} emails locally ({} noreply, {} from the git history), {} requests avoided".format(
+            sum(self.resolved.values()),
+            self.resolved["noreply"],
+            self.resolved["history"],
+            self.requests_avoided,
+        )
@@ -1,48 +1,242 @@
-import toml
+import functools
+import os
+import re
 import subprocess
+import threading
+import time
 
+from .const import CORE_PATH
 from .core import HassReleaseError
 
+# Default branches of origin, used when origin/HEAD is not set.
+MAIN_BRANCHES = ("origin/dev", "origin/main", "origin/master")
 
-def get_hass_version(branch):
+
+class RepoStatus:
+    """A snapshot of the checked out branch and working tree of a repository."""
+
+    def __init__(self, head, branch, upstream, ahead, behind, changed):
+        """Initialize the status."""
+        self.head = head
+        # None when HEAD is detached.
+        self.branch = branch
+        self.upstream = upstream
+        self.ahead = ahead
+        self.behind = behind
+        # Tracked paths with changes that are not staged.
+        self.changed = changed
+
+    @property
+    def dirty(self):
+        """Return if tracked files have unstaged changes."""
+        return bool(self.changed)
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of git status --porcelain=v2 --branch."""
+        headers = {}
+        changed = []
+        for line in output.splitlines():
+            if line.startswith("# "):
+                key, _, value = line[2:].partition(" ")
+                headers[key] = value
+            elif line[:2] in ("1 ", "2 ") and line[3] != ".":
+                # Ordinary or renamed entries, the second XY letter is the
+                # state of the working tree.
+                changed.append(line.split(" ", 8 if line[0] == "1" else 9)[-1])
+            elif line.startswith("u "):
+                changed.append(line.split(" ", 10)[-1])
+
+        ahead, behind = 0, 0
+        if "branch.ab" in headers:
+            ahead, behind = (abs(int(n)) for n in headers["branch.ab"].split())
+        branch = headers.get("branch.head")
+        return cls(
+            headers.get("branch.oid"),
+            None if branch == "(detached)" else branch,
+            headers.get("branch.upstream"),
+            ahead,
+            behind,
+            changed,
+        )
+
+
+class GitRepo:
+    """Run git in a repository without going through a shell.
+
+    Object reads go through one long running git cat-file --batch process
+    that is started on first use.
+    """
+
+    def __init__(self, path):
+        """Initialize the client."""
+        self.path = path
+        self._batch = None
+        self._batch_lock = threading.Lock()
+
+    def run(self, *args, error=None, input=None, returncodes=(0,)):
+        """Run git and return its output.
+
+        input is passed to git on its standard input. Raises HassReleaseError
+        with the error text if git exits with a code not in returncodes.
+        """
+        process = subprocess.run(
+            ["git", *args],
+            cwd=self.path,
+            input=input,
+            capture_output=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        if process.returncode not in returncodes:
+            raise HassReleaseError(
+                error or "git {} failed in {}".format(args[0], self.path)
+            )
+        return process.stdout
+
+    def read_object(self, name):
+        """Return the content of an object, None if it doesn't exist.
+
+        name is anything git cat-file accepts, like "rc:pyproject.toml".
+        """
+        with self._batch_lock:
+            if self._batch is None or self._batch.poll() is not None:
+                self._batch = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.path,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            self._batch.stdin.write(name.encode() + b"\n")
+            self._batch.stdin.flush()
+            header = self._batch.stdout.readline()
+            if not header:
+                raise HassReleaseError("git cat-file stopped in {}".format(self.path))
+            parts = header.split()
+            if parts[-1] in (b"missing", b"ambiguous"):
+                # "<name> missing", the name may contain spaces.
+                return None
+            content = self._batch.stdout.read(int(parts[2]))
+            self._batch.stdout.read(1)
+            return content
+
+    def show(self, revision, path):
+        """Return the text of a file at a revision, None if it doesn't exist."""
+        content = self.read_object("{}:{}".format(revision, path))
+        return None if content is None else content.decode()
+
+    def resolve(self, ref):
+        """Return the commit a ref points to, None if it doesn't exist."""
+        output = self.run(
+            "rev-parse",
+            "--verify",
+            "--quiet",
+            ref + "^{commit}",
+            returncodes=(0, 1),
+            error="Failed resolving {} in {}".format(ref, self.path),
+        )
+        return output.strip() or None
+
+    def is_ancestor(self, ancestor, commit):
+        """Test if a commit is an ancestor of another."""
+        try:
+            self.run("merge-base", "--is-ancestor", ancestor, commit)
+        except HassReleaseError:
+            # Not an ancestor, or a commit that no longer exists.
+            return False
+        return True
+
+    def status(self):
+        """Return a RepoStatus snapshot."""
+        return RepoStatus.parse(
+            self.run(
+                "status",
+                "--porcelain=v2",
+                "--branch",
+                "--untracked-files=no",
+                error="Failed reading the status of {}".format(self.path),
+            )
+        )
+
+    def default_branch(self, remote="origin"):
+        """Return the name of the default branch of a remote."""
+        ref = self.run(
+            "symbolic-ref",
+            "--short",
+            "refs/remotes/{}/HEAD".format(remote),
+            error="Failed reading the default branch of {} in {}".format(
+                remote, self.path
+            ),
+        )
+        return ref.strip()[len(remote) + 1 :]
+
+    def close(self):
+        """Stop the cat-file process."""
+        with self._batch_lock:
+            if self._batch is not None:
+                self._batch.stdin.close()
+                self._batch.wait()
+                self._batch.stdout.close()
+                self._batch = None
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop the cat-file process when leaving the context."""
+        self.close()
+
+
+def get_repo(path):
+    """Return the shared client of a repository."""
+    return _get_repo(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_repo(path):
+    """Return the shared client of a repository by absolute path."""
+    return GitRepo(path)
+
+
+def get_hass_version(branch, repo=CORE_PATH):
     """Get the HA version of a branch."""
-    process = subprocess.run(
-        "git show {branch}:pyproject.toml".format(branch=branch),
-        shell=True,
-        cwd="../core",
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL,
-    )
+    text = get_repo(repo).show(branch, "pyproject.toml")
 
-    if process.returncode != 0:
+    if text is None:
         text = (
             "Failed getting HASS version of branch - Does home-assistant repo exist at "
-            "../core? - Does branch {} exist?".format(branch)
+            "{}? - Does branch {} exist?".format(repo, branch)
         )
         raise HassReleaseError(text)
 
-    config = toml.loads(process.stdout.decode())
+    import toml
+
+    config = toml.loads(text)
     return config["project"]["version"]
 
 
-def get_log(branch):
-    process = subprocess.run(
-        "git log origin/master...{branch} "
-        "--pretty=format:'- %s (%ae)' --reverse".format(branch=branch),
-        shell=True,
-        cwd="../core",
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL,
-    )
+def get_log(branch, repo=CORE_PATH, base=None):
+    """Yield the commits of a branch as log lines.
 
-    if process.returncode != 0:
-        text = (
+    Without a base the commits master and the branch don't share are
+    listed, otherwise the commits of the branch that are not in base.
+    """
+    if base is None:
+        commits = "origin/master...{branch}".format(branch=branch)
+    else:
+        commits = "{base}..{branch}".format(base=base, branch=branch)
+    output = get_repo(repo).run(
+        "log",
+        commits,
+        "--pretty=format:- %s (%ae)",
+        "--reverse",
+        error=(
             "Failed getting log - Does home-assistant repo exist at "
-            "../core? - Does branch {} exist?".format(branch)
-        )
-        raise HassReleaseError(text)
-
-    output = process.stdout.decode("utf-8")
+            "{}? - Does branch {} exist?".format(repo, branch)
+        ),
+    )
     last = None
 
     for line in output.split("\n"):
@@ -53,56 +247,121 @@ def get_log(branch):
         yield line
 
 
-def fetch(repo):
-    process = subprocess.run("git fetch", shell=True, cwd=repo)
+def get_tags(repo=CORE_PATH):
+    """Return the names of the tags of a repository."""
+    return get_repo(repo).run("tag", "--list").split()
+
+
+def fetch(repo, branches=(), shas=(), remote="origin", deepen=None):
+    """Fetch branches and commits from a remote.
+
+    Only the given branches and the commits that are not present yet are
+    fetched. Without branches and commits, everything is fetched. Partial
+    clones fetch without blobs and shallow clones fetch commits with their
+    parent, so they can be cherry picked. Returns the seconds spent.
+    """
+    start = time.monotonic()
+    partial_filter = _config(repo, "remote.{}.partialclonefilter".format(remote))
+    if partial_filter is None and _config(repo, "remote.{}.promisor".format(remote)):
+        partial_filter = "blob:none"
+    filter_args = ["--filter=" + partial_filter] if partial_filter else []
+    shallow = _is_shallow(repo)
+
+    if not branches and not shas:
+        _fetch(repo, ["fetch", *filter_args, remote])
+        return time.monotonic() - start
+
+    refspecs = [
+        "+refs/heads/{0}:refs/remotes/{1}/{0}".format(branch, remote)
+        for branch in branches
+    ]
+    missing = missing_commits(repo, shas)
+
+    if shallow:
+        if refspecs:
+            deepen_args = ["--deepen={}".format(deepen)] if deepen else []
+            _fetch(repo, ["fetch", *filter_args, *deepen_args, remote, *refspecs])
+        if missing:
+            _fetch(repo, ["fetch", *filter_args, "--depth=2", remote, *missing])
+    elif refspecs or missing:
+        _fetch(repo, ["fetch", *filter_args, remote, *refspecs, *missing])
+
+    return time.monotonic() - start
+
+
+def _fetch(repo, args):
+    """Run a git fetch."""
+    process = subprocess.run(["git", *args], cwd=repo)
 
     if process.returncode != 0:
-        text = (
-            "Updating Home Assistant repo failed - Does home-assistant repo exist at "
-            "../core?"
-        )
+        text = "Updating repo failed - Does a git repo exist at {}?".format(repo)
         raise HassReleaseError(text)
 
 
-def cherry_pick(sha, cwd="../core"):
-    process = subprocess.run("git cherry-pick {}".format(sha), shell=True, cwd=cwd)
+def _config(repo, key):
+    """Return a git config value, None if it is not set."""
+    # git config exits with 1 when the key is not set.
+    value = get_repo(repo).run(
+        "config",
+        "--get",
+        key,
+        returncodes=(0, 1),
+        error="Reading the configuration failed - Does a git repo exist at "
+        "{}?".format(repo),
+    )
+    return value.strip() or None
+
+
+def _is_shallow(repo):
+    """Test if a repository is a shallow clone."""
+    output = get_repo(repo).run(
+        "rev-parse",
+        "--is-shallow-repository",
+        error="Failed reading the clone type of {}".format(repo),
+    )
+    return output.strip() == "true"
+
+
+def missing_commits(repo, shas):
+    """Return the commits that are not in the repository, in order."""
+    if not shas:
+        return []
+    output = get_repo(repo).run(
+        "cat-file",
+        "--batch-check",
+        input="".join("{}^{{commit}}\n".format(sha) for sha in shas),
+        error="Failed reading the objects of {}".format(repo),
+    )
+    return [
+        sha for sha, line in zip(shas, output.splitlines()) if line.endswith(" missing")
+    ]
+
+
+def cherry_pick(sha, cwd=CORE_PATH):
+    process = subprocess.run(["git", "cherry-pick", sha], cwd=cwd)
 
     if process.returncode != 0:
         text = (
             "Cherry picking {} failed - Does home-assistant repo exist at "
-            "../core?".format(sha)
+            "{}?".format(sha, cwd)
         )
         raise HassReleaseError(text)
 
 
 def is_dirty(repo):
     """Test if repo is dirty."""
-    return (
-        subprocess.run(
-            "git diff --stat", capture_output=True, shell=True, cwd=repo
-        ).stdout
-        != b""
-    )
+    return get_repo(repo).status().dirty
 
 
 def is_main(repo):
     """Test if current branch is the main branch."""
-    return (
-        subprocess.run(
-            "git branch --show-current", capture_output=True, shell=True, cwd=repo
-        ).stdout
-        == subprocess.run(
-            "git symbolic-ref refs/remotes/origin/HEAD | sed 's@^refs/remotes/origin/@@'",
-            capture_output=True,
-            shell=True,
-            cwd=repo,
-        ).stdout
-    )
+    git_repo = get_repo(repo)
+    return git_repo.status().branch == git_repo.default_branch()
 
 
 def create_branch(repo, branch):
     """Create a new branch on a repo."""
-    process = subprocess.run(f"git checkout -b {branch}", shell=True, cwd=repo)
+    process = subprocess.run(["git", "checkout", "-b", branch], cwd=repo)
 
     if process.returncode != 0:
         raise HassReleaseError("Creating branch failed")
@@ -110,7 +369,7 @@ def create_branch(repo, branch):
 
 def publish_branch(repo, branch):
     """Publish a branch."""
-    process = subprocess.run(f"git push -u origin {branch}", shell=True, cwd=repo)
+    process = subprocess.run(["git", "push", "-u", "origin", branch], cwd=repo)
 
     if process.returncode != 0:
         raise HassReleaseError("Publishing branch failed")
@@ -118,21 +377,221 @@ def publish_branch(repo, branch):
 
 def remove_branch(repo, branch):
     """Remove a local branch."""
-    default_branch = (
-        subprocess.run(
-            "git symbolic-ref refs/remotes/origin/HEAD | sed 's@^refs/remotes/origin/@@'",
-            capture_output=True,
-            shell=True,
-            cwd=repo,
+    default_branch = get_repo(repo).default_branch()
+
+    assert branch != default_branch
+    for args in (["checkout", default_branch], ["branch", "-d", branch]):
+        process = subprocess.run(["git", *args], cwd=repo)
+
+        if process.returncode != 0:
+            raise HassReleaseError("Removing local branch failed")
+
+
+# Line git prints for every commit created by a cherry-pick.
+PICKED_COMMIT_PATTERN = re.compile(r"^\[.+ [0-9a-f]{4,}\] ")
+
+
+def _run_sequence(args, cwd, on_picked, env=None, output=None):
+    """Run a cherry-pick sequence, calling on_picked for every new commit.
+
+    Every line git prints is passed to output, or printed without it.
+    Returns if the whole sequence succeeded.
+    """
+    process = subprocess.Popen(
+        ["git", *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        encoding="utf-8",
+        errors="replace",
+    )
+    picked = 0
+    for line in process.stdout:
+        if output is None:
+            print(line, end="")
+        else:
+            output(line)
+        if PICKED_COMMIT_PATTERN.match(line):
+            on_picked(picked)
+            picked += 1
+    return process.wait() == 0
+
+
+def cherry_pick_sequence(shas, cwd, on_picked, output=None):
+    """Cherry pick commits in order in a single git sequence.
+
+    on_picked is called with the index of each commit as it lands, output
+    with every line git prints. Returns if all commits were picked;
+    otherwise git stops at the first failing commit.
+    """
+    return _run_sequence(["cherry-pick", *shas], cwd, on_picked, output=output)
+
+
+def cherry_pick_continue(cwd, on_picked, output=None):
+    """Continue an interrupted cherry-pick sequence.
+
+    on_picked is called with the index of each commit as it lands, starting
+    with the commit that had to be resolved, output with every line git
+    prints.
+    """
+    # Keep the message of the resolved commit instead of opening an editor.
+    env = dict(os.environ, GIT_EDITOR="true")
+    return _run_sequence(["cherry-pick", "--continue"], cwd, on_picked, env, output)
+
+
+def cherry_pick_in_progress(cwd):
+    """Test if a cherry-pick is waiting to be resolved or continued."""
+    output = get_repo(cwd).run(
+        "rev-parse",
+        "--git-path",
+        "CHERRY_PICK_HEAD",
+        "--git-path",
+        "sequencer",
+        error="Failed reading the cherry-pick state of {}".format(cwd),
+    )
+    return any(os.path.exists(os.path.join(cwd, path)) for path in output.split())
+
+
+def get_head(cwd):
+    """Return the commit SHA of HEAD."""
+    return (
+        get_repo(cwd)
+        .run("rev-parse", "HEAD", error="Failed reading HEAD of {}".format(cwd))
+        .strip()
+    )
+
+
+def get_default_branch(cwd, remote="origin"):
+    """Return the name of the default branch of a remote."""
+    return get_repo(cwd).default_branch(remote)
+
+
+def get_main_branch(cwd):
+    """Return the default branch of origin, like origin/dev, and its tip.
+
+    The first of MAIN_BRANCHES that exists is used if origin/HEAD is not set.
+    """
+    repo = get_repo(cwd)
+    try:
+        branches = ["origin/" + repo.default_branch()]
+    except HassReleaseError:
+        branches = MAIN_BRANCHES
+    for branch in branches:
+        tip = repo.resolve(branch)
+        if tip is not None:
+            return branch, tip
+    raise HassReleaseError("No default branch found in {}".format(cwd))
+
+
+def get_current_branch(cwd):
+    """Return the name of the checked out branch."""
+    return (
+        get_repo(cwd)
+        .run(
+            "rev-parse",
+            "--abbrev-ref",
+            "HEAD",
+            error="Failed reading the current branch of {}".format(cwd),
         )
-        .stdout.decode("UTF-8")
-        .replace("\n", "")
+        .strip()
     )
 
-    assert branch != default_branch
-    process = subprocess.run(
-        f"git checkout {default_branch} && git branch -d {branch}", shell=True, cwd=repo
+
+def get_subjects(cwd, revision_range):
+    """Return the commit subjects of a revision range."""
+    return (
+        get_repo(cwd)
+        .run(
+            "log",
+            "--format=%s",
+            revision_range,
+            error="Failed reading the log of {}".format(cwd),
+        )
+        .splitlines()
     )
 
-    if process.returncode != 0:
-        raise HassReleaseError("Removing local branch failed")
+
+def get_changed_paths(cwd, shas):
+    """Return the paths changed by each commit, keyed by SHA."""
+    output = get_repo(cwd).run(
+        "log",
+        "--no-walk=unsorted",
+        "--format=%x00%H",
+        "--name-only",
+        *shas,
+        error="Failed reading the changes of the commits to pick",
+    )
+    changed = {}
+    for entry in output.split("\0")[1:]:
+        sha, *paths = [line for line in entry.splitlines() if line]
+        changed[sha] = set(paths)
+    return changed
+
+
+def grep_files(cwd, text):
+    """Return the tracked files containing a text."""
+    # git grep exits with 1 when nothing matched.
+    return (
+        get_repo(cwd)
+        .run(
+            "grep",
+            "--files-with-matches",
+            "--fixed-strings",
+            text,
+            returncodes=(0, 1),
+            error="Failed searching the files of {}".format(cwd),
+        )
+        .splitlines()
+    )
+
+
+def add_worktree(cwd, path, commit):
+    """Check out a commit in a new detached worktree."""
+    get_repo(cwd).run(
+        "worktree",
+        "add",
+        "--detach",
+        "--quiet",
+        path,
+        commit,
+        error="Creating a worktree in {} failed".format(path),
+    )
+
+
+def remove_worktree(cwd, path):
+    """Remove a worktree."""
+    try:
+        get_repo(cwd).run("worktree", "remove", "--force", path)
+    except HassReleaseError:
+        # Already gone, the next add_worktree reports a real problem.
+        pass
+
+
+def apply_commit(cwd, sha):
+    """Cherry pick a commit in a scratch worktree.
+
+    Returns the conflicting paths, empty if the commit applied. A commit that
+    does not apply is dropped again.
+    """
+    repo = get_repo(cwd)
+    try:
+        repo.run("cherry-pick", "--no-commit", sha)
+    except HassReleaseError:
+        conflicts = repo.run("diff", "--name-only", "--diff-filter=U").split()
+        repo.run("reset", "--hard", "--quiet")
+        return conflicts or ["(commit does not apply)"]
+
+    repo.run(
+        "-c",
+        "user.name=hassrelease",
+        "-c",
+        "user.email=hassrelease@localhost",
+        "commit",
+        "--quiet",
+        "--allow-empty",
+        "--no-verify",
+        "-m",
+        sha,
+    )
+    return []
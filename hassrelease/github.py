@@ -1,11 +1,10 @@
 import os
-import time
 from packaging.version import Version
 
 import requests
 from github3 import GitHub
-from github3.exceptions import GitHubError
 
+from . import client
 from .const import TOKEN_FILE
 from .core import HassReleaseError
 
@@ -24,11 +23,15 @@ def get_session():
             "Please write a GitHub token to .token or set GITHUB_TOKEN env var"
         )
 
-    gh = GitHub(token=token)
-    try:  # Test connection before starting
-        gh.is_starred("github", "gitignore")
-        return gh
-    except GitHubError:
+    gh = GitHub(token=token, session=client.ClientSession(token))
+    # The token is checked by the first API call instead of a request of its own.
+    gh.session.hooks["response"].append(_check_token)
+    return gh
+
+
+def _check_token(response, *args, **kwargs):
+    """Report a token rejected by the API."""
+    if response.status_code == 401:
         raise HassReleaseError("Invalid token found")
 
 
@@ -67,37 +70,36 @@ class MyGitHub:
     # GitHub API endpoint address
     ENDPOINT = "https://api.github.com"
     # GitHub API response header keys.
-    RATELIMIT_REMAINING_STR = "X-RateLimit-Remaining"
+    RATELIMIT_REMAINING_STR = client.RATELIMIT_REMAINING
     RATELIMIT_LIMIT_STR = "X-RateLimit-Limit"
-    RATELIMIT_RESET_STR = "X-RateLimit-Reset"
-    RETRY_AFTER_STR = "Retry-After"
+    RATELIMIT_RESET_STR = client.RATELIMIT_RESET
+    RETRY_AFTER_STR = client.RETRY_AFTER
 
-    def __init__(self, token: str = None, quiet: bool = False):
-        # The time when the GitHub API is going to be available.
+    def __init__(self, token: str = None, quiet: bool = False, pool_size: int = 10):
         self.quiet = quiet
-        self.next_time_available = 0
-        self.last_logged_next_time_available = self.next_time_available
+        # Keep a connection per simultaneous request alive. The session
+        # waits for the rate limit shared with the other processes. The
+        # crawl never requests a page twice, so no responses are cached.
+        self.session = client.ClientSession(
+            token, pool_size=pool_size, quiet=quiet, cache_size=0
+        )
         self.headers = {"Accept": "application/vnd.github.v3+json"}
-        if token is not None:
-            self.headers["Authorization"] = "token " + token
-
-    def log_timeout(self, available_after):
-        if self.last_logged_next_time_available == self.next_time_available:
-            pass
-        else:
-            print(
-                "Rate limit exceeded. Retrying in {} (at {})".format(
-                    time.strftime("%H:%M:%S", time.gmtime(available_after)),
-                    time.asctime(time.gmtime(time.time() + available_after)),
-                )
-            )
-            self.last_logged_next_time_available = self.next_time_available
+
+    @property
+    def telemetry(self):
+        """Return the CrawlTelemetry recording the requests."""
+        return self.session.telemetry
+
+    @telemetry.setter
+    def telemetry(self, telemetry):
+        """Record the requests in another CrawlTelemetry."""
+        self.session.telemetry = telemetry
 
     def request_with_retry(self, url: str, params: dict = None):
         """
-        GETs HTTP data with awareness of possible rate-limit and rate-limit
-        abuse protection limitations. If there are any, waits for them to
-        expire and then retries.
+        GETs HTTP data, waiting for the rate-limit and rate-limit abuse
+        protection limitations to expire and retrying until there is a
+        response.
         Basically a 'requests.get()' wrapper.
         :param url: Matches the corresponding parameter of requests.get().
         :param params: Matches the corresponding parameter of requests.get().
@@ -105,40 +107,10 @@ class MyGitHub:
         """
         # Retry until a response is returned.
         while True:
-            available_after = self.next_time_available - int(time.time())
-            if available_after > 0:
-                if not self.quiet:
-                    self.log_timeout(available_after)
-                time.sleep(available_after)
-            # The API must be available at that point
             try:
-                resp = requests.get(url, params, headers=self.headers)
-            except requests.exceptions.ConnectionError as err:
+                return self.session.get(url, params=params, headers=self.headers)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as err:
                 print("A ConnectionError was caught. Retrying. Error: {}".format(err))
-                continue
-            # If forbidden (may be because of rate-limit timeout.  If so,
-            # we'll wait and then retry).
-            if resp.status_code == 403:
-                # There may be multiple reasons for this.
-                # If it is the rate-limit abuse protection, there will
-                # be such field.
-                retry_after = resp.headers.get(MyGitHub.RETRY_AFTER_STR)
-                if retry_after is not None:
-                    self.next_time_available = int(time.time()) + int(retry_after)
-                    # Back to waiting.
-                # If it is not the abuse protection.
-                else:
-                    # Maybe rate-limit exhaustion?
-                    ratelimit_reset = resp.headers.get(MyGitHub.RATELIMIT_RESET_STR)
-                    # If it is rate-limit exhaustion.
-                    if ratelimit_reset is not None:
-                        self.next_time_available = int(ratelimit_reset)
-                        # Back to waiting.
-                    # If it is something else
-                    else:
-                        # This method is not responsible for this
-                        return resp
-            # If some other case. It may be a success, or it may be an
-            # another error.  This method is not responsible for this.
-            else:
-                return resp
@@ -0,0 +1,211 @@
+"""Classify the pull requests of a milestone."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import json
+import pathlib
+from types import SimpleNamespace
+
+from .const import LABEL_CHERRY_PICKED
+
+# Number of milestone pull requests classified simultaneously.
+SCAN_WORKERS = 16
+# Issues updated this long before a scan are asked for again, in case the
+# clocks of GitHub and this machine differ.
+SINCE_MARGIN = timedelta(minutes=1)
+
+STATUS_PICKED = "picked"
+STATUS_NOT_MERGED = "not merged"
+STATUS_TO_PICK = "to pick"
+STATUS_ON_BRANCH = "on branch"
+
+
+class MilestonePR:
+    """A closed pull request of a milestone and its pick status."""
+
+    def __init__(self, issue, status, pull=None, sha=None):
+        """Initialize the milestone PR."""
+        self.issue = issue
+        self.status = status
+        self.pull = pull
+        # The merge commit, if the PR was merged.
+        self.sha = sha
+
+    @property
+    def number(self):
+        """Return the PR number."""
+        return self.issue.number
+
+
+class CachedIssue:
+    """The fields of a milestone issue stored by an incremental scan."""
+
+    def __init__(self, repo, number, title, login, labels, body):
+        """Initialize the cached issue."""
+        self._repo = repo
+        self.number = number
+        self.title = title
+        self.user = SimpleNamespace(login=login)
+        self.original_labels = [SimpleNamespace(name=label) for label in labels]
+        self.body = body
+        self.pull_request_urls = True
+
+    def add_labels(self, *labels):
+        """Add labels to the issue on GitHub."""
+        return self._repo.issue(self.number).add_labels(*labels)
+
+
+def classify(repo, issue, index=None, branch=None):
+    """Classify a milestone issue that is a pull request.
+
+    If a PRIndex is passed, PRs merged into the local default branch are
+    classified without fetching the pull request, and PRs already on branch
+    are reported as such.
+    """
+    # The labels are part of the issue listing, no need to fetch them.
+    if any(label.name == LABEL_CHERRY_PICKED for label in issue.original_labels):
+        return MilestonePR(
+            issue,
+            STATUS_PICKED,
+            sha=index.merge_commit(issue.number) if index is not None else None,
+        )
+
+    if index is not None:
+        sha = index.merge_commit(issue.number)
+        if branch is not None and index.on_branch(issue.number, branch):
+            return MilestonePR(issue, STATUS_ON_BRANCH, sha=sha)
+        if sha is not None:
+            return MilestonePR(issue, STATUS_TO_PICK, sha=sha)
+
+    pull = repo.pull_request(issue.number)
+
+    if not pull.is_merged():
+        return MilestonePR(issue, STATUS_NOT_MERGED, pull)
+
+    return MilestonePR(issue, STATUS_TO_PICK, pull, pull.merge_commit_sha)
+
+
+def scan(
+    repo, milestone, workers=SCAN_WORKERS, index=None, branch=None, state_file=None
+):
+    """Classify the closed pull requests of a milestone, sorted by number.
+
+    The pull requests missing from the index are fetched concurrently.
+
+    With a state_file, the classification is stored and later scans only
+    list the issues updated since the previous scan. The others keep their
+    stored classification, checked against the index. The whole milestone
+    is listed again if the number of closed issues no longer matches.
+    """
+    classify_issue = partial(classify, repo, index=index, branch=branch)
+    if state_file is None:
+        with ThreadPoolExecutor(workers) as executor:
+            return list(
+                executor.map(classify_issue, _closed_pull_requests(repo, milestone))
+            )
+
+    state_file = pathlib.Path(state_file)
+    scanned = datetime.now(timezone.utc)
+    state = None
+    if state_file.is_file():
+        state = json.loads(state_file.read_text())
+
+    if state is not None:
+        entries = {int(number): entry for number, entry in state["issues"].items()}
+        updated = list(
+            repo.issues(milestone=milestone.number, state="all", since=state["since"])
+        )
+        for issue in updated:
+            entries.pop(issue.number, None)
+        updated = [issue for issue in updated if issue.state == "closed"]
+        if len(entries) + len(updated) != milestone.closed_issues:
+            # Issues were removed from the milestone, start over.
+            state = None
+
+    if state is None:
+        entries = {}
+        updated = list(repo.issues(milestone=milestone.number, state="closed"))
+
+    to_classify = []
+    for issue in updated:
+        if issue.pull_request_urls:
+            to_classify.append(issue)
+        else:
+            entries[issue.number] = None
+
+    with ThreadPoolExecutor(workers) as executor:
+        result = list(executor.map(classify_issue, to_classify))
+
+    for number, entry in entries.items():
+        if entry is not None:
+            result.append(_reclassify(repo, number, entry, index, branch))
+    result.sort(key=lambda milestone_pr: milestone_pr.number)
+
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(
+        json.dumps(
+            {
+                "since": (scanned - SINCE_MARGIN).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "issues": {
+                    **{
+                        number: None
+                        for number, entry in entries.items()
+                        if entry is None
+                    },
+                    **{
+                        milestone_pr.number: _entry(milestone_pr)
+                        for milestone_pr in result
+                    },
+                },
+            }
+        )
+    )
+    return result
+
+
+def _closed_pull_requests(repo, milestone):
+    """Return the closed pull request issues of a milestone, sorted by number."""
+    return sorted(
+        (
+            issue
+            for issue in repo.issues(milestone=milestone.number, state="closed")
+            if issue.pull_request_urls
+        ),
+        key=lambda issue: issue.number,
+    )
+
+
+def _entry(milestone_pr):
+    """Return the stored form of a classified PR."""
+    issue = milestone_pr.issue
+    return {
+        "status": milestone_pr.status,
+        "sha": milestone_pr.sha,
+        "title": issue.title,
+        "login": issue.user.login,
+        "labels": [label.name for label in issue.original_labels],
+        "body": getattr(issue, "body", None),
+    }
+
+
+def _reclassify(repo, number, entry, index, branch):
+    """Return the MilestonePR of a stored classification.
+
+    Only the local index is consulted, a PR to pick may have landed on the
+    branch since it was stored.
+    """
+    issue = CachedIssue(
+        repo, number, entry["title"], entry["login"], entry["labels"], entry["body"]
+    )
+    status = entry["status"]
+    sha = entry["sha"]
+    if index is not None:
+        sha = index.merge_commit(number) or sha
+
+    if status in (STATUS_TO_PICK, STATUS_ON_BRANCH):
+        if branch is not None and index is not None and index.on_branch(number, branch):
+            status = STATUS_ON_BRANCH
+        else:
+            status = STATUS_TO_PICK
+    return MilestonePR(issue, status, sha=sha)
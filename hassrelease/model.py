@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 import re
-from packaging.version import Version
+import threading
 
+from .const import CORE_PATH
 from .git import get_log
 
+# Number of issues fetched simultaneously by PRCache.get_many.
+FETCH_WORKERS = 16
+
 
 class LogLine:
     PR_PATTERN = re.compile(r"\(#(\d+)\)")
@@ -26,20 +31,47 @@ class LogLine:
 
 
 class PRCache:
+    """Issues of PRs, fetched once.
+
+    The cache can be shared by threads. Two threads asking for the same
+    missing PR at the same time may both fetch it, the first issue stored is
+    kept.
+    """
+
     def __init__(self, repo):
         self.repo = repo
         self.cache = {}
+        self._lock = threading.Lock()
 
     def get(self, pr):
-        if pr not in self.cache:
-            self.cache[pr] = self.repo.issue(pr)
-        return self.cache[pr]
+        issue = self.cache.get(pr)
+        if issue is None:
+            issue = self.repo.issue(pr)
+            with self._lock:
+                issue = self.cache.setdefault(pr, issue)
+        return issue
+
+    def get_many(self, prs, workers=FETCH_WORKERS):
+        """Return the issues of several PRs, fetching the missing ones concurrently."""
+        missing = [pr for pr in dict.fromkeys(prs) if pr not in self.cache]
+        if missing:
+            with ThreadPoolExecutor(min(workers, len(missing))) as executor:
+                for pr, issue in zip(missing, executor.map(self.repo.issue, missing)):
+                    with self._lock:
+                        self.cache.setdefault(pr, issue)
+        return [self.cache[pr] for pr in prs]
 
 
 class Release:
-    def __init__(self, version, *, branch):
+    def __init__(self, version, *, branch, repo=CORE_PATH, base=None):
+        # Imported here, commands that don't handle releases start without it.
+        from packaging.version import Version
+
         self.version = Version(version)
         self.branch = branch
+        self.repo = repo
+        # The ref the branch is compared against, master if None.
+        self.base = base
         self._log_lines = None
 
         if self.version.release[-1] == 0 and not self.version.is_prerelease:
@@ -62,5 +94,7 @@ class Release:
 
     def log_lines(self):
         if self._log_lines is None:
-            self._log_lines = [LogLine(line) for line in get_log(self.branch)]
+            self._log_lines = [
+                LogLine(line) for line in get_log(self.branch, self.repo, self.base)
+            ]
         return self._log_lines
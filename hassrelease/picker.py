@@ -0,0 +1,262 @@
+"""Cherry pick the merged pull requests of a milestone."""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pathlib
+import tempfile
+import threading
+
+from . import git
+from .const import LABEL_CHERRY_PICKED, PICK_STATE_FILE
+from .core import HassReleaseError
+from .pr_index import subject_pr
+
+# Number of labels applied simultaneously.
+LABEL_WORKERS = 4
+# Number of scratch worktrees used simultaneously by the pre-flight check.
+CHECK_WORKERS = 4
+
+
+class PickItem:
+    """A merge commit to cherry pick and the pull request it belongs to."""
+
+    def __init__(self, sha, number, title, login):
+        """Initialize the pick item."""
+        self.sha = sha
+        self.number = number
+        self.title = title
+        self.login = login
+
+    @classmethod
+    def from_pull(cls, pull):
+        """Create the item of a merged pull request."""
+        return cls(pull.merge_commit_sha, pull.number, pull.title, pull.user.login)
+
+    @classmethod
+    def from_issue(cls, issue, sha):
+        """Create the item of a pull request issue merged as sha."""
+        return cls(sha, issue.number, issue.title, issue.user.login)
+
+    def as_dict(self):
+        """Return the item as a dict that can be stored as JSON."""
+        return {
+            "sha": self.sha,
+            "number": self.number,
+            "title": self.title,
+            "login": self.login,
+        }
+
+
+class Picker:
+    """Cherry pick commits in one git sequence.
+
+    The pull requests are labelled as cherry picked by background workers as
+    soon as their commit lands. When a pick fails, the remaining items are
+    stored so the sequence can be resumed once the conflict is resolved.
+    """
+
+    def __init__(self, repo, local_repository, state_file=None):
+        """Initialize the picker."""
+        self.repo = repo
+        self.local_repository = local_repository
+        self.state_file = pathlib.Path(state_file or PICK_STATE_FILE.format(repo.name))
+        self.picked = []
+        self.failed = None
+        # Lines git printed while picking.
+        self.output = []
+        self._issues = {}
+
+    def pick(self, items, issues=None):
+        """Cherry pick the items in order.
+
+        issues maps PR numbers to already fetched issues, to avoid fetching
+        them again when labelling. Returns if all items were picked.
+        """
+        if issues:
+            self._issues.update(issues)
+        if not items:
+            return self._finish(True, [])
+        return self._finish(
+            *self._run(items, git.cherry_pick_sequence, [item.sha for item in items])
+        )
+
+    def resume(self):
+        """Continue a sequence that stopped on a conflict.
+
+        Returns if all remaining items were picked.
+        """
+        if not self.state_file.is_file():
+            raise HassReleaseError("No interrupted pick found to continue")
+
+        state = json.loads(self.state_file.read_text())
+        items = [PickItem(**item) for item in state["pending"]]
+
+        # Commits that landed since the sequence stopped, for example the
+        # resolved commit if it was committed by hand.
+        landed = {
+            subject_pr(subject)
+            for subject in git.get_subjects(
+                self.local_repository, "{}..HEAD".format(state["head"])
+            )
+        }
+        landed_items = []
+        while items and items[0].number in landed:
+            landed_items.append(items.pop(0))
+        self._run(landed_items, _all_picked, len(landed_items))
+
+        if not items:
+            return self._finish(True, [])
+
+        if git.cherry_pick_in_progress(self.local_repository):
+            return self._finish(*self._run(items, git.cherry_pick_continue))
+
+        return self._finish(
+            *self._run(items, git.cherry_pick_sequence, [item.sha for item in items])
+        )
+
+    def _run(self, items, sequence, *args):
+        """Run a cherry-pick sequence over the items.
+
+        The sequence is called with args, the local repository, a callback
+        taking the index of every item that landed and the output collector.
+        Returns if it succeeded and the items that did not land.
+        """
+        landed = []
+        labels = []
+
+        with ThreadPoolExecutor(LABEL_WORKERS) as labeller:
+
+            def on_picked(index):
+                landed.append(items[index])
+                labels.append(labeller.submit(self._label, items[index]))
+
+            success = sequence(
+                *args, self.local_repository, on_picked, output=self.output.append
+            )
+
+        self.picked.extend(landed)
+        for item, label in zip(landed, labels):
+            if label.exception() is not None:
+                print("Failed labelling #{}: {}".format(item.number, label.exception()))
+
+        return success, items[len(landed) :]
+
+    def _finish(self, success, remaining):
+        """Store or clear the items left by an interrupted sequence."""
+        if success:
+            if self.state_file.is_file():
+                self.state_file.unlink()
+            return True
+
+        self.failed = remaining[0] if remaining else None
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.state_file.write_text(
+            json.dumps(
+                {
+                    "head": git.get_head(self.local_repository),
+                    "pending": [item.as_dict() for item in remaining],
+                },
+                indent=2,
+            )
+        )
+        return False
+
+    def _label(self, item):
+        """Label the pull request of an item as cherry picked."""
+        issue = self._issues.get(item.number) or self.repo.issue(item.number)
+        issue.add_labels(LABEL_CHERRY_PICKED)
+
+
+class CheckResult:
+    """The outcome of simulating the pick of an item."""
+
+    def __init__(self, item, conflicts=(), conflicting_picks=()):
+        """Initialize the check result."""
+        self.item = item
+        # Paths that could not be merged, empty if the item applies cleanly.
+        self.conflicts = list(conflicts)
+        # Earlier picks changing the conflicting paths. If there are none
+        # the item conflicts with the target branch itself.
+        self.conflicting_picks = list(conflicting_picks)
+
+
+def check(local_repository, items, target="HEAD", workers=CHECK_WORKERS):
+    """Simulate picking the items in order onto target.
+
+    Items are grouped so that items changing the same paths end up in the
+    same group, in their original order. Groups are independent of each
+    other, so they are simulated in parallel, each in its own scratch
+    worktree. The working tree of the local repository is not touched.
+    Returns a CheckResult per item, in order.
+    """
+    if not items:
+        return []
+
+    changed = git.get_changed_paths(local_repository, [item.sha for item in items])
+
+    # Union find over the items, joined by the paths they change.
+    parents = list(range(len(items)))
+
+    def root(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    owner_by_path = {}
+    for index, item in enumerate(items):
+        for path in changed[item.sha]:
+            owner = owner_by_path.setdefault(path, index)
+            parents[root(index)] = root(owner)
+
+    # Deal the groups out over the workers, keeping items in order.
+    groups = {}
+    for index in range(len(items)):
+        groups.setdefault(root(index), []).append(index)
+    buckets = [[] for _ in range(min(workers, len(groups)))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(group)
+
+    conflicts = {}
+    worktree_lock = threading.Lock()
+
+    def simulate(bucket):
+        # The worktree is named after its unique directory, and adding and
+        # removing worktrees of one repository at the same time races on its
+        # administrative files.
+        with tempfile.TemporaryDirectory(prefix="hassrelease-check-") as worktree:
+            with worktree_lock:
+                git.add_worktree(local_repository, worktree, target)
+            try:
+                for index in sorted(bucket):
+                    conflicts[index] = git.apply_commit(worktree, items[index].sha)
+            finally:
+                with worktree_lock:
+                    git.remove_worktree(local_repository, worktree)
+
+    with ThreadPoolExecutor(len(buckets)) as executor:
+        for future in [executor.submit(simulate, bucket) for bucket in buckets]:
+            future.result()
+
+    results = []
+    for index, item in enumerate(items):
+        paths = set(conflicts[index])
+        results.append(
+            CheckResult(
+                item,
+                conflicts[index],
+                [
+                    earlier
+                    for pos, earlier in enumerate(items[:index])
+                    if not conflicts[pos] and changed[earlier.sha] & paths
+                ],
+            )
+        )
+    return results
+
+
+def _all_picked(count, cwd, on_picked, output=None):
+    """Report items that already landed as picked."""
+    for index in range(count):
+        on_picked(index)
+    return True
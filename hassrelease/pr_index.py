@@ -0,0 +1,214 @@
+"""Local index of the pull requests merged into a repository."""
+
+import json
+import os
+import pathlib
+
+from . import git
+from .const import PR_INDEX_FILE
+from .core import HassReleaseError
+from .model import LogLine
+
+# Branches tracked besides the default branch of origin, when they exist.
+EXTRA_BRANCHES = ("rc", "origin/rc", "origin/master")
+RECORD_SEPARATOR = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+
+
+def subject_pr(subject):
+    """Return the PR number at the end of a commit subject, if any."""
+    matches = LogLine.PR_PATTERN.findall(subject)
+    return int(matches[-1]) if matches else None
+
+
+class PRIndex:
+    """Map PR numbers to the squash-merged commits in the local git history.
+
+    The commit subjects carry the PR number, as in "Fix light (#1234)". For
+    every PR the index stores the commit on the default branch, the author
+    email, the paths it touched and the tracked branches containing it. The
+    index is stored as JSON and updated incrementally from the branch tips
+    seen on the previous update.
+
+    Only the default branch is read in full. Of the other branches only the
+    commits the default branch doesn't have are read, the PRs of the history
+    they share with it are those merged before their merge base.
+    """
+
+    def __init__(self, local_repository, path=None, branches=()):
+        """Initialize the index, loading it from disk if it exists.
+
+        branches are tracked in addition to the EXTRA_BRANCHES.
+        """
+        self.local_repository = local_repository
+        self.extra_branches = list(EXTRA_BRANCHES) + [
+            branch for branch in branches if branch not in EXTRA_BRANCHES
+        ]
+        self.path = pathlib.Path(
+            path
+            or PR_INDEX_FILE.format(
+                os.path.basename(os.path.normpath(local_repository))
+            )
+        )
+        self.main_branch = None
+        self.tips = {}
+        self.prs = {}
+
+        if self.path.is_file():
+            data = json.loads(self.path.read_text())
+            self.main_branch = data["main_branch"]
+            self.tips = data["tips"]
+            self.prs = {int(number): pr for number, pr in data["prs"].items()}
+
+    def _git(self, *args):
+        """Run git in the local repository and return its output."""
+        return git.get_repo(self.local_repository).run(
+            *args, error="Failed indexing {}".format(self.local_repository)
+        )
+
+    def _branches(self):
+        """Return the default branch and the tips of the tracked branches."""
+        main_branch, main_tip = git.get_main_branch(self.local_repository)
+        # The default branch comes first, the other branches are indexed
+        # against it.
+        tips = {main_branch: main_tip}
+        repo = git.get_repo(self.local_repository)
+        for branch in self.extra_branches:
+            if branch not in tips:
+                tip = repo.resolve(branch)
+                if tip is not None:
+                    tips[branch] = tip
+        return main_branch, tips
+
+    def update(self):
+        """Index the commits added to the tracked branches since the last update.
+
+        Returns the number of commits read.
+        """
+        repo = git.get_repo(self.local_repository)
+        main_branch, tips = self._branches()
+        if main_branch != self.main_branch:
+            self.main_branch = main_branch
+            self.tips = {}
+            self.prs = {}
+
+        read = 0
+        for branch, tip in tips.items():
+            old_tip = self.tips.get(branch)
+            if old_tip == tip:
+                continue
+
+            if old_tip is not None and repo.is_ancestor(old_tip, tip):
+                read += self._index(branch, "{}..{}".format(old_tip, tip))
+            else:
+                # First update or rewritten branch, index it again.
+                for pr in self.prs.values():
+                    if branch in pr["branches"]:
+                        pr["branches"].remove(branch)
+                if branch == main_branch:
+                    read += self._index(branch, tip)
+                else:
+                    main_tip = tips[main_branch]
+                    read += self._index(branch, "{}..{}".format(main_tip, tip))
+                    read += self._index_shared(branch, main_tip, tip)
+            self.tips[branch] = tip
+
+        for branch in set(self.tips) - set(tips):
+            del self.tips[branch]
+            for pr in self.prs.values():
+                if branch in pr["branches"]:
+                    pr["branches"].remove(branch)
+
+        if read:
+            self.save()
+        return read
+
+    def _index_shared(self, branch, main_tip, tip):
+        """Add a branch to the PRs of the history it shares with the default branch.
+
+        Those are the PRs of the default branch, except the ones merged
+        after the merge base. Returns the number of commits read.
+        """
+        try:
+            base = self._git("merge-base", main_tip, tip).strip()
+        except HassReleaseError:
+            # No shared history.
+            return 0
+        subjects = self._git(
+            "log", "--no-merges", "--format=%s", "{}..{}".format(base, main_tip)
+        ).splitlines()
+        newer = {subject_pr(subject) for subject in subjects}
+        for number, pr in self.prs.items():
+            if (
+                self.main_branch in pr["branches"]
+                and number not in newer
+                and branch not in pr["branches"]
+            ):
+                pr["branches"].append(branch)
+        return len(subjects)
+
+    def _index(self, branch, revision_range):
+        """Index the commits of a revision range of a branch."""
+        output = self._git(
+            "log",
+            "--no-merges",
+            "--name-only",
+            "--format={}%H{}%ae{}%s".format(
+                RECORD_SEPARATOR, FIELD_SEPARATOR, FIELD_SEPARATOR
+            ),
+            revision_range,
+        )
+        records = output.split(RECORD_SEPARATOR)[1:]
+        for record in records:
+            header, _, paths = record.partition("\n")
+            sha, email, subject = header.split(FIELD_SEPARATOR, 2)
+            number = subject_pr(subject)
+            if number is None:
+                continue
+
+            pr = self.prs.get(number)
+            if pr is None:
+                pr = self.prs[number] = {
+                    "sha": sha,
+                    "email": email,
+                    "paths": _paths(paths),
+                    "branches": [],
+                }
+            elif branch == self.main_branch:
+                # Cherry picks may have been indexed first, prefer the
+                # original commit.
+                pr.update(sha=sha, email=email, paths=_paths(paths))
+
+            if branch not in pr["branches"]:
+                pr["branches"].append(branch)
+        return len(records)
+
+    def save(self):
+        """Store the index."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {"main_branch": self.main_branch, "tips": self.tips, "prs": self.prs}
+            )
+        )
+
+    def get(self, number):
+        """Return the indexed information of a PR, None if not indexed."""
+        return self.prs.get(number)
+
+    def merge_commit(self, number):
+        """Return the commit of a PR merged into the default branch, if any."""
+        pr = self.prs.get(number)
+        if pr is None or self.main_branch not in pr["branches"]:
+            return None
+        return pr["sha"]
+
+    def on_branch(self, number, branch):
+        """Test if a PR landed on a tracked branch."""
+        pr = self.prs.get(number)
+        return pr is not None and branch in pr["branches"]
+
+
+def _paths(text):
+    """Return the paths listed by git log --name-only."""
+    return [path for path in text.splitlines() if path]
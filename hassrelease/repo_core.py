@@ -2,27 +2,97 @@
 
 from pathlib import Path
 import json
+import os
+import re
 import subprocess
 
+from hassrelease import git
+from hassrelease.const import CORE_PATH_ENV
 from hassrelease.util import prettier
 
-PATH = Path(__file__).parent / "../../core/"
+PATH = Path(os.environ.get(CORE_PATH_ENV) or Path(__file__).parent / "../../core/")
+FRONTEND_PACKAGE = "home-assistant-frontend"
+FRONTEND_MANIFEST = "homeassistant/components/frontend/manifest.json"
+# Generated files that pin the frontend exactly once.
+GENERATED_FILES = (
+    "requirements_all.txt",
+    "requirements_test_all.txt",
+    "homeassistant/package_constraints.txt",
+)
+FRONTEND_PIN = re.compile(re.escape(FRONTEND_PACKAGE) + r"==([0-9A-Za-z.+!-]+)")
 
 
-def update_frontend_version(value):
+def update_frontend_version(value, path=PATH):
     """Update frontend requirement."""
-    manifest_path = PATH / "homeassistant/components/frontend/manifest.json"
+    manifest_path = Path(path) / FRONTEND_MANIFEST
     manifest = json.loads(manifest_path.read_text())
-    manifest["requirements"] = [f"home-assistant-frontend=={value}"]
+    manifest["requirements"] = [f"{FRONTEND_PACKAGE}=={value}"]
     manifest_path.write_text(json.dumps(manifest))
-    prettier(f"{PATH}/homeassistant/components/frontend/manifest.json")
+    prettier(str(manifest_path))
 
 
-def gen_requirements_all():
+def gen_requirements_all(path=PATH):
     """Run gen_requirements_all.py."""
-    subprocess.run("python3 -m script.gen_requirements_all", cwd=PATH, shell=True)
+    subprocess.run("python3 -m script.gen_requirements_all", cwd=path, shell=True)
 
 
-def commit_all(message):
+def update_frontend_pins(value, path=PATH):
+    """Rewrite the frontend pin in place in every file of the repository.
+
+    The manifest and the generated requirements and constraints files keep
+    their formatting. Nothing is written unless the result can be verified:
+    the manifest only requires the new frontend, every generated file pins
+    it exactly once and every pin found could be rewritten. Returns the
+    rewritten files, None if the rewrite could not be verified.
+    """
+    path = Path(path)
+    pin = f"{FRONTEND_PACKAGE}=={value}"
+    files = git.grep_files(path, f"{FRONTEND_PACKAGE}==")
+    if any(file not in files for file in (FRONTEND_MANIFEST, *GENERATED_FILES)):
+        return None
+
+    texts = {}
+    for file in files:
+        original = (path / file).read_text()
+        text, count = FRONTEND_PIN.subn(pin, original)
+        # A pin the pattern does not match would be left behind.
+        if not count or count != original.count(f"{FRONTEND_PACKAGE}=="):
+            return None
+        if file in GENERATED_FILES and count != 1:
+            return None
+        texts[file] = text
+
+    try:
+        manifest = json.loads(texts[FRONTEND_MANIFEST])
+    except ValueError:
+        return None
+    if manifest.get("requirements") != [pin]:
+        return None
+
+    changed = []
+    for file, text in texts.items():
+        if (path / file).read_text() != text:
+            (path / file).write_text(text)
+            changed.append(file)
+    return changed
+
+
+def bump_frontend_version(value, path=PATH):
+    """Update the frontend requirement and the files generated from it.
+
+    The pins are rewritten in place, the requirements are only regenerated
+    if that fails. Returns the rewritten files, None if the requirements
+    were regenerated.
+    """
+    changed = update_frontend_pins(value, path)
+    if changed is not None:
+        return changed
+
+    update_frontend_version(value, path)
+    gen_requirements_all(path)
+    return None
+
+
+def commit_all(message, path=PATH):
     """Commit all changed files."""
-    subprocess.run(["git", "commit", "-am", message], cwd=PATH)
+    subprocess.run(["git", "commit", "-am", message], cwd=path)
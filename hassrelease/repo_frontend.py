@@ -2,13 +2,17 @@
 
 import os
 
-PATH = os.path.join(os.path.dirname(__file__), "../../frontend/")
+from hassrelease.const import FRONTEND_PATH_ENV
 
+PATH = os.environ.get(FRONTEND_PATH_ENV) or os.path.join(
+    os.path.dirname(__file__), "../../frontend/"
+)
 
-def get_version():
+
+def get_version(path=PATH):
     """Get current version of frontend repo."""
     found = None
-    with open(os.path.join(PATH, "pyproject.toml"), "rt") as setup_file:
+    with open(os.path.join(path, "pyproject.toml"), "rt") as setup_file:
         for line in setup_file:
             line = line.strip()
             if line.startswith("version"):
@@ -0,0 +1,347 @@
+"""Telemetry of the GitHub requests and the credits crawl."""
+
+from collections import Counter, deque
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import tempfile
+import threading
+import time
+
+METRIC_PREFIX = "hassrelease_credits"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Number of recent requests used for the latency percentiles.
+LATENCY_WINDOW = 1000
+# Seconds of history used for the request and task rates.
+RATE_WINDOW = 60
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class CrawlTelemetry:
+    """Thread safe counters describing the requests of a client or a crawl."""
+
+    def __init__(self, clock=time.monotonic):
+        """Initialize the telemetry."""
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.queue_depth = Counter()
+        self.tasks_done = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.latency_sum = 0.0
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = None
+        self.cache_lookups = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._request_times = deque()
+        self._task_times = deque()
+
+    def _trim(self, times, now):
+        """Drop the timestamps that are out of the rate window."""
+        while times and times[0] < now - RATE_WINDOW:
+            times.popleft()
+
+    def _rate(self, times, now):
+        """Return the number of events per second over the rate window."""
+        self._trim(times, now)
+        return len(times) / max(min(RATE_WINDOW, now - self.started), 1)
+
+    def task_queued(self, task_type):
+        """Record a task put in the queue."""
+        with self._lock:
+            self.queue_depth[task_type] += 1
+
+    def task_started(self, task_type):
+        """Record a task taken from the queue."""
+        with self._lock:
+            self.queue_depth[task_type] -= 1
+
+    def task_done(self):
+        """Record a handled task."""
+        with self._lock:
+            now = self._clock()
+            self.tasks_done += 1
+            self._task_times.append(now)
+            self._trim(self._task_times, now)
+
+    def request_started(self):
+        """Record a request sent to the API."""
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, latency, headers):
+        """Record a response from the API."""
+        with self._lock:
+            now = self._clock()
+            self.in_flight -= 1
+            self.requests += 1
+            self.latency_sum += latency
+            self._latencies.append(latency)
+            self._request_times.append(now)
+            self._trim(self._request_times, now)
+            remaining = headers.get("X-RateLimit-Remaining")
+            if remaining is not None:
+                self.rate_limit_remaining = int(remaining)
+            reset = headers.get("X-RateLimit-Reset")
+            if reset is not None:
+                self.rate_limit_reset = int(reset)
+
+    def request_failed(self):
+        """Record a request that did not get a response."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def cache_lookup(self, cache, hit):
+        """Record a lookup in one of the local caches."""
+        with self._lock:
+            self.cache_lookups[cache, hit] += 1
+
+    def snapshot(self):
+        """Return the current values as a dict."""
+        with self._lock:
+            now = self._clock()
+            latencies = sorted(self._latencies)
+            queued = sum(self.queue_depth.values())
+            tasks_per_second = self._rate(self._task_times, now)
+            return {
+                "elapsed": now - self.started,
+                "requests": self.requests,
+                "requests_per_second": self._rate(self._request_times, now),
+                "in_flight": self.in_flight,
+                "queue_depth": dict(self.queue_depth),
+                "tasks_done": self.tasks_done,
+                "latency_sum": self.latency_sum,
+                "latency_quantiles": {
+                    quantile: latencies[int(quantile * (len(latencies) - 1))]
+                    for quantile in QUANTILES
+                    if latencies
+                },
+                "rate_limit_remaining": self.rate_limit_remaining,
+                "rate_limit_reset": self.rate_limit_reset,
+                "cache_lookups": dict(self.cache_lookups),
+                "eta": queued / tasks_per_second if tasks_per_second else None,
+            }
+
+    def status_line(self):
+        """Return a one line summary of the crawl."""
+        snap = self.snapshot()
+        quantiles = snap["latency_quantiles"]
+        caches = sorted({cache for cache, _ in snap["cache_lookups"]})
+        parts = [
+            "{:.1f} req/s".format(snap["requests_per_second"]),
+            "{} in flight".format(snap["in_flight"]),
+            "queue {}".format(
+                " ".join(
+                    "{}={}".format(task_type, depth)
+                    for task_type, depth in sorted(snap["queue_depth"].items())
+                    if depth
+                )
+                or "empty"
+            ),
+        ]
+        if quantiles:
+            parts.append(
+                "p50/p90/p99 {}ms".format(
+                    "/".join(
+                        str(round(quantiles[quantile] * 1000)) for quantile in QUANTILES
+                    )
+                )
+            )
+        if snap["rate_limit_remaining"] is not None:
+            parts.append(
+                "rate limit {} (reset {})".format(
+                    snap["rate_limit_remaining"],
+                    time.strftime("%H:%M:%S", time.gmtime(snap["rate_limit_reset"])),
+                )
+            )
+        for cache in caches:
+            hits = snap["cache_lookups"].get((cache, True), 0)
+            total = hits + snap["cache_lookups"].get((cache, False), 0)
+            parts.append("{} hits {:.0%}".format(cache, hits / total))
+        if snap["eta"] is not None:
+            parts.append("ETA {}".format(timedelta(seconds=round(snap["eta"]))))
+        return " | ".join(parts)
+
+    def openmetrics(self):
+        """Return the metrics in the OpenMetrics text format."""
+        snap = self.snapshot()
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append("# TYPE {}_{} {}".format(METRIC_PREFIX, name, metric_type))
+            lines.append("# HELP {}_{} {}".format(METRIC_PREFIX, name, help_text))
+            for suffix, labels, value in samples:
+                label_text = ",".join(
+                    '{}="{}"'.format(key, val) for key, val in labels.items()
+                )
+                lines.append(
+                    "{}_{}{}{} {}".format(
+                        METRIC_PREFIX,
+                        name,
+                        suffix,
+                        "{" + label_text + "}" if label_text else "",
+                        value,
+                    )
+                )
+
+        family(
+            "requests",
+            "counter",
+            "Requests answered by the GitHub API.",
+            [("_total", {}, snap["requests"])],
+        )
+        family(
+            "requests_per_second",
+            "gauge",
+            "Requests answered per second over the last minute.",
+            [("", {}, snap["requests_per_second"])],
+        )
+        family(
+            "in_flight_requests",
+            "gauge",
+            "Requests waiting for a response.",
+            [("", {}, snap["in_flight"])],
+        )
+        family(
+            "queue_depth",
+            "gauge",
+            "Tasks waiting in the queue.",
+            [
+                ("", {"task": task_type}, depth)
+                for task_type, depth in sorted(snap["queue_depth"].items())
+            ],
+        )
+        family(
+            "tasks",
+            "counter",
+            "Tasks handled.",
+            [("_total", {}, snap["tasks_done"])],
+        )
+        family(
+            "request_latency_seconds",
+            "summary",
+            "Latency of the GitHub API requests.",
+            [
+                ("", {"quantile": quantile}, value)
+                for quantile, value in snap["latency_quantiles"].items()
+            ]
+            + [("_count", {}, snap["requests"]), ("_sum", {}, snap["latency_sum"])],
+        )
+        if snap["rate_limit_remaining"] is not None:
+            family(
+                "rate_limit_remaining",
+                "gauge",
+                "Requests left in the current rate limit window.",
+                [("", {}, snap["rate_limit_remaining"])],
+            )
+            family(
+                "rate_limit_reset_timestamp_seconds",
+                "gauge",
+                "Time at which the rate limit window resets.",
+                [("", {}, snap["rate_limit_reset"])],
+            )
+        family(
+            "cache_lookups",
+            "counter",
+            "Lookups in the local login and name caches.",
+            [
+                ("_total", {"cache": cache, "result": "hit" if hit else "miss"}, count)
+                for (cache, hit), count in sorted(snap["cache_lookups"].items())
+            ],
+        )
+        if snap["eta"] is not None:
+            family(
+                "eta_seconds",
+                "gauge",
+                "Estimated time until the queue is empty.",
+                [("", {}, snap["eta"])],
+            )
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path):
+        """Atomically write the metrics to a file."""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+        )
+        with open(fd, "w") as metrics_file:
+            metrics_file.write(self.openmetrics())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+
+class ShardedTelemetry(CrawlTelemetry):
+    """The telemetry of a crawl split over worker processes.
+
+    The workers send snapshots of their telemetry, the snapshots of the
+    crawl add them to the requests of this process. The latency quantiles
+    are those of the slowest worker, the rate limit the lowest reported.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Initialize the telemetry."""
+        super().__init__(clock)
+        self._shards = {}
+
+    def update(self, shard, snapshot):
+        """Store the last snapshot of a worker."""
+        with self._lock:
+            self._shards[shard] = snapshot
+
+    def snapshot(self):
+        """Return the current values of the crawl as a dict."""
+        snap = super().snapshot()
+        with self._lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            for key in (
+                "requests",
+                "requests_per_second",
+                "in_flight",
+                "tasks_done",
+                "latency_sum",
+            ):
+                snap[key] += shard[key]
+            for key in ("queue_depth", "cache_lookups"):
+                for name, count in shard[key].items():
+                    snap[key][name] = snap[key].get(name, 0) + count
+            for quantile, latency in shard["latency_quantiles"].items():
+                snap["latency_quantiles"][quantile] = max(
+                    latency, snap["latency_quantiles"].get(quantile, latency)
+                )
+            if shard["rate_limit_remaining"] is not None and (
+                snap["rate_limit_remaining"] is None
+                or shard["rate_limit_remaining"] < snap["rate_limit_remaining"]
+            ):
+                snap["rate_limit_remaining"] = shard["rate_limit_remaining"]
+                snap["rate_limit_reset"] = shard["rate_limit_reset"]
+            if shard["eta"] is not None:
+                snap["eta"] = max(shard["eta"], snap["eta"] or 0)
+        return snap
+
+
+def serve_openmetrics(telemetry, port, host="127.0.0.1"):
+    """Serve the metrics on http://host:port/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Answer scrapes of the metrics endpoint."""
+
+        def do_GET(self):
+            """Return the metrics."""
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.openmetrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Do not log the scrapes."""
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -14,3 +14,17 @@ def open_vscode(*paths):
 def prettier(path):
     """Run prettier on a file."""
     subprocess.run(["prettier", "--write", path])
+
+
+def read_csv_to_dict(filename: str, encoding: str = None):
+    """Read the CSV data into a dict."""
+    data = {}
+    with open(filename, encoding=encoding) as inp:
+        for lin in inp:
+            if "," not in lin:
+                lin = lin.strip() + ","
+            if lin.count(",") > 1:
+                lin = "".join(lin.rsplit(",", 1))
+            key, value = [val.strip() for val in lin.split(",")]
+            data[key] = value
+    return data
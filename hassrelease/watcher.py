@@ -0,0 +1,123 @@
+"""Keep the release notes up to date while a release is being prepared."""
+
+from datetime import datetime, timedelta, timezone
+
+from . import changelog, git, model
+from .const import CORE_PATH
+
+# Seconds between two polls.
+POLL_INTERVAL = 5
+# Issues updated this long before a poll are asked for again, in case the
+# clocks of GitHub and this machine differ.
+SINCE_MARGIN = timedelta(minutes=1)
+
+
+class ReleaseWatcher:
+    """Regenerate the release notes of a branch when something changed.
+
+    The GitHub repository, the PR cache and the git client are kept between
+    polls. The notes are regenerated when the branch or the master branch
+    it is compared to moves, or when an issue of the milestone is updated.
+    Issue updates are polled with since and an ETag, so a poll without
+    changes costs one request that does not count against the rate limit.
+    """
+
+    def __init__(
+        self,
+        repo,
+        milestone,
+        branch="rc",
+        release=None,
+        local_repository=CORE_PATH,
+        directory=changelog.NOTES_DIR,
+        contributors=None,
+        docs=None,
+    ):
+        """Initialize the watcher.
+
+        contributors is a ContributorIndex, updated before every
+        regeneration, to thank the new contributors. docs is a DocsIndex,
+        also updated before every regeneration, to check the doc links.
+        """
+        self.repo = repo
+        self.milestone = milestone
+        self.branch = branch
+        self.release = release
+        self.local_repository = local_repository
+        self.directory = directory
+        self.contributors = contributors
+        self.docs = docs
+        # Doc items without a page, found by the last regeneration.
+        self.missing_docs = set()
+        self.prs = model.PRCache(repo)
+        self._git_repo = git.get_repo(local_repository)
+        self._refs = None
+        self._since = None
+        self._etag = None
+        self._updated_at = {}
+
+    def _branch_refs(self):
+        """Return the commits the branch and master point to."""
+        return self._git_repo.run(
+            "rev-parse",
+            self.branch,
+            "origin/master",
+            error="Failed reading {} in {}".format(self.branch, self.local_repository),
+        ).split()
+
+    def _updated_issues(self):
+        """Return the milestone issues updated since the last poll."""
+        polled = datetime.now(timezone.utc)
+        iterator = self.repo.issues(
+            milestone=self.milestone.number,
+            state="all",
+            since=self._since,
+            etag=self._etag,
+        )
+        updated = []
+        for issue in iterator:
+            if self._updated_at.get(issue.number) != issue.updated_at:
+                self._updated_at[issue.number] = issue.updated_at
+                updated.append(issue)
+
+        if updated:
+            self._since = polled - SINCE_MARGIN
+            self._etag = None
+        elif iterator.etag:
+            self._etag = iterator.etag
+        return updated
+
+    def poll(self):
+        """Regenerate the notes if something changed.
+
+        Returns None if nothing changed, otherwise the files whose content
+        changed.
+        """
+        refs = self._branch_refs()
+        updated = self._updated_issues()
+        # The listed issues are up to date, they replace the cached ones.
+        for issue in updated:
+            self.prs.cache[issue.number] = issue
+
+        if refs == self._refs and not updated:
+            return None
+        self._refs = refs
+
+        release = model.Release(
+            self.release or git.get_hass_version(self.branch, self.local_repository),
+            branch=self.branch,
+            repo=self.local_repository,
+        )
+        if self.contributors is not None:
+            self.contributors.update()
+        if self.docs is not None:
+            self.docs.update()
+        self.missing_docs = set()
+        return changelog.write(
+            release,
+            self.prs,
+            self.directory,
+            self.contributors,
+            self.docs,
+            self.missing_docs,
+        )
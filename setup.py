@@ -4,6 +4,7 @@ setup(
     name="hassrelease",
     version="1.0",
     packages=["hassrelease"],
+    package_data={"hassrelease": ["changelog_labels.json"]},
     install_requires=["github3.py==3.2.0", "click", "pystache", "requests", "toml", "packaging"],
     entry_points={"console_scripts": ["hassrelease = hassrelease.__main__:main"]},
 )
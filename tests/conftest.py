@@ -0,0 +1,41 @@
+import subprocess
+
+import pytest
+
+
+def git(cwd, *args):
+    """Run git in a repository and return its output."""
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(cwd, path, content, message):
+    """Write a file and commit it, returning the commit SHA."""
+    (cwd / path).parent.mkdir(parents=True, exist_ok=True)
+    (cwd / path).write_text(content)
+    git(cwd, "add", path)
+    git(cwd, "commit", "-q", "-m", message)
+    return git(cwd, "rev-parse", "HEAD")
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch, tmp_path):
+    """Give git a fixed identity and no user configuration."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "gitconfig"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Return a repository with a dev branch and an rc branch forked from it."""
+    path = tmp_path / "core"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "dev")
+    commit(path, "README", "base\n", "Initial commit")
+    git(path, "branch", "rc")
+    return path
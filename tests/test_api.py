@@ -0,0 +1,220 @@
+from types import SimpleNamespace
+
+import pytest
+
+from hassrelease import milestones
+from hassrelease.api import ReleaseContext
+
+from .conftest import commit, git
+
+
+class FakeIssue(SimpleNamespace):
+    def add_labels(self, *labels):
+        self.added_labels = labels
+        self.original_labels += [SimpleNamespace(name=label) for label in labels]
+        self.updated = True
+
+
+class FakeRepo:
+    name = "core"
+
+    def __init__(self, issues):
+        self._issues = issues
+
+    def milestones(self, state):
+        return [
+            SimpleNamespace(number=7, title="2024.1.0", closed_issues=len(self._issues))
+        ]
+
+    def issues(self, milestone, state, since=None):
+        if since is None:
+            return self._issues
+        updated = [issue for issue in self._issues if issue.updated]
+        for issue in updated:
+            issue.updated = False
+        return updated
+
+    def issue(self, number):
+        return next(issue for issue in self._issues if issue.number == number)
+
+    def pull_request(self, number):
+        return SimpleNamespace(number=number, is_merged=lambda: False)
+
+    def pull_requests(self, state):
+        assert state == "open"
+        return [SimpleNamespace(number=10)]
+
+
+class FakeSession:
+    def __init__(self, repo):
+        self.repo = repo
+        self.requested = []
+
+    def repository(self, owner, name):
+        self.requested.append((owner, name))
+        return self.repo
+
+
+def make_issue(number, title, body="", labels=()):
+    return FakeIssue(
+        number=number,
+        title=title,
+        body=body,
+        state="closed",
+        updated=False,
+        pull_request_urls={"url": "..."},
+        original_labels=[SimpleNamespace(name=label) for label in labels],
+        user=SimpleNamespace(login="user"),
+    )
+
+
+@pytest.fixture
+def local(repo, tmp_path, monkeypatch):
+    """Return a clone of the repo, with rc checked out."""
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "clone", "-q", "--bare", str(repo), str(remote))
+    path = tmp_path / "local"
+    git(tmp_path, "clone", "-q", str(remote), str(path))
+    git(path, "checkout", "-q", "rc")
+    monkeypatch.chdir(tmp_path)
+    return path
+
+
+def test_pick(repo, local, tmp_path):
+    sha = commit(repo, "a.py", "a\n", "Fix a (#1)")
+    git(tmp_path / "remote.git", "fetch", "-q", str(repo), "dev:dev")
+
+    issues = [make_issue(1, "Fix a"), make_issue(2, "Fix b")]
+    session = FakeSession(FakeRepo(issues))
+    context = ReleaseContext(session, paths={"core": str(local)})
+
+    scan = context.classify_milestone("core")
+    assert scan.milestone.title == "2024.1.0"
+    assert scan.branch == "rc"
+    assert [(pr.number, pr.status) for pr in scan.prs] == [
+        (1, milestones.STATUS_TO_PICK),
+        (2, milestones.STATUS_NOT_MERGED),
+    ]
+    assert [item.sha for item in scan.to_pick] == [sha]
+
+    result = context.pick("core")
+    assert result.success
+    assert [item.number for item in result.picked] == [1]
+    assert issues[0].added_labels == ("cherry-picked",)
+    assert git(local, "log", "-1", "--format=%s") == "Fix a (#1)"
+
+    # Labelled as picked now, nothing left to pick.
+    result = context.pick("core")
+    assert result.success
+    assert result.picked == []
+    assert result.scan.with_status(milestones.STATUS_PICKED)[0].number == 1
+
+    # The repository is looked up once for the context.
+    assert session.requested == [("home-assistant", "core")]
+
+
+def test_milestone_status(repo, local, tmp_path):
+    picked = commit(repo, "a.py", "a\n", "Fix a (#1)")
+    to_pick = commit(repo, "b.py", "b\n", "Fix b (#2)")
+    git(tmp_path / "remote.git", "fetch", "-q", str(repo), "dev:dev")
+    git(local, "fetch", "-q")
+    git(local, "cherry-pick", picked)
+
+    issues = [
+        make_issue(1, "Fix a", labels=["cherry-picked"]),
+        make_issue(2, "Fix b", "Docs: home-assistant/home-assistant.io#10"),
+        make_issue(
+            3, "Fix c", "https://github.com/home-assistant/home-assistant.io/pull/11"
+        ),
+    ]
+    context = ReleaseContext(FakeSession(FakeRepo(issues)), paths={"core": str(local)})
+
+    scan, statuses = context.milestone_status()
+
+    assert scan.branch == "rc"
+    assert [status.as_dict() for status in statuses] == [
+        {
+            "number": 1,
+            "title": "Fix a",
+            "merged": True,
+            "cherry_picked": True,
+            "sha": picked,
+            "on_branch": True,
+            "docs_pr": None,
+            "docs_state": None,
+        },
+        {
+            "number": 2,
+            "title": "Fix b",
+            "merged": True,
+            "cherry_picked": False,
+            "sha": to_pick,
+            "on_branch": False,
+            "docs_pr": 10,
+            "docs_state": "open",
+        },
+        {
+            "number": 3,
+            "title": "Fix c",
+            "merged": False,
+            "cherry_picked": False,
+            "sha": None,
+            "on_branch": False,
+            "docs_pr": 11,
+            "docs_state": "closed",
+        },
+    ]
+
+
+def test_generate_notes_batch(repo, tmp_path, monkeypatch):
+    git(repo, "tag", "2023.12.0")
+    commit(repo, "a.py", "a\n", "Fix a (#1)")
+    git(repo, "tag", "2024.1.0")
+    commit(repo, "b.py", "b\n", "Fix b (#2)")
+    git(repo, "tag", "2024.1.1")
+    git(repo, "tag", "not-a-version")
+    # Master is at the last release of the cycle, as when backfilling.
+    git(repo, "branch", "master")
+    commit(repo, "c.py", "c\n", "Fix c (#3)")
+    git(repo, "tag", "2024.2.0")
+    local = tmp_path / "local"
+    git(tmp_path, "clone", "-q", str(repo), str(local))
+    monkeypatch.chdir(tmp_path)
+
+    issues = [make_issue(number, f"Fix {number}") for number in (1, 2, 3)]
+    for issue in issues:
+        issue.milestone = None
+        issue.html_url = f"https://github.com/home-assistant/core/pull/{issue.number}"
+        issue.user.html_url = "https://github.com/user"
+
+    fetched = []
+
+    class CountingRepo(FakeRepo):
+        def issue(self, number):
+            fetched.append(number)
+            return super().issue(number)
+
+    context = ReleaseContext(
+        FakeSession(CountingRepo(issues)), paths={"core": str(local)}
+    )
+
+    releases = context.release_range("2024.1.0", "2024.1.1")
+    assert releases == [
+        ("2024.1.0", "2024.1.0", "2023.12.0"),
+        ("2024.1.1", "2024.1.1", "2024.1.0"),
+    ]
+
+    notes = {
+        str(notes.release.version): notes.github
+        for notes in context.generate_notes_batch(
+            releases + [("dev", "2024.2.0", None)], write=False
+        )
+    }
+
+    assert "- Fix a ([@user] - [#1])" in notes["2024.1.0"]
+    assert "[#2]" not in notes["2024.1.0"]
+    assert "- Fix b ([@user] - [#2])" in notes["2024.1.1"]
+    assert "[#1]" not in notes["2024.1.1"]
+    assert "- Fix c ([@user] - [#3])" in notes["2024.2.0"]
+    # The PRs shared by the releases are fetched once.
+    assert sorted(fetched) == [1, 2, 3]
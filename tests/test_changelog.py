@@ -1,4 +1,11 @@
-from hassrelease.changelog import automation_link, _process_doc_label
+from hassrelease.changelog import (
+    WEBSITE_DIVIDER,
+    LabelRules,
+    _process_doc_label,
+    automation_link,
+    generate,
+)
+from hassrelease.model import LogLine, Release
 
 
 def test_automation_link():
@@ -28,3 +35,181 @@ def test_process_doc_label():
 
     assert parts[-1] == "([hue docs])"
     assert next(iter(links)).startswith("[hue docs]")
+
+
+class FakeUser:
+    def __init__(self, login):
+        self.login = login
+        self.html_url = "https://github.com/{}".format(login)
+
+
+class FakeLabel:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeMilestone:
+    def __init__(self, title):
+        self.title = title
+
+
+class FakeIssue:
+    def __init__(self, number, login, labels, milestone=None):
+        self.number = number
+        self.user = FakeUser(login)
+        self.html_url = "https://github.com/home-assistant/core/pull/{}".format(number)
+        self.milestone = milestone
+        # No labels() method, the notes use the labels of the issue.
+        self.original_labels = [FakeLabel(label) for label in labels]
+
+
+class FakePRs:
+    def __init__(self, issues):
+        self.issues = {issue.number: issue for issue in issues}
+
+    def get(self, number):
+        return self.issues[number]
+
+
+def fake_release(version, issues):
+    release = Release(version, branch="rc")
+    release._log_lines = [
+        LogLine("- Commit without PR (dev@example.com)"),
+        *(
+            LogLine(
+                "- Change {} (#{}) (dev@example.com)".format(issue.number, issue.number)
+            )
+            for issue in issues
+        ),
+    ]
+    return release, FakePRs(issues)
+
+
+GOLDEN_ISSUES = [
+    FakeIssue(1, "alice", ["integration: hue", "new-integration", "breaking-change"]),
+    FakeIssue(2, "bob", ["reverted", "integration: hue"]),
+    FakeIssue(3, "alice", ["integration: automation.mqtt", "integration: hue"]),
+    FakeIssue(4, "carol", ["integration: recorder.purge", "cherry-picked"]),
+    FakeIssue(5, "dave", ["integration: cloud.alexa", "new-platform"]),
+    FakeIssue(6, "erin", ["integration: automation.homeassistant", "integration: "]),
+    FakeIssue(7, "frank", ["integration: zwave"], milestone=FakeMilestone("0.99.0")),
+    FakeIssue(8, "grace", ["integration: automation.numeric_state", "docs-missing"]),
+]
+
+GOLDEN_GITHUB = """## New Integrations
+
+- Change 1 ([@alice] - [#1]) ([hue docs]) (new-integration) (breaking-change)
+
+## New Platforms
+
+- Change 5 ([@dave] - [#5]) ([cloud.alexa docs]) (new-platform)
+
+## Breaking Changes
+
+- Change 1 ([@alice] - [#1]) ([hue docs]) (new-integration) (breaking-change)
+
+## Beta Fixes
+
+- Change 4 ([@carol] - [#4]) (beta fix)
+
+## All changes
+
+- Change 1 ([@alice] - [#1]) ([hue docs]) (new-integration) (breaking-change)
+- Change 3 ([@alice] - [#3]) ([automation.mqtt docs]) ([hue docs])
+- Change 4 ([@carol] - [#4]) (beta fix)
+- Change 5 ([@dave] - [#5]) ([cloud.alexa docs]) (new-platform)
+- Change 6 ([@erin] - [#6]) ([automation.homeassistant docs])
+- Change 8 ([@grace] - [#8]) ([automation.numeric_state docs])
+
+[#1]: https://github.com/home-assistant/core/pull/1
+[#3]: https://github.com/home-assistant/core/pull/3
+[#4]: https://github.com/home-assistant/core/pull/4
+[#5]: https://github.com/home-assistant/core/pull/5
+[#6]: https://github.com/home-assistant/core/pull/6
+[#8]: https://github.com/home-assistant/core/pull/8
+[@alice]: https://github.com/alice
+[@carol]: https://github.com/carol
+[@dave]: https://github.com/dave
+[@erin]: https://github.com/erin
+[@grace]: https://github.com/grace
+[automation.homeassistant docs]: https://www.home-assistant.io/docs/automation/trigger/#home-assistant-trigger
+[automation.mqtt docs]: https://www.home-assistant.io/docs/automation/trigger/#mqtt-trigger
+[automation.numeric_state docs]: https://www.home-assistant.io/docs/automation/trigger/#numeric-state-trigger
+[cloud.alexa docs]: https://www.nabucasa.com/config/
+[hue docs]: https://www.home-assistant.io/integrations/hue/"""
+
+
+def test_generate_golden():
+    release, prs = fake_release("0.100.0", GOLDEN_ISSUES)
+    assert generate(release, prs, website_tags=False) == GOLDEN_GITHUB
+
+    website = generate(release, prs, website_tags=True)
+    assert WEBSITE_DIVIDER in website
+    assert "[hue docs]: /integrations/hue/" in website
+    assert "[automation.mqtt docs]: /docs/automation/trigger/#mqtt-trigger" in website
+    assert "[cloud.alexa docs]: https://www.nabucasa.com/config/" in website
+
+
+def test_generate_patch_release():
+    release, prs = fake_release("0.100.1", GOLDEN_ISSUES)
+    github = generate(release, prs, website_tags=False)
+
+    assert "## " not in github
+    # Beta fixes are only called out in the first release of a version.
+    assert "- Change 4 ([@carol] - [#4])\n" in github
+
+
+def test_label_rules():
+    rules = LabelRules(
+        {
+            "ignore": ["wontfix"],
+            "sections": [{"label": "breaking-change", "header": "Breaking"}],
+            "docs": {
+                "prefix": "integration: ",
+                "rules": [
+                    {"prefix": "hue", "link": None},
+                    {"prefix": "hue.", "link": "url", "url": "https://example.com"},
+                    {"prefix": "zha.", "link": "url", "url": "https://example.com"},
+                ],
+            },
+        }
+    )
+
+    assert rules.classify("wontfix").ignore
+    assert rules.classify("breaking-change").section == "breaking-change"
+    assert rules.classify("integration: hue").doc is None
+    # The first matching rule wins, even if a longer prefix matches.
+    assert rules.classify("integration: hue.light").doc is None
+    assert rules.classify("integration: zha.light").links[False] == (
+        "[zha.light docs]: https://example.com"
+    )
+    assert (
+        rules.classify("integration: hu").links[True] == "[hu docs]: /integrations/hu/"
+    )
+    assert rules.classify("integration: zwave") is rules.classify("integration: zwave")
+
+
+class FakeContributors:
+    def __init__(self, first):
+        self.first = first
+
+    def is_first_contribution(self, number, login=None, email=None):
+        return self.first.get(login) == number
+
+
+def test_generate_new_contributors():
+    release, prs = fake_release("0.100.0", GOLDEN_ISSUES)
+    github = generate(
+        release,
+        prs,
+        website_tags=False,
+        contributors=FakeContributors({"alice": 99, "carol": 4, "dave": 5, "bob": 2}),
+    )
+
+    section = github[github.index("## New Contributors") : github.index("## All")]
+    # Reverted PRs are not listed.
+    assert section.splitlines()[2:] == [
+        "- [@carol] made their first contribution in [#4]",
+        "- [@dave] made their first contribution in [#5]",
+        "",
+    ]
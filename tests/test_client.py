@@ -0,0 +1,129 @@
+import time
+
+import pytest
+import requests
+
+from hassrelease import client
+
+
+class ScriptedAdapter(requests.adapters.BaseAdapter):
+    """Answer requests with scripted statuses and headers, recording them."""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status_code, headers, content = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers)
+        response.request = request
+        response.url = request.url
+        response._content = content
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch, tmp_path):
+    """Record the waits instead of sleeping."""
+    monkeypatch.chdir(tmp_path)
+    waits = []
+    monkeypatch.setattr(client.time, "sleep", waits.append)
+    return waits
+
+
+def test_revalidate(sleeps):
+    session = client.ClientSession("token")
+    adapter = ScriptedAdapter(
+        [
+            (200, {"ETag": '"v1"', "X-RateLimit-Remaining": "10"}, b'{"a": 1}'),
+            (304, {"ETag": '"v1"'}, b""),
+        ]
+    )
+    session.mount("https://", adapter)
+    url = "https://api.github.com/repos/home-assistant/core"
+
+    assert session.get(url).json() == {"a": 1}
+    response = session.get(url)
+
+    assert response.status_code == 200
+    assert response.json() == {"a": 1}
+    assert adapter.requests[1].headers["If-None-Match"] == '"v1"'
+    snap = session.telemetry.snapshot()
+    assert snap["requests"] == 2
+    assert snap["cache_lookups"] == {("responses", True): 1}
+    assert snap["rate_limit_remaining"] == 10
+
+
+def test_cache_disabled(sleeps):
+    session = client.ClientSession("token", cache_size=0)
+    adapter = ScriptedAdapter(
+        [(200, {"ETag": '"v1"'}, b'{"a": 1}'), (200, {"ETag": '"v1"'}, b'{"a": 1}')]
+    )
+    session.mount("https://", adapter)
+    url = "https://api.github.com/repos/home-assistant/core"
+
+    session.get(url)
+    session.get(url)
+
+    assert "If-None-Match" not in adapter.requests[1].headers
+    assert session._cache == {}
+    assert session.telemetry.snapshot()["cache_lookups"] == {}
+
+
+def test_rate_limit_shared(sleeps, monkeypatch):
+    reset = int(time.time()) + 600
+    session = client.ClientSession("token")
+    adapter = ScriptedAdapter(
+        [
+            (
+                403,
+                {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)},
+                b"{}",
+            ),
+            (
+                200,
+                {
+                    "X-RateLimit-Remaining": "4999",
+                    "X-RateLimit-Reset": str(reset + 3600),
+                },
+                b"{}",
+            ),
+        ]
+    )
+    session.mount("https://", adapter)
+    # Another process using the same token.
+    other = client.ClientSession("token")
+    waits = []
+    monkeypatch.setattr(
+        client.time,
+        "sleep",
+        lambda seconds: waits.append((seconds, other.rate_limit.wait_time())),
+    )
+
+    assert session.get("https://api.github.com/rate_limit").status_code == 200
+
+    # The refused request waited for the reset and was sent again, the
+    # other process had to wait as well.
+    assert len(adapter.requests) == 2
+    assert len(waits) == 1
+    assert waits[0][0] > 590 and waits[0][1] > 590
+    assert other.rate_limit.wait_time() == 0
+    assert client.ClientSession("other token").rate_limit.wait_time() == 0
+
+
+def test_forbidden_passes_through(sleeps):
+    session = client.ClientSession("token")
+    session.mount(
+        "https://",
+        ScriptedAdapter([(403, {"X-RateLimit-Remaining": "4000"}, b"{}")]),
+    )
+
+    assert session.get("https://api.github.com/orgs/x").status_code == 403
+    assert sleeps == []
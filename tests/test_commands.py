@@ -0,0 +1,59 @@
+import pathlib
+import threading
+from types import SimpleNamespace
+
+from click.testing import CliRunner
+
+from hassrelease import api, commands
+from hassrelease.core import HassReleaseError
+
+
+class FakeContext:
+    def __init__(self):
+        # Every repository waits for the others, which only works if they
+        # are picked at the same time.
+        self.barrier = threading.Barrier(3, timeout=5)
+
+    def picker(self, name):
+        return SimpleNamespace(state_file=pathlib.Path("missing"))
+
+    def local_path(self, name):
+        return f"../{name}"
+
+    def pick(self, name, milestone, check, resume):
+        self.barrier.wait()
+        if name == "home-assistant.io":
+            raise ConnectionError("GitHub unreachable")
+        item = SimpleNamespace(sha="abc", number=1, title=f"Fix {name}", login="me")
+        failed = SimpleNamespace(number=2, title="Conflict")
+        if name == "frontend":
+            return api.PickResult(
+                None, False, [item], failed, output=["error: could not apply\n"]
+            )
+        return api.PickResult(None, True, [item])
+
+
+def test_pick_all(monkeypatch):
+    monkeypatch.setattr(api, "ReleaseContext", FakeContext)
+
+    result = CliRunner().invoke(commands.cli, ["pick", "--all", "--continue"])
+
+    output = result.output
+    assert output.index("== Repository core ==") < output.index("- Fix core")
+    assert output.index("- Fix core") < output.index("== Repository frontend ==")
+    assert output.index("== Repository frontend ==") < output.index("- Fix frontend")
+    assert (
+        "Cherry picking Conflict "
+        "(https://www.github.com/home-assistant/frontend/pull/2)" in output
+    )
+    assert output.index("error: could not apply") > output.index(
+        "== Repository frontend =="
+    )
+    assert "Failed: GitHub unreachable" in output
+    assert "Finished 3 repositories" in output
+    assert isinstance(result.exception, HassReleaseError)
+    assert str(result.exception).splitlines() == [
+        "frontend: Cherry picking Conflict (#2) failed. Resolve the conflict in "
+        "../frontend and run `hassrelease pick frontend --continue`",
+        "home-assistant.io: GitHub unreachable",
+    ]
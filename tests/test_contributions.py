@@ -0,0 +1,34 @@
+import pickle
+
+from hassrelease.contributions import ContributionMatrix
+
+
+def test_ranked_sums_and_orders_repos():
+    matrix = ContributionMatrix()
+    matrix.add("alice", "core", 3)
+    matrix.add("bob", "frontend", 1)
+    matrix.add("alice", "home-assistant.io", 5)
+    matrix.add("alice", "frontend", 5)
+    matrix.add("alice", "core", 4)
+
+    assert len(matrix) == 2
+    assert "bob" in matrix
+    assert list(matrix.ranked()) == [
+        ("alice", 17, [("core", 7), ("frontend", 5), ("home-assistant.io", 5)]),
+        ("bob", 1, [("frontend", 1)]),
+    ]
+
+
+def test_merge_and_pickle():
+    first = ContributionMatrix()
+    first.add("alice", "core", 3)
+    second = ContributionMatrix()
+    second.add("bob", "frontend", 1)
+    second.add("alice", "core", 2)
+
+    first.merge(pickle.loads(pickle.dumps(second)))
+
+    assert list(first.ranked()) == [
+        ("alice", 5, [("core", 5)]),
+        ("bob", 1, [("frontend", 1)]),
+    ]
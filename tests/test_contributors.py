@@ -0,0 +1,39 @@
+from hassrelease.contributors import ContributorIndex
+
+from .conftest import commit, git
+
+
+def authored(repo, author, message):
+    """Commit as another author, returning the commit SHA."""
+    git(repo, "commit", "-q", "--allow-empty", "--author", author, "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+def test_update(repo, tmp_path):
+    commit(repo, "a.py", "a\n", "Add a (#1)")
+    authored(repo, "Bob <bob@example.com>", "Add b (#2)")
+    authored(repo, "Bob <bob@example.com>", "Fix b (#3)")
+    git(repo, "update-ref", "refs/remotes/origin/dev", "dev")
+    git(repo, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/dev")
+    path = tmp_path / "contributors.json"
+    logins = {"bob@example.com": "bob", "bob@users.noreply.github.com": "bob"}
+
+    index = ContributorIndex(repo, path, logins)
+    assert index.update() == 4
+    assert index.first_pr(email="test@example.com") == 1
+    assert index.first_pr("bob") == 2
+    assert index.is_first_contribution(2, "bob")
+    assert not index.is_first_contribution(3, "bob")
+    assert index.first_pr("carol", "carol@example.com") is None
+
+    # Nothing changed, nothing is read.
+    assert ContributorIndex(repo, path, logins).update() == 0
+
+    # A known author committing with another email is not new.
+    authored(repo, "Bob <bob@users.noreply.github.com>", "Fix c (#4)")
+    authored(repo, "Carol <carol@example.com>", "Add d (#5)")
+    git(repo, "update-ref", "refs/remotes/origin/dev", "dev")
+    index = ContributorIndex(repo, path, logins)
+    assert index.update() == 2
+    assert index.first_pr("bob", "bob@users.noreply.github.com") == 2
+    assert index.first_pr("carol", "carol@example.com") == 5
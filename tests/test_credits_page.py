@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pystache
+
+from hassrelease.credits_page import CreditsTemplate
+
+TEMPLATE = (Path(__file__).parent.parent / "hassrelease/credits.mustache").read_text()
+
+
+def user(login, name, count_string):
+    return {"info": {"name": name, "login": login}, "countString": count_string}
+
+
+def context(date):
+    return {
+        "fearlessLeader": user("balloob", "Paulus", "1 commit to core\n"),
+        "headerDate": date,
+        "footerDate": date,
+    }
+
+
+USERS = [
+    user("alice", "Alice \\& co", "3 commits to core\n"),
+    user("bob", "<Bob>", '1 commit to "frontend"\n'),
+]
+
+
+def test_render_matches_full_template():
+    template = CreditsTemplate(TEMPLATE)
+
+    assert "".join(template.render(context("today"), USERS)) == pystache.render(
+        TEMPLATE, dict(context("today"), allUsers=USERS)
+    )
+
+
+def test_write_skips_timestamp_only_changes(tmp_path):
+    template = CreditsTemplate(TEMPLATE)
+    page = tmp_path / "credits.markdown"
+
+    assert template.write(page, context("yesterday"), USERS)
+    written = page.read_text()
+
+    assert not template.write(page, context("today"), USERS)
+    assert page.read_text() == written
+
+    assert template.write(page, context("today"), USERS[:1])
+    assert "today" in page.read_text()
+    assert list(tmp_path.iterdir()) == [page]
@@ -0,0 +1,163 @@
+from hassrelease.changelog import LabelRules, generate
+from hassrelease.docs_index import TRIGGER_PAGE, DocsIndex, heading_anchor
+
+from .conftest import commit, git
+from .test_changelog import GOLDEN_ISSUES, fake_release
+
+TRIGGERS = """---
+title: "Automation Trigger"
+---
+
+### Event trigger
+
+### Home Assistant trigger
+
+### Numeric state trigger
+
+### Time pattern trigger {#time-pattern-trigger}
+"""
+
+
+def test_heading_anchor():
+    assert heading_anchor("Home Assistant trigger") == "home-assistant-trigger"
+    assert heading_anchor("MQTT trigger") == "mqtt-trigger"
+    assert heading_anchor("1. Sun (elevation) trigger") == "sun-elevation-trigger"
+
+
+def test_update(tmp_path):
+    docs = tmp_path / "home-assistant.io"
+    docs.mkdir()
+    git(docs, "init", "-q", "-b", "current")
+    commit(docs, TRIGGER_PAGE, TRIGGERS, "Add triggers")
+    commit(docs, "source/_integrations/hue.markdown", "---\n", "Add hue")
+    commit(
+        docs,
+        "source/_integrations/zwave_js.markdown",
+        "---\nha_domain: zwave\n---\n",
+        "Add zwave",
+    )
+    path = tmp_path / "docs.json"
+
+    index = DocsIndex(docs, path)
+    assert index.update() == 3
+    assert index.integration_page("hue") == "/integrations/hue/"
+    assert index.integration_page("zwave") == "/integrations/zwave_js/"
+    assert index.trigger_page("automation.homeassistant") == (
+        "/docs/automation/trigger/#home-assistant-trigger"
+    )
+    assert index.trigger_page("automation.time_pattern") == (
+        "/docs/automation/trigger/#time-pattern-trigger"
+    )
+    assert index.integration_page("light") is None
+    assert index.trigger_page("automation.mqtt") is None
+
+    # Nothing changed, nothing is read.
+    assert DocsIndex(docs, path).update() == 0
+
+    # Only the changed pages are read.
+    commit(docs, "source/_integrations/light.markdown", "---\n", "Add light")
+    git(docs, "rm", "-q", "source/_integrations/hue.markdown")
+    git(docs, "commit", "-q", "-m", "Remove hue")
+    commit(docs, "README", "docs\n", "Add readme")
+    index = DocsIndex(docs, path)
+    assert index.update() == 1
+    assert index.integration_page("light") == "/integrations/light/"
+    assert index.integration_page("hue") is None
+    assert index.trigger_page("automation.numeric_state") == (
+        "/docs/automation/trigger/#numeric-state-trigger"
+    )
+
+    # A rewritten history is indexed again.
+    git(docs, "checkout", "-q", "--orphan", "other")
+    git(docs, "rm", "-q", "-r", "--cached", ".")
+    commit(docs, "source/_integrations/mqtt.markdown", "---\n", "Add mqtt")
+    git(docs, "branch", "-q", "-D", "current")
+    git(docs, "reflog", "expire", "--expire=now", "--all")
+    git(docs, "gc", "-q", "--prune=now")
+    index = DocsIndex(docs, path)
+    assert index.update() == 1
+    assert index.pages == {"mqtt": ["mqtt"]}
+    assert index.triggers == {}
+
+
+class FakeDocs:
+    head = "abc"
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def integration_page(self, domain):
+        return self.pages.get(domain)
+
+    def trigger_page(self, platform):
+        return self.integration_page(platform)
+
+
+def test_label_rules_docs():
+    docs = FakeDocs(
+        {"zwave": "/integrations/zwave_js/", "automation.sun": "/docs/sun/#sun"}
+    )
+    rules = LabelRules(
+        {
+            "docs": {
+                "prefix": "integration: ",
+                "rules": [
+                    {"prefix": "automation.", "link": "automation"},
+                    {"prefix": "cloud.", "link": "url", "url": "https://example.com"},
+                ],
+            }
+        },
+        docs,
+    )
+
+    assert rules.classify("integration: zwave").links == {
+        True: "[zwave docs]: /integrations/zwave_js/",
+        False: "[zwave docs]: https://www.home-assistant.io/integrations/zwave_js/",
+    }
+    assert rules.classify("integration: automation.sun").links[True] == (
+        "[automation.sun docs]: /docs/sun/#sun"
+    )
+    assert rules.classify("integration: cloud.google").links[True] == (
+        "[cloud.google docs]: https://example.com"
+    )
+
+    # Labels without documentation keep their default link.
+    label_class = rules.classify("integration: hue")
+    assert label_class.doc == "([hue docs])"
+    assert label_class.links[False] == (
+        "[hue docs]: https://www.home-assistant.io/integrations/hue/"
+    )
+    assert label_class.missing_docs == "hue"
+
+    # The classes are computed again when the documentation moves.
+    docs.pages["hue"] = "/integrations/hue/"
+    assert rules.classify("integration: hue").missing_docs == "hue"
+    docs.head = "def"
+    label_class = rules.classify("integration: hue")
+    assert label_class.links[True] == "[hue docs]: /integrations/hue/"
+    assert label_class.missing_docs is None
+
+
+def test_generate_missing_docs():
+    release, prs = fake_release("0.100.0", GOLDEN_ISSUES)
+    docs = FakeDocs({"hue": "/integrations/hue/"})
+
+    missing_docs = set()
+    github = generate(
+        release, prs, website_tags=False, docs=docs, missing_docs=missing_docs
+    )
+    assert "[hue docs]: https://www.home-assistant.io/integrations/hue/" in github
+    # Missing pages keep their link and are only reported.
+    assert "[automation.mqtt docs]" in github
+    assert missing_docs == {
+        "automation.mqtt",
+        "automation.homeassistant",
+        "automation.numeric_state",
+    }
+
+    # Each generation collects its own missing items.
+    docs.pages["automation.mqtt"] = "/docs/automation/trigger/#mqtt-trigger"
+    docs.head = "def"
+    missing_docs = set()
+    generate(release, prs, website_tags=False, docs=docs, missing_docs=missing_docs)
+    assert missing_docs == {"automation.homeassistant", "automation.numeric_state"}
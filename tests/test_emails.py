@@ -0,0 +1,159 @@
+from types import SimpleNamespace
+
+from hassrelease import credits
+from hassrelease.contributions import ContributionMatrix
+from hassrelease.emails import EmailResolver, noreply_id, noreply_login
+
+from .conftest import git
+
+
+def test_noreply_login():
+    assert noreply_login("12345+Some-User@users.noreply.github.com") == "Some-User"
+    assert noreply_login("someuser@users.noreply.github.com") == "someuser"
+    assert noreply_login("someuser@example.com") is None
+    assert noreply_login("12345+-bad@users.noreply.github.com") is None
+    assert noreply_id("12345+Some-User@users.noreply.github.com") == 12345
+    assert noreply_id("someuser@users.noreply.github.com") is None
+
+
+def history(repo, *authors):
+    """Commit once as every author."""
+    for author in authors:
+        git(repo, "commit", "-q", "--allow-empty", "--author", author, "-m", "Fix")
+
+
+def test_resolve(repo):
+    history(
+        repo,
+        "Bob <bob@work.example.com>",
+        "Bob <bob@example.com>",
+        "Carol <carol@example.com>",
+    )
+    (repo / ".mailmap").write_text(
+        "Bob <bob@example.com> <bob@work.example.com>\n"
+        "Carol <2+carol@users.noreply.github.com> <carol@example.com>\n"
+    )
+    resolver = EmailResolver(
+        {
+            "bob@example.com": "bob",
+            "2+old-carol@users.noreply.github.com": "carol",
+        },
+        [str(repo), "missing"],
+    )
+
+    assert resolver.resolve("ann@users.noreply.github.com") == ("ann", None)
+    # The login of an email with an ID may be outdated, only the ID counts.
+    assert resolver.resolve("4+dan@users.noreply.github.com") == (None, None)
+    assert resolver.resolve("2+carol@users.noreply.github.com") == ("carol", None)
+    assert resolver.resolve("bob@work.example.com") == ("bob", "Bob")
+    assert resolver.resolve("carol@example.com") == ("carol", "Carol")
+    assert resolver.resolve("eve@example.com") == (None, None)
+    assert resolver.resolved == {"noreply": 2, "history": 2}
+
+
+def test_resolve_with_history(repo):
+    history(repo, "Bob <bob@work.example.com>")
+    (repo / ".mailmap").write_text("Bob <bob@example.com> <bob@work.example.com>\n")
+    indexed = EmailResolver({}, [str(repo)]).history()
+
+    # A worker resolves with the history of the coordinator, without git.
+    resolver = EmailResolver({"bob@example.com": "bob"}, ["missing"], indexed)
+    assert resolver.resolve("bob@work.example.com") == ("bob", "Bob")
+
+
+def test_resolve_shared_name(repo):
+    history(repo, "David <david@example.com>", "David <david@example.org>")
+    resolver = EmailResolver({"david@example.com": "david"}, [str(repo)])
+
+    # Another David is not mistaken for the known one.
+    assert resolver.resolve("david@example.org") == (None, "David")
+    assert resolver.resolved == {"noreply": 0, "history": 0}
+
+
+def test_contributors_page_resolves_locally(repo, monkeypatch):
+    history(repo, "Ann Example <ann@example.com>")
+    (repo / ".mailmap").write_text(
+        "Ann Example <ann@users.noreply.github.com> <ann@example.com>\n"
+    )
+    logins = {}
+    names = {}
+    queued = []
+    monkeypatch.setattr(credits, "login_by_email", logins)
+    monkeypatch.setattr(credits, "name_by_login", names)
+    monkeypatch.setattr(credits, "org_contributors_dict", ContributionMatrix())
+    monkeypatch.setattr(credits, "email_resolver", EmailResolver(logins, [str(repo)]))
+    monkeypatch.setattr(credits, "enqueue", queued.append)
+    contributors = [
+        {"type": "Anonymous", "email": "ann@example.com", "contributions": 3},
+        {
+            "type": "Anonymous",
+            "email": "dan@users.noreply.github.com",
+            "contributions": 1,
+        },
+        {
+            "type": "Anonymous",
+            "email": "5+erin@users.noreply.github.com",
+            "contributions": 1,
+        },
+        {"type": "Anonymous", "email": "eve@example.com", "contributions": 2},
+    ]
+    monkeypatch.setattr(
+        credits,
+        "gh",
+        SimpleNamespace(
+            request_with_retry=lambda url, params: SimpleNamespace(
+                links={}, json=lambda: contributors
+            )
+        ),
+    )
+    repo_info = {"name": "core", "commits_url": "https://api/commits{/sha}"}
+
+    credits.ContributorsPageTask("https://api/contributors", repo_info).handle()
+
+    assert logins == {
+        "ann@example.com": "ann",
+        "dan@users.noreply.github.com": "dan",
+    }
+    assert names == {"ann": "Ann Example"}
+    # Dan's name is still asked for, the unknown ID and eve are looked up
+    # through a commit.
+    assert [type(task).__name__ for task in queued] == [
+        "ResolveNameByProfile",
+        "HandleAnonTask",
+        "HandleAnonTask",
+    ]
+    assert queued[0].url.endswith("/users/dan")
+    assert credits.email_resolver.requests_avoided == 1
+    assert len(credits.org_contributors_dict) == 2
+
+
+def test_resolve_name_of_missing_profile(monkeypatch):
+    names = {}
+    monkeypatch.setattr(credits, "name_by_login", names)
+    monkeypatch.setattr(
+        credits,
+        "gh",
+        SimpleNamespace(
+            request_with_retry=lambda url, params: SimpleNamespace(
+                status_code=404, json=lambda: {"message": "Not Found"}
+            )
+        ),
+    )
+
+    credits.ResolveNameByProfile("https://api/users/gone", "gone").handle()
+
+    assert names == {"gone": "gone"}
+
+
+def test_crawl_survives_failed_task(monkeypatch):
+    failures = []
+    monkeypatch.setattr(credits, "log", failures.append)
+
+    class FailingTask(credits.RequestTask):
+        def handle(self):
+            raise KeyError("login")
+
+    # Would wait forever for the failed task.
+    credits.crawl(2, [FailingTask("https://api/users/gone")])
+
+    assert len(failures) == 1
@@ -0,0 +1,144 @@
+import pytest
+
+from hassrelease import git as hass_git
+from hassrelease.core import HassReleaseError
+
+from .conftest import commit, git
+
+
+@pytest.fixture
+def remote(repo, tmp_path):
+    """Return a bare remote with the repo's dev and rc branches and a new commit."""
+    path = tmp_path / "remote.git"
+    git(tmp_path, "clone", "-q", "--bare", str(repo), str(path))
+    git(path, "config", "uploadpack.allowAnySHA1InWant", "true")
+    git(path, "config", "uploadpack.allowFilter", "true")
+    return path
+
+
+def clone(tmp_path, remote, *args):
+    path = tmp_path / "local"
+    git(tmp_path, "clone", "-q", *args, remote.as_uri(), str(path))
+    return path
+
+
+def test_fetch_branch_and_commits(repo, remote, tmp_path):
+    local = clone(tmp_path, remote)
+    git(repo, "remote", "add", "origin", str(remote))
+    dev_sha = commit(repo, "a.py", "a\n", "Add a (#1)")
+    git(repo, "checkout", "-q", "rc")
+    rc_sha = commit(repo, "b.py", "b\n", "Add b (#2)")
+    git(repo, "push", "-q", "origin", "dev", "rc")
+    # A commit only reachable by SHA, like the merge commit of a PR.
+    git(repo, "checkout", "-q", "-b", "feature", "dev")
+    pr_sha = commit(repo, "c.py", "c\n", "Add c (#3)")
+    git(repo, "push", "-q", "origin", "feature")
+    git(remote, "update-ref", "-d", "refs/heads/feature")
+
+    hass_git.fetch(local, ["dev"], [pr_sha, dev_sha])
+
+    assert git(local, "rev-parse", "origin/dev") == dev_sha
+    # Branches that were not asked for are not updated.
+    assert git(local, "rev-parse", "origin/rc") != rc_sha
+    assert hass_git.missing_commits(local, [pr_sha, rc_sha]) == [rc_sha]
+
+
+def test_fetch_shallow_partial(repo, remote, tmp_path):
+    git(repo, "remote", "add", "origin", str(remote))
+    first = commit(repo, "a.py", "a\n", "Add a (#1)")
+    second = commit(repo, "b.py", "b\n", "Add b (#2)")
+    git(repo, "push", "-q", "origin", "dev")
+    git(remote, "update-ref", "refs/heads/dev", first)
+    local = clone(tmp_path, remote, "--depth=1", "--filter=blob:none")
+
+    hass_git.fetch(local, shas=[second])
+
+    assert git(local, "rev-parse", "--is-shallow-repository") == "true"
+    # The parent is fetched as well so the commit can be cherry picked.
+    assert hass_git.missing_commits(local, [second, first]) == []
+
+
+def test_fetch_nothing_missing(remote, tmp_path):
+    local = clone(tmp_path, remote)
+    head = git(local, "rev-parse", "HEAD")
+    # Would fail if it tried to fetch the SHA from a missing remote.
+    git(local, "remote", "set-url", "origin", str(tmp_path / "gone"))
+
+    hass_git.fetch(local, shas=[head])
+
+
+def test_default_branch(remote, tmp_path):
+    assert hass_git.get_default_branch(clone(tmp_path, remote)) == "dev"
+
+
+def test_git_repo_show(repo):
+    git(repo, "checkout", "-q", "rc")
+    commit(repo, "pyproject.toml", 'version = "2"\n', "Bump")
+    git(repo, "checkout", "-q", "dev")
+    commit(repo, "pyproject.toml", 'version = "3"\n', "Bump")
+
+    with hass_git.GitRepo(repo) as git_repo:
+        assert git_repo.show("rc", "pyproject.toml") == 'version = "2"\n'
+        assert git_repo.show("dev", "pyproject.toml") == 'version = "3"\n'
+        assert git_repo.show("dev", "missing.toml") is None
+        assert git_repo.show("missing", "pyproject.toml") is None
+        assert git_repo.show("dev", "missing file.toml") is None
+        assert git_repo.show("dev", "README") == "base\n"
+
+
+def test_git_repo_status(repo, remote, tmp_path):
+    local = clone(tmp_path, remote)
+    git_repo = hass_git.GitRepo(local)
+
+    status = git_repo.status()
+    assert status.branch == "dev"
+    assert status.upstream == "origin/dev"
+    assert not status.dirty
+    assert hass_git.is_main(local)
+
+    (local / "README").write_text("changed\n")
+    (local / "untracked").write_text("new\n")
+    status = git_repo.status()
+    assert status.changed == ["README"]
+    assert status.dirty
+
+    git(local, "commit", "-q", "-am", "Change")
+    git(local, "checkout", "-q", "-b", "feature")
+    status = git_repo.status()
+    assert not status.dirty
+    assert status.branch == "feature"
+    assert not hass_git.is_main(local)
+
+    git(local, "checkout", "-q", "--detach")
+    assert git_repo.status().branch is None
+
+
+def test_git_repo_run_utf8(repo):
+    commit(repo, "a", "a\n", "Fix café (#1)")
+
+    # Decoded as UTF-8 whatever the locale.
+    assert hass_git.GitRepo(repo).run("log", "--format=%s", "-1") == "Fix café (#1)\n"
+
+
+def test_git_repo_run_returncodes(repo):
+    git_repo = hass_git.GitRepo(repo)
+
+    assert git_repo.run("grep", "-l", "missing text", returncodes=(0, 1)) == ""
+    with pytest.raises(HassReleaseError, match="Nothing found"):
+        git_repo.run("grep", "-l", "missing text", error="Nothing found")
+    assert hass_git.grep_files(repo, "base") == ["README"]
+    assert hass_git._config(repo, "missing.key") is None
+
+
+def test_get_main_branch(repo):
+    dev = git(repo, "rev-parse", "dev")
+    git(repo, "update-ref", "refs/remotes/origin/master", "rc")
+    git(repo, "update-ref", "refs/remotes/origin/dev", "dev")
+
+    # Without origin/HEAD the first existing default branch is used.
+    assert hass_git.get_main_branch(repo) == ("origin/dev", dev)
+    git(repo, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/master")
+    assert hass_git.get_main_branch(repo) == ("origin/master", dev)
+    git(repo, "update-ref", "-d", "refs/remotes/origin/master")
+    with pytest.raises(HassReleaseError, match="No default branch"):
+        hass_git.get_main_branch(repo)
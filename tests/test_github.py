@@ -0,0 +1,51 @@
+import github3
+import pytest
+import requests
+
+from hassrelease import github
+from hassrelease.core import HassReleaseError
+
+
+class StatusAdapter(requests.adapters.BaseAdapter):
+    """Answer every request with a fixed status, counting the requests."""
+
+    def __init__(self, status_code):
+        super().__init__()
+        self.status_code = status_code
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.request = request
+        response.url = request.url
+        response._content = b"{}"
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    return github.get_session()
+
+
+def test_invalid_token_reported_on_first_call(session):
+    adapter = StatusAdapter(401)
+    session.session.mount("https://", adapter)
+    assert adapter.sent == 0
+
+    with pytest.raises(HassReleaseError, match="Invalid token"):
+        session.repository("home-assistant", "core")
+    assert adapter.sent == 1
+
+
+def test_other_errors_pass_through(session):
+    session.session.mount("https://", StatusAdapter(404))
+
+    with pytest.raises(github3.exceptions.NotFoundError):
+        session.repository("home-assistant", "core")
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+from hassrelease import milestones
+
+
+class FakeRepo:
+    def __init__(self, issues, merged):
+        self._issues = issues
+        self._merged = merged
+        self.fetched = []
+
+    def issues(self, milestone, state):
+        assert (milestone, state) == (7, "closed")
+        return self._issues
+
+    def pull_request(self, number):
+        self.fetched.append(number)
+        return SimpleNamespace(
+            number=number,
+            is_merged=lambda: number in self._merged,
+            merge_commit_sha=f"sha{number}",
+        )
+
+
+def issue(number, labels=(), pull=True):
+    return SimpleNamespace(
+        number=number,
+        pull_request_urls={"url": "..."} if pull else None,
+        original_labels=[SimpleNamespace(name=label) for label in labels],
+    )
+
+
+def test_scan():
+    repo = FakeRepo(
+        [issue(3), issue(1, ["cherry-picked"]), issue(2), issue(4, pull=False)],
+        merged={3},
+    )
+
+    result = milestones.scan(repo, SimpleNamespace(number=7))
+
+    assert [(pr.number, pr.status) for pr in result] == [
+        (1, milestones.STATUS_PICKED),
+        (2, milestones.STATUS_NOT_MERGED),
+        (3, milestones.STATUS_TO_PICK),
+    ]
+    assert result[2].pull.number == 3
+    assert result[2].sha == "sha3"
+
+
+class FakeIndex:
+    def __init__(self, merged, on_rc):
+        self._merged = merged
+        self._on_rc = on_rc
+
+    def merge_commit(self, number):
+        return self._merged.get(number)
+
+    def on_branch(self, number, branch):
+        return branch == "rc" and number in self._on_rc
+
+
+def test_scan_with_index():
+    repo = FakeRepo([issue(1), issue(2), issue(3)], merged={3})
+    index = FakeIndex({1: "abc", 2: "def"}, on_rc={2})
+
+    result = milestones.scan(repo, SimpleNamespace(number=7), index=index, branch="rc")
+
+    assert [(pr.number, pr.status, pr.sha) for pr in result] == [
+        (1, milestones.STATUS_TO_PICK, "abc"),
+        (2, milestones.STATUS_ON_BRANCH, "def"),
+        (3, milestones.STATUS_TO_PICK, "sha3"),
+    ]
+    # Only the PR missing from the index is fetched.
+    assert repo.fetched == [3]
+
+
+class FakeIncrementalRepo(FakeRepo):
+    def __init__(self, issues, merged):
+        super().__init__(issues, merged)
+        self.listed = []
+        self.updated = []
+
+    def issues(self, milestone, state, since=None):
+        self.listed.append((state, since is not None))
+        if since is None:
+            return super().issues(milestone, state)
+        return self.updated
+
+
+def test_scan_incremental(tmp_path):
+    issues = [issue(1, ["cherry-picked"]), issue(2), issue(3), issue(4, pull=False)]
+    for closed in issues:
+        closed.state = "closed"
+        closed.title = f"Fix {closed.number}"
+        closed.user = SimpleNamespace(login="user")
+        closed.body = None
+    repo = FakeIncrementalRepo(issues, merged={3})
+    milestone = SimpleNamespace(number=7, closed_issues=4)
+    state_file = tmp_path / "scan.json"
+
+    def statuses():
+        result = milestones.scan(repo, milestone, state_file=state_file)
+        return [(pr.number, pr.status) for pr in result]
+
+    expected = [
+        (1, milestones.STATUS_PICKED),
+        (2, milestones.STATUS_NOT_MERGED),
+        (3, milestones.STATUS_TO_PICK),
+    ]
+    assert statuses() == expected
+    assert repo.fetched == [2, 3]
+
+    # Nothing updated, the stored classification is used.
+    assert statuses() == expected
+    assert repo.fetched == [2, 3]
+    assert repo.listed == [("closed", False), ("all", True)]
+
+    # An updated PR is classified again.
+    issues[2].original_labels = [SimpleNamespace(name="cherry-picked")]
+    repo.updated = [issues[2]]
+    assert statuses()[2] == (3, milestones.STATUS_PICKED)
+    assert repo.fetched == [2, 3]
+
+    # A PR left the milestone, everything is listed again.
+    repo.updated = []
+    milestone.closed_issues = 3
+    del issues[1]
+    assert statuses() == [
+        (1, milestones.STATUS_PICKED),
+        (3, milestones.STATUS_PICKED),
+    ]
+    assert repo.listed[-1] == ("closed", False)
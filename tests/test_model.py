@@ -1,4 +1,6 @@
-from hassrelease.model import LogLine, Release
+import threading
+
+from hassrelease.model import LogLine, PRCache, Release
 
 
 def test_logline_basic():
@@ -20,3 +22,21 @@ def test_logline_with_pr():
 def test_release_branch():
     release = Release("0.40.1", branch="rc")
     assert release.identifier == "release-0-40-1"
+
+
+def test_pr_cache_get_many():
+    fetched = []
+    lock = threading.Lock()
+
+    class Repo:
+        def issue(self, number):
+            with lock:
+                fetched.append(number)
+            return "issue {}".format(number)
+
+    prs = PRCache(Repo())
+    assert prs.get(2) == "issue 2"
+
+    assert prs.get_many([3, 1, 2, 3]) == ["issue 3", "issue 1", "issue 2", "issue 3"]
+    assert sorted(fetched) == [1, 2, 3]
+    assert prs.get_many([]) == []
@@ -0,0 +1,101 @@
+import json
+from types import SimpleNamespace
+
+from hassrelease.picker import PickItem, Picker, check
+
+from .conftest import commit, git
+
+
+class FakeRepo:
+    name = "core"
+
+    def __init__(self):
+        self.labelled = []
+
+    def issue(self, number):
+        return SimpleNamespace(
+            add_labels=lambda label: self.labelled.append((number, label))
+        )
+
+
+def test_pick_resume_after_conflict(repo, tmp_path):
+    items = [
+        PickItem(commit(repo, "a", "a\n", "Add a (#1)"), 1, "Add a", "alice"),
+        PickItem(commit(repo, "b", "dev\n", "Change b (#2)"), 2, "Change b", "bob"),
+        PickItem(commit(repo, "c", "c\n", "Add c (#3)"), 3, "Add c", "carol"),
+    ]
+    git(repo, "checkout", "-q", "rc")
+    commit(repo, "b", "rc\n", "Conflicting b")
+
+    gh_repo = FakeRepo()
+    picker = Picker(gh_repo, repo, tmp_path / "state.json")
+
+    assert not picker.pick(items)
+    assert [item.number for item in picker.picked] == [1]
+    assert picker.failed.number == 2
+    assert gh_repo.labelled == [(1, "cherry-picked")]
+    # The output of git is collected, conflicts included.
+    assert any(line.startswith("[rc ") for line in picker.output)
+    assert any("could not apply" in line for line in picker.output)
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert [item["number"] for item in state["pending"]] == [2, 3]
+
+    (repo / "b").write_text("resolved\n")
+    git(repo, "add", "b")
+
+    picker = Picker(gh_repo, repo, tmp_path / "state.json")
+    assert picker.resume()
+    assert [item.number for item in picker.picked] == [2, 3]
+    assert sorted(gh_repo.labelled) == [
+        (1, "cherry-picked"),
+        (2, "cherry-picked"),
+        (3, "cherry-picked"),
+    ]
+    assert git(repo, "log", "--format=%s", "-4").splitlines() == [
+        "Add c (#3)",
+        "Change b (#2)",
+        "Add a (#1)",
+        "Conflicting b",
+    ]
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_check(repo):
+    items = [
+        PickItem(commit(repo, "a", "a\n", "Add a (#1)"), 1, "Add a", "alice"),
+        PickItem(commit(repo, "b", "dev\n", "Change b (#2)"), 2, "Change b", "bob"),
+        PickItem(commit(repo, "c", "c1\n", "Add c (#3)"), 3, "Add c", "carol"),
+        PickItem(commit(repo, "d", "d\n", "Add d (#4)"), 4, "Add d", "dave"),
+        PickItem(commit(repo, "c", "c2\n", "Change c (#5)"), 5, "Change c", "erin"),
+    ]
+    git(repo, "checkout", "-q", "rc")
+    commit(repo, "b", "rc\n", "Conflicting b")
+    # Picking 5 without 3 conflicts with the earlier pick of 3.
+    items.pop(2)
+    head = git(repo, "rev-parse", "HEAD")
+
+    results = check(repo, items)
+
+    assert [(result.item.number, result.conflicts) for result in results] == [
+        (1, []),
+        (2, ["b"]),
+        (4, []),
+        (5, ["c"]),
+    ]
+    assert results[1].conflicting_picks == []
+    assert git(repo, "rev-parse", "HEAD") == head
+    assert git(repo, "status", "--porcelain") == ""
+    assert git(repo, "worktree", "list").count("\n") == 0
+
+
+def test_check_conflict_with_earlier_pick(repo):
+    first = PickItem(commit(repo, "README", "dev\n", "Dev (#1)"), 1, "Dev", "alice")
+    git(repo, "checkout", "-q", "-b", "side", "rc")
+    second = PickItem(commit(repo, "README", "side\n", "Side (#2)"), 2, "Side", "bob")
+    git(repo, "checkout", "-q", "rc")
+
+    results = check(repo, [first, second])
+
+    assert results[0].conflicts == []
+    assert results[1].conflicts == ["README"]
+    assert results[1].conflicting_picks == [first]
@@ -0,0 +1,55 @@
+from hassrelease.pr_index import PRIndex, subject_pr
+
+from .conftest import commit, git
+
+
+def test_subject_pr():
+    assert subject_pr("Fix light (#12)") == 12
+    assert subject_pr("Revert #3 (#14)") == 14
+    assert subject_pr("Initial commit") is None
+
+
+def test_update(repo, tmp_path):
+    git(repo, "update-ref", "refs/remotes/origin/dev", "dev")
+    git(repo, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/dev")
+    first = commit(repo, "a.py", "a\n", "Add a (#1)")
+    second = commit(repo, "b/c.py", "c\n", "Add c (#2)")
+    git(repo, "update-ref", "refs/remotes/origin/dev", "dev")
+    git(repo, "checkout", "-q", "rc")
+    git(repo, "cherry-pick", "-x", first)
+    git(repo, "update-ref", "refs/remotes/origin/master", first)
+    path = tmp_path / "index.json"
+
+    index = PRIndex(repo, path)
+    # The default branch in full, of the others only the commits it doesn't
+    # have and the subjects since their merge base.
+    assert index.update() == 7
+
+    assert index.main_branch == "origin/dev"
+    assert index.merge_commit(1) == first
+    assert index.merge_commit(2) == second
+    assert index.merge_commit(3) is None
+    assert index.get(2)["paths"] == ["b/c.py"]
+    assert index.get(2)["email"] == "test@example.com"
+    assert index.on_branch(1, "rc")
+    assert not index.on_branch(2, "rc")
+    # The other default branch candidates are tracked too.
+    assert index.on_branch(1, "origin/master")
+    assert not index.on_branch(2, "origin/master")
+
+    # Nothing changed, nothing is read.
+    assert PRIndex(repo, path).update() == 0
+
+    git(repo, "checkout", "-q", "dev")
+    third = commit(repo, "d.py", "d\n", "Add d (#3)")
+    git(repo, "update-ref", "refs/remotes/origin/dev", third)
+    index = PRIndex(repo, path)
+    assert index.update() == 1
+    assert index.merge_commit(3) == third
+    assert index.merge_commit(1) == first
+
+    # A rewritten branch is indexed again.
+    git(repo, "update-ref", "refs/remotes/origin/dev", first)
+    assert index.update() == 2
+    assert index.merge_commit(1) == first
+    assert index.merge_commit(2) is None
@@ -0,0 +1,118 @@
+import pytest
+
+from hassrelease import repo_core
+
+from .conftest import commit, git
+
+MANIFEST = """{
+  "domain": "frontend",
+  "name": "Home Assistant Frontend",
+  "requirements": ["home-assistant-frontend==20241002.2"],
+  "quality_scale": "internal"
+}
+"""
+
+
+@pytest.fixture
+def core(tmp_path):
+    """Return a checkout pinning the frontend like the core repository."""
+    path = tmp_path / "core"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "dev")
+    for file, content in (
+        (repo_core.FRONTEND_MANIFEST, MANIFEST),
+        (
+            "requirements_all.txt",
+            "# Home Assistant Core\n\n"
+            "# homeassistant.components.frontend\n"
+            "home-assistant-frontend==20241002.2\n\n"
+            "# homeassistant.components.hue\n"
+            "aiohue==4.7.3\n",
+        ),
+        (
+            "requirements_test_all.txt",
+            "# homeassistant.components.frontend\n"
+            "home-assistant-frontend==20241002.2\n",
+        ),
+        (
+            "homeassistant/package_constraints.txt",
+            "hass-nabucasa==0.81.1\nhome-assistant-frontend==20241002.2\n",
+        ),
+        ("README.rst", "Home Assistant\n"),
+    ):
+        commit(path, file, content, f"Add {file}")
+    return path
+
+
+@pytest.fixture
+def regenerated(monkeypatch):
+    """Record the full regenerations instead of running them."""
+    calls = []
+    monkeypatch.setattr(repo_core, "prettier", lambda path: calls.append("prettier"))
+    monkeypatch.setattr(
+        repo_core, "gen_requirements_all", lambda path: calls.append("gen")
+    )
+    return calls
+
+
+def test_bump_frontend_fast_path(core, regenerated):
+    changed = repo_core.bump_frontend_version("20241010.0", core)
+
+    assert sorted(changed) == [
+        "homeassistant/components/frontend/manifest.json",
+        "homeassistant/package_constraints.txt",
+        "requirements_all.txt",
+        "requirements_test_all.txt",
+    ]
+    assert regenerated == []
+    # Only the pins changed, the formatting is kept.
+    assert git(core, "diff", "--numstat").splitlines() == [
+        "1\t1\thomeassistant/components/frontend/manifest.json",
+        "1\t1\thomeassistant/package_constraints.txt",
+        "1\t1\trequirements_all.txt",
+        "1\t1\trequirements_test_all.txt",
+    ]
+    assert (core / repo_core.FRONTEND_MANIFEST).read_text() == MANIFEST.replace(
+        "20241002.2", "20241010.0"
+    )
+
+
+def test_bump_frontend_fallback(core, regenerated):
+    manifest = MANIFEST.replace('.2"]', '.2", "other==1.0"]')
+    commit(core, repo_core.FRONTEND_MANIFEST, manifest, "Add a requirement")
+
+    assert repo_core.bump_frontend_version("20241010.0", core) is None
+
+    assert regenerated == ["prettier", "gen"]
+    # The generated files are left to the regeneration.
+    assert git(core, "diff", "--name-only") == repo_core.FRONTEND_MANIFEST
+
+
+@pytest.mark.parametrize(
+    "file, content",
+    [
+        # A generated file pinning the frontend twice.
+        (
+            "requirements_test_all.txt",
+            "home-assistant-frontend==20241002.2\nhome-assistant-frontend==1\n",
+        ),
+        # A pin the rewrite does not understand next to one it does.
+        (
+            "script/pins.txt",
+            "home-assistant-frontend==20241002.2\nhome-assistant-frontend==<2\n",
+        ),
+    ],
+)
+def test_bump_frontend_unverified_pins(core, regenerated, file, content):
+    commit(core, file, content, f"Change {file}")
+
+    assert repo_core.bump_frontend_version("20241010.0", core) is None
+    assert regenerated == ["prettier", "gen"]
+
+
+def test_bump_frontend_missing_generated_file(core, regenerated):
+    git(core, "rm", "-q", "requirements_test_all.txt")
+    git(core, "commit", "-q", "-m", "Remove requirements_test_all.txt")
+
+    assert repo_core.bump_frontend_version("20241010.0", core) is None
+    assert regenerated == ["prettier", "gen"]
@@ -0,0 +1,71 @@
+from hassrelease.telemetry import CrawlTelemetry, ShardedTelemetry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_crawl_telemetry():
+    clock = FakeClock()
+    telemetry = CrawlTelemetry(clock)
+
+    for _ in range(3):
+        telemetry.task_queued("ContributorsPageTask")
+    telemetry.task_started("ContributorsPageTask")
+    telemetry.request_started()
+    clock.now += 10
+    telemetry.request_finished(
+        0.25, {"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "1700000000"}
+    )
+    telemetry.task_done()
+    telemetry.cache_lookup("name_by_login", True)
+    telemetry.cache_lookup("name_by_login", False)
+
+    snap = telemetry.snapshot()
+    assert snap["queue_depth"] == {"ContributorsPageTask": 2}
+    assert snap["in_flight"] == 0
+    assert snap["requests_per_second"] == 0.1
+    assert snap["rate_limit_remaining"] == 4999
+    assert snap["latency_quantiles"][0.5] == 0.25
+    assert snap["eta"] == 20
+
+    line = telemetry.status_line()
+    assert "ContributorsPageTask=2" in line
+    assert "name_by_login hits 50%" in line
+    assert "ETA 0:00:20" in line
+
+    metrics = telemetry.openmetrics()
+    assert "hassrelease_credits_requests_total 1\n" in metrics
+    assert 'hassrelease_credits_queue_depth{task="ContributorsPageTask"} 2\n' in metrics
+    assert metrics.endswith("# EOF\n")
+
+
+def test_sharded_telemetry():
+    clock = FakeClock()
+    worker = CrawlTelemetry(clock)
+    worker.task_queued("ContributorsPageTask")
+    worker.request_started()
+    worker.request_finished(
+        0.5, {"X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": "1700000000"}
+    )
+    worker.cache_lookup("name_by_login", True)
+
+    telemetry = ShardedTelemetry(clock)
+    telemetry.request_started()
+    telemetry.request_finished(
+        0.25, {"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "1700000000"}
+    )
+    telemetry.update(0, worker.snapshot())
+    telemetry.update(1, worker.snapshot())
+
+    snap = telemetry.snapshot()
+    assert snap["requests"] == 3
+    assert snap["queue_depth"] == {"ContributorsPageTask": 2}
+    assert snap["cache_lookups"] == {("name_by_login", True): 2}
+    assert snap["latency_quantiles"][0.5] == 0.5
+    assert snap["rate_limit_remaining"] == 4000
+    assert "hassrelease_credits_requests_total 3\n" in telemetry.openmetrics()
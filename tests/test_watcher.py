@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from hassrelease.watcher import ReleaseWatcher
+
+from .conftest import commit, git
+
+
+class FakeIterator:
+    def __init__(self, issues, etag):
+        self._issues = issues
+        self.etag = etag
+
+    def __iter__(self):
+        return iter(self._issues)
+
+
+class FakeRepo:
+    def __init__(self):
+        self.issue_list = []
+        self.fetched = []
+        self.queries = []
+
+    def issues(self, milestone, state, since, etag):
+        self.queries.append((since is not None, etag))
+        if since is not None:
+            return FakeIterator([], "etag")
+        return FakeIterator(self.issue_list, "etag")
+
+    def issue(self, number):
+        self.fetched.append(number)
+        return make_issue(number, "2024-01-01")
+
+
+def make_issue(number, updated_at, labels=()):
+    return SimpleNamespace(
+        number=number,
+        updated_at=updated_at,
+        milestone=None,
+        original_labels=[SimpleNamespace(name=label) for label in labels],
+        user=SimpleNamespace(login="user", html_url="https://github.com/user"),
+        html_url=f"https://github.com/home-assistant/core/pull/{number}",
+    )
+
+
+def test_poll(repo, tmp_path):
+    git(repo, "update-ref", "refs/remotes/origin/master", "dev")
+    git(repo, "checkout", "-q", "rc")
+    commit(repo, "pyproject.toml", '[project]\nversion = "2024.1.1"\n', "Bump")
+    commit(repo, "a.py", "a\n", "Fix a (#1)")
+    fake_repo = FakeRepo()
+    fake_repo.issue_list = [make_issue(1, "2024-01-02", ["breaking-change"])]
+    notes = tmp_path / "notes"
+    notes.mkdir()
+
+    watcher = ReleaseWatcher(
+        fake_repo, SimpleNamespace(number=7), local_repository=repo, directory=notes
+    )
+
+    written = watcher.poll()
+    assert [file.name for file in written] == [
+        "release-2024-1-1.md",
+        "release-2024-1-1-github.md",
+    ]
+    # The milestone listing filled the cache.
+    assert fake_repo.fetched == []
+    assert "Fix a" in written[1].read_text()
+    # The labels of the listed issue are used as they are.
+    assert "(breaking-change)" in written[1].read_text()
+
+    # Nothing changed, later polls only ask for updates with the ETag.
+    assert watcher.poll() is None
+    assert watcher.poll() is None
+    assert fake_repo.queries == [(False, None), (True, None), (True, "etag")]
+
+    commit(repo, "b.py", "b\n", "Fix b (#2)")
+    assert len(watcher.poll()) == 2
+    assert fake_repo.fetched == [2]
+    assert "Fix b" in (notes / "release-2024-1-1-github.md").read_text()